@@ -0,0 +1,186 @@
+import datetime
+from collections import Counter
+from functools import lru_cache
+
+from storage import KEY_FIELD, JobRecord
+
+GHOST_DAYS = 21  # An application without news for this long counts as ghosted
+FUNNEL = ("Applied", "Interview", "Offer")
+STATS_FIELDS = frozenset({"Status", "Submitted", "Last Updated"})
+
+
+@lru_cache(maxsize=4096)
+def parse_date(text):
+    # A job search spans a few hundred distinct dates, so each is parsed once
+    try:
+        return datetime.datetime.strptime(text, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=4096)
+def week_of(date):
+    return (date - datetime.timedelta(days=date.weekday())).isoformat()
+
+
+@lru_cache(maxsize=1 << 16)
+def contribution(status, submitted, updated):
+    # (status, Monday of the week submitted, days from submission to the last
+    # update, last update) of a record; the dates are None when not set.
+    # Cached: most jobs share their status and dates with many others.
+    submitted = parse_date(submitted)
+    updated = parse_date(updated)
+    week = days = None
+    if submitted is not None:
+        week = week_of(submitted)
+        if updated is not None and updated >= submitted:
+            days = (updated - submitted).days
+    return status or "", week, days, updated and updated.isoformat()
+
+
+def _fields(job):
+    # (key, status, submitted, last updated); a JobRecord is read without the mapping layer
+    if isinstance(job, JobRecord):
+        return job.key, job.status, job.submitted, job.last_updated
+    return job[KEY_FIELD], job.get("Status"), job.get("Submitted"), job.get("Last Updated")
+
+
+def _bump(counter, key, amount):
+    counter[key] += amount
+    if not counter[key]:
+        del counter[key]
+
+
+def _median(counts):
+    # Median of a histogram {value: occurrences}
+    total = sum(counts.values())
+    if not total:
+        return None
+    low, high = (total - 1) // 2, total // 2
+    seen = 0
+    low_value = None
+    for value in sorted(counts):
+        seen += counts[value]
+        if low_value is None and seen > low:
+            low_value = value
+        if seen > high:
+            return (low_value + value) / 2
+
+
+def _rate(part, whole):
+    return part / whole if whole else None
+
+
+class PipelineStats:
+    # The numbers behind the dashboard, kept up to date one record at a time
+    # like JobIndex: a summary walks a few small counters, never the jobs.
+    # What each record contributed is remembered by key, so an edit made in
+    # place can be taken back out.
+    def __init__(self, jobs=()):
+        self.statuses = Counter()
+        self.weeks = Counter()    # Monday of the week submitted -> applications
+        self.applied = 0          # Jobs that got as far as an application
+        self.days = {}            # status -> Counter(days from submission to the last update)
+        self.waiting = Counter()  # last update of the jobs still Applied -> jobs
+        self._contributions = {}  # key -> contribution() as counted
+        self.add_many(jobs)
+
+    def __len__(self):
+        return sum(self.statuses.values())
+
+    def add(self, job):
+        key, *fields = _fields(job)
+        counted = self._contributions[key] = contribution(*fields)
+        self._count(counted, 1)
+
+    def add_many(self, jobs):
+        # Counted once per distinct contribution rather than once per job
+        counts = Counter()
+        contributions = self._contributions
+        for job in jobs:
+            key, *fields = _fields(job)
+            counted = contributions[key] = contribution(*fields)
+            counts[counted] += 1
+        for counted, count in counts.items():
+            self._count(counted, count)
+
+    def remove(self, key):
+        counted = self._contributions.pop(key, None)
+        if counted is not None:
+            self._count(counted, -1)
+
+    def update(self, job):
+        self.remove(job[KEY_FIELD])
+        self.add(job)
+
+    def _count(self, counted, amount):
+        status, week, days, updated = counted
+        _bump(self.statuses, status, amount)
+        if week is not None:
+            _bump(self.weeks, week, amount)
+        if week is not None or status in FUNNEL:
+            self.applied += amount
+        if days is not None:
+            if status not in self.days:
+                self.days[status] = Counter()
+            _bump(self.days[status], days, amount)
+        if status == "Applied" and updated is not None:
+            _bump(self.waiting, updated, amount)
+
+    def merged(self, other):
+        # The counts of both; the result cannot take records back out
+        stats = PipelineStats()
+        for source in (self, other):
+            stats.statuses.update(source.statuses)
+            stats.weeks.update(source.weeks)
+            stats.applied += source.applied
+            for status, counts in source.days.items():
+                stats.days.setdefault(status, Counter()).update(counts)
+            stats.waiting.update(source.waiting)
+        return stats
+
+    def to_json(self):
+        return {
+            "statuses": dict(self.statuses),
+            "weeks": dict(self.weeks),
+            "applied": self.applied,
+            "days": {
+                status: {str(days): count for days, count in counts.items()} for status, counts in self.days.items()
+            },
+            "waiting": dict(self.waiting),
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        stats = cls()
+        stats.statuses.update(data["statuses"])
+        stats.weeks.update(data["weeks"])
+        stats.applied = data["applied"]
+        stats.days = {
+            status: Counter({int(days): count for days, count in counts.items()})
+            for status, counts in data["days"].items()
+        }
+        stats.waiting.update(data["waiting"])
+        return stats
+
+    def summary(self, today=None, ghost_days=GHOST_DAYS):
+        today = today or datetime.date.today()
+        cutoff = (today - datetime.timedelta(days=ghost_days)).isoformat()
+        funnel = [
+            ("Applied", self.applied),
+            ("Interview", self.statuses["Interview"] + self.statuses["Offer"]),
+            ("Offer", self.statuses["Offer"]),
+        ]
+        return {
+            "total": len(self),
+            "statuses": dict(self.statuses),
+            "weeks": sorted(self.weeks.items()),
+            "funnel": funnel,
+            "conversion": [
+                (f"{first}→{second}", _rate(reached, entered))
+                for (first, entered), (second, reached) in zip(funnel, funnel[1:])
+            ],
+            "median_days": {status: _median(counts) for status, counts in self.days.items() if counts},
+            "ghosted": sum(count for updated, count in self.waiting.items() if updated < cutoff),
+            "ghost_days": ghost_days,
+        }
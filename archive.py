@@ -0,0 +1,189 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+
+import instrumentation
+from analytics import PipelineStats
+from storage import CSV_COLUMNS, JOBS_FOLDER, KEY_FIELD, JobRecord, job_directory, job_row, read_records
+
+ARCHIVE_FILE = 'jobs_archive.zip'
+ARCHIVE_FOLDER = os.path.join(JOBS_FOLDER, '.archive')
+KEYS_MEMBER = 'keys.txt'
+JOBS_MEMBER = 'jobs.csv'
+STATS_MEMBER = 'stats.json'
+
+
+class JobArchive:
+    # Jobs moved out of the active set, usually rejected ones. One zip holds
+    # their records as CSV next to a list of their keys and their dashboard
+    # counts. A start only reads the keys, so new jobs never take an archived
+    # job's key, and the records are parsed the first time they are asked
+    # for. Packed job directories are zipped into job_positions/.archive, one
+    # file per directory.
+    def __init__(self, path=ARCHIVE_FILE, folder=ARCHIVE_FOLDER):
+        self.path = path
+        self.folder = folder
+        self._jobs = None  # key -> record, once loaded
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._jobs is not None
+
+    def keys(self):
+        with self._lock:
+            if self._jobs is not None:
+                return set(self._jobs)
+            try:
+                with zipfile.ZipFile(self.path) as archive:
+                    return set(archive.read(KEYS_MEMBER).decode('utf-8').splitlines())
+            except FileNotFoundError:
+                return set()
+            except (zipfile.BadZipFile, KeyError) as e:
+                raise ValueError(f"The archive {self.path} is damaged: {e}") from e
+
+    def stats(self):
+        # PipelineStats of the archived jobs, from the counts stored with them
+        with self._lock:
+            if self._jobs is not None:
+                return PipelineStats(self._jobs.values())
+            try:
+                with zipfile.ZipFile(self.path) as archive:
+                    if STATS_MEMBER in archive.namelist():
+                        return PipelineStats.from_json(json.loads(archive.read(STATS_MEMBER)))
+            except FileNotFoundError:
+                return PipelineStats()
+            except (zipfile.BadZipFile, KeyError, ValueError) as e:
+                raise ValueError(f"The archive {self.path} is damaged: {e}") from e
+            # Written before the counts were stored with the records
+            return PipelineStats(self._load().values())
+
+    def load(self):
+        # Copies, so the caller may show or edit them while the archive changes
+        with self._lock:
+            return [job.copy() for job in self._load().values()]
+
+    def _load(self):
+        if self._jobs is None:
+            jobs = {}
+            if os.path.exists(self.path):
+                try:
+                    with instrumentation.span("load_archive", "archive", path=self.path) as span, \
+                            zipfile.ZipFile(self.path) as archive, archive.open(JOBS_MEMBER) as file:
+                        for job in read_records(io.TextIOWrapper(file, encoding='utf-8', newline='')):
+                            jobs[job[KEY_FIELD]] = job
+                        span.read(os.path.getsize(self.path))
+                except (zipfile.BadZipFile, KeyError) as e:
+                    raise ValueError(f"The archive {self.path} is damaged: {e}") from e
+            self._jobs = jobs
+        return self._jobs
+
+    def add(self, jobs, directories=()):
+        # Archives the records, replacing any with the same key, and packs the
+        # directories. The directories stay in place until remove_directories().
+        with self._lock:
+            archived = self._load()
+            with instrumentation.span("archive_jobs", "archive", jobs=len(jobs), directories=len(directories)) as span:
+                for directory in directories:
+                    span.wrote(self._pack(directory))
+                for job in jobs:
+                    archived[job[KEY_FIELD]] = JobRecord.from_dict(job)
+                span.wrote(self._write())
+
+    def restore(self, keys):
+        # Unpacks the jobs' directories and returns copies of their records.
+        # The records stay archived until discard(), so a crash before the
+        # restored jobs were saved loses nothing.
+        with self._lock:
+            archived = self._load()
+            jobs = [archived[key].copy() for key in keys if key in archived]
+            with instrumentation.span("restore_jobs", "archive", jobs=len(jobs)) as span:
+                for job in jobs:
+                    span.read(self._unpack(job_directory(job["Position"], job["Company"], job["ID"])))
+            return jobs
+
+    def discard(self, keys):
+        with self._lock:
+            archived = self._load()
+            removed = [archived.pop(key) for key in keys if key in archived]
+            if removed:
+                self._write()
+            return removed
+
+    def remove_directories(self, directories):
+        # Only directories whose pack landed are removed
+        for directory in directories:
+            if os.path.exists(self._pack_path(directory)) and os.path.isdir(directory):
+                shutil.rmtree(directory)
+
+    def _pack_path(self, directory):
+        return os.path.join(self.folder, os.path.basename(os.path.normpath(directory)) + '.zip')
+
+    def _pack(self, directory):
+        if not os.path.isdir(directory):
+            return 0
+        os.makedirs(self.folder, exist_ok=True)
+        pack_path = self._pack_path(directory)
+        fd, tmp_path = tempfile.mkstemp(prefix='.pack-', dir=self.folder)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                with zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as pack:
+                    for root, _, files in os.walk(directory):
+                        for name in files:
+                            path = os.path.join(root, name)
+                            pack.write(path, os.path.relpath(path, directory))
+                size = file.tell()
+            os.replace(tmp_path, pack_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return size
+
+    def _unpack(self, directory):
+        # Files that exist again in the meantime are kept as they are
+        pack_path = self._pack_path(directory)
+        if not os.path.exists(pack_path):
+            return 0
+        with zipfile.ZipFile(pack_path) as pack:
+            for member in pack.infolist():
+                if not os.path.exists(os.path.join(directory, member.filename)):
+                    pack.extract(member, directory)
+        size = os.path.getsize(pack_path)
+        os.remove(pack_path)
+        return size
+
+    def _write(self):
+        # Replaced as a whole, like jobs.csv; an empty archive is removed
+        if not self._jobs:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return 0
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(job_row(job) for job in self._jobs.values())
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.jobs_archive-', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                with zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as archive:
+                    archive.writestr(KEYS_MEMBER, "\n".join(self._jobs))
+                    archive.writestr(JOBS_MEMBER, text.getvalue())
+                    archive.writestr(STATS_MEMBER, json.dumps(PipelineStats(self._jobs.values()).to_json()))
+                file.flush()
+                os.fsync(file.fileno())
+                size = file.tell()
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return size
@@ -0,0 +1,106 @@
+import csv
+import errno
+import os
+import random
+import shutil
+
+from job_core import APPLICATION_STATUSES
+from storage import CSV_COLUMNS, CSV_FILE, JOBS_FOLDER, KEY_FIELD, job_directory, job_row
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+COMPLETE_MARKER = '.complete'
+
+STATUS_WEIGHTS = [10, 45, 10, 33, 2]  # For APPLICATION_STATUSES, like a typical search
+POSITIONS = [
+    "Software Engineer", "Data Scientist", "Product Manager", "QA Engineer", "DevOps Engineer",
+    "Backend Developer", "Frontend Developer", "Machine Learning Engineer", "Technical Writer",
+    "Site Reliability Engineer", "Data Analyst", "Engineering Manager",
+]
+COMPANIES = [
+    "Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises",
+    "Cyberdyne", "Soylent", "Tyrell", "Aperture", "Black Mesa", "Vandelay", "Wonka",
+]
+DOCUMENT_SIZE = 32 * 1024
+LINKS_PER_DOCUMENT = 20_000  # Stays well below the hardlink limit of common filesystems
+
+
+def dataset_path(rows, root=DATA_FOLDER):
+    return os.path.join(root, str(rows))
+
+
+def _place(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+            raise
+        shutil.copyfile(source, destination)
+
+
+def _documents(root, count, rng):
+    # A handful of resumes and cover letters shared by many jobs, as in a real search
+    folder = os.path.join(root, 'documents')
+    os.makedirs(folder)
+    documents = []
+    for number in range(count):
+        paths = []
+        for kind in ("Resume", "Cover_Letter"):
+            path = os.path.join(folder, f"{kind}_{number}.pdf")
+            with open(path, 'wb') as file:
+                file.write(rng.randbytes(DOCUMENT_SIZE))
+            paths.append(path)
+        documents.append(paths)
+    return documents
+
+
+def generate(rows, root=DATA_FOLDER, tree=True, seed=0):
+    # Builds <root>/<rows>/jobs.csv and, with tree, the matching job_positions
+    # folders. A finished dataset is reused; a half-written one is rebuilt.
+    path = dataset_path(rows, root)
+    marker = os.path.join(path, COMPLETE_MARKER)
+    if os.path.exists(marker):
+        with open(marker, encoding='utf-8') as file:
+            if file.read().strip() == "tree" or not tree:
+                return path
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+    rng = random.Random(seed)
+    documents = _documents(path, rows // LINKS_PER_DOCUMENT + 1, rng) if tree else []
+    with open(os.path.join(path, CSV_FILE), mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_COLUMNS)
+        for number in range(rows):
+            position = rng.choice(POSITIONS)
+            company = f"{rng.choice(COMPANIES)} {rng.randrange(1000)}"
+            job_id = f"R{number:07d}"
+            status = rng.choices(APPLICATION_STATUSES, STATUS_WEIGHTS)[0]
+            job_dir = job_directory(position, company, job_id)
+            job = {
+                "Position": position,
+                "Company": company,
+                "ID": job_id,
+                "Status": status,
+                "Last Updated": f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+                "Candidate Home Link": f"https://careers.example.com/{job_id}",
+                "Submitted": "2024-01-01" if status != "Not started" else "",
+                KEY_FIELD: job_id,
+            }
+            if tree:
+                os.makedirs(os.path.join(path, job_dir))
+                job["Snapshot"] = os.path.join(job_dir, "snapshot.html")
+                with open(os.path.join(path, job["Snapshot"]), 'w', encoding='utf-8') as snapshot:
+                    snapshot.write(f"<html><body><h1>{position} at {company}</h1><p>{job_id}</p></body></html>\n")
+                resume, cover_letter = documents[number // LINKS_PER_DOCUMENT]
+                job["Resume/CV"] = os.path.join(job_dir, "Resume.pdf")
+                job["Cover Letter"] = os.path.join(job_dir, "Cover_Letter.pdf")
+                _place(resume, os.path.join(path, job["Resume/CV"]))
+                _place(cover_letter, os.path.join(path, job["Cover Letter"]))
+            writer.writerow(job_row(job))
+
+    if not tree:
+        os.makedirs(os.path.join(path, JOBS_FOLDER))
+    with open(marker, 'w', encoding='utf-8') as file:
+        file.write("tree\n" if tree else "csv\n")
+    return path
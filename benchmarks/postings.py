@@ -0,0 +1,216 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.datasets import COMPANIES, POSITIONS
+
+# A local stand-in for job boards, so ingest can be tried and measured
+# offline. /jobs/N is a posting; every fourth one is written a different way:
+#   N % 4 == 0  schema.org JobPosting in JSON-LD, as most boards do
+#   N % 4 == 1  the JobPosting inside an @graph, with a nested identifier
+#   N % 4 == 2  Open Graph tags only
+#   N % 4 == 3  a <title> of "Position at Company" only
+# Other paths test the client: /flaky/N answers 503 the first time,
+# /limited/N 429 with Retry-After the first time, /moved/N redirects to
+# /jobs/N and /missing/N is a 404. /chunked/N sends the posting with chunked
+# encoding and /streamed/N without a length, ending it by closing the
+# connection; both pad it to PADDED_SIZE and write it in pieces.
+PATH = re.compile(r"^/(jobs|flaky|limited|moved|missing|chunked|streamed)/(\d+)$")
+RETRY_AFTER = 1  # Seconds, sent with the 429s
+PADDED_SIZE = 512 * 1024
+PIECE_SIZE = 8 * 1024
+
+
+def posting(number, seed=0):
+    # (position, company) of posting number, the same for every run
+    rng = random.Random(seed * 1_000_003 + number)
+    return rng.choice(POSITIONS), rng.choice(COMPANIES)
+
+
+def posting_page(number, seed=0):
+    position, company = posting(number, seed)
+    job_id = f"P{number}"
+    head = ""
+    kind = number % 4
+    if kind == 0:
+        head = _json_ld({
+            "@context": "https://schema.org", "@type": "JobPosting", "title": position,
+            "hiringOrganization": {"@type": "Organization", "name": company}, "identifier": job_id,
+        })
+    elif kind == 1:
+        head = _json_ld({"@context": "https://schema.org", "@graph": [
+            {"@type": "WebPage", "name": "Careers"},
+            {"@type": "JobPosting", "title": position, "hiringOrganization": company,
+             "identifier": {"@type": "PropertyValue", "name": company, "value": job_id}},
+        ]})
+    elif kind == 2:
+        head = (f'<meta property="og:title" content="{escape(position)}">'
+                f'<meta property="og:site_name" content="{escape(company)}">')
+    title = f"{position} at {company}" if kind == 3 else f"Careers - {company}"
+    body = "".join(f"<p>{escape(position)} paragraph {line}: what you will do at {escape(company)}.</p>"
+                   for line in range(40))
+    return (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{escape(title)}</title>{head}</head>"
+            f"<body><h1>{escape(position)}</h1>{body}</body></html>").encode("utf-8")
+
+
+def padded_page(number, seed=0):
+    page = posting_page(number, seed)
+    return page + b" " * max(PADDED_SIZE - len(page), 0)
+
+
+def _json_ld(document):
+    return f'<script type="application/ld+json">{json.dumps(document)}</script>'
+
+
+class PostingServer(ThreadingHTTPServer):
+    # with PostingServer() as server: ingest(server.urls(10)). Serves on a
+    # free port of 127.0.0.1 from a background thread. latency is added to
+    # every answer, like a remote server's. The counters and the log of
+    # (time.monotonic(), path) per request are what tests/test_ingest.py checks.
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, seed=0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.seed = seed
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.log = []
+        self._failed = set()  # paths that already answered with an error once
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def urls(self, count, kind="jobs", start=1):
+        return [f"{self.base_url}/{kind}/{number}" for number in range(start, start + count)]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="postings", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def handle_error(self, request, client_address):
+        # A client that stops reading, like one refusing an oversize posting, is not an error here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def fail_once(self, path):
+        # True the first time a path is asked for
+        with self._lock:
+            if path in self._failed:
+                return False
+            self._failed.add(path)
+            return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server._lock:
+            server.requests += 1
+            server.log.append((time.monotonic(), self.path))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            self.answer()
+        finally:
+            with server._lock:
+                server.active -= 1
+
+    def answer(self):
+        match = PATH.match(self.path)
+        if match is None or match.group(1) == "missing":
+            self.send(404, b"Not found", "text/plain")
+            return
+        kind, number = match.group(1), int(match.group(2))
+        if kind == "moved":
+            self.send(301, b"", "text/plain", {"Location": f"/jobs/{number}"})
+        elif kind == "flaky" and self.server.fail_once(self.path):
+            self.send(503, b"Try again", "text/plain")
+        elif kind == "limited" and self.server.fail_once(self.path):
+            self.send(429, b"Slow down", "text/plain", {"Retry-After": str(RETRY_AFTER)})
+        elif kind == "chunked":
+            self.send_chunked(padded_page(number, self.server.seed))
+        elif kind == "streamed":
+            self.send_streamed(padded_page(number, self.server.seed))
+        else:
+            self.send(200, posting_page(number, self.server.seed), "text/html; charset=utf-8")
+
+    def send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunked(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for start in range(0, len(body), PIECE_SIZE):
+            piece = body[start:start + PIECE_SIZE]
+            self.wfile.write(f"{len(piece):x}\r\n".encode("ascii") + piece + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def send_streamed(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for start in range(0, len(body), PIECE_SIZE):
+            self.wfile.write(body[start:start + PIECE_SIZE])
+            self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.postings",
+                                     description="Serve made-up job postings for trying ingest offline.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--count", type=int, default=10, help="posting addresses to print")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every answer")
+    args = parser.parse_args(argv)
+    with PostingServer(args.port, args.latency) as server:
+        print("\n".join(server.urls(args.count)), flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,137 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+
+from benchmarks.datasets import DATA_FOLDER, SIZES, generate
+from benchmarks.suite import BENCHMARKS, workspace
+
+DEFAULT_SIZES = SIZES[:3]  # The 1M dataset takes a while to build; ask for it explicitly
+THRESHOLD = 0.10   # Slower than the baseline by more than this fraction counts as a regression
+NOISE_FLOOR = 0.001  # Seconds; differences below this are never reported
+
+
+def qt_version():
+    try:
+        from PyQt5.QtCore import PYQT_VERSION_STR
+    except ImportError:
+        return None
+    return PYQT_VERSION_STR
+
+
+def run(sizes, names, repeat=3, data=DATA_FOLDER, tree=True, log=sys.stderr):
+    qt = qt_version()
+    if qt is not None:
+        # Must be set before the first QApplication
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pyqt": qt,
+        "repeat": repeat,
+        "results": {},
+        "skipped": [],
+    }
+    for rows in sizes:
+        print(f"Preparing {rows} jobs", file=log)
+        dataset = generate(rows, data, tree)
+        results = report["results"][str(rows)] = {}
+        for name in names:
+            function, needs_qt = BENCHMARKS[name]
+            if needs_qt and qt is None:
+                if name not in report["skipped"]:
+                    report["skipped"].append(name)
+                continue
+            runs = {}
+            for _ in range(repeat):
+                with workspace(dataset):
+                    for metric, seconds in function(rows).items():
+                        runs.setdefault(metric, []).append(seconds)
+            for metric, times in runs.items():
+                results[metric] = {
+                    "median": statistics.median(times),
+                    "min": min(times),
+                    "runs": times,
+                }
+                print(f"  {metric:<28} {results[metric]['median'] * 1000:10.1f} ms", file=log)
+    return report
+
+
+def compare(report, baseline, threshold=THRESHOLD):
+    # Adds a "comparison" section and returns the metrics that got slower
+    comparison = {}
+    regressions = []
+    for rows, results in report["results"].items():
+        for metric, result in results.items():
+            previous = baseline.get("results", {}).get(rows, {}).get(metric)
+            if previous is None:
+                continue
+            ratio = result["median"] / previous["median"] if previous["median"] else float("inf")
+            if abs(result["median"] - previous["median"]) < NOISE_FLOOR:
+                status = "unchanged"
+            elif ratio > 1 + threshold:
+                status = "regressed"
+                regressions.append(f"{metric} at {rows} rows")
+            elif ratio < 1 - threshold:
+                status = "improved"
+            else:
+                status = "unchanged"
+            comparison.setdefault(rows, {})[metric] = {
+                "baseline": previous["median"],
+                "current": result["median"],
+                "ratio": round(ratio, 3),
+                "status": status,
+            }
+    report["comparison"] = comparison
+    report["threshold"] = threshold
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Time the hot paths of NextStep on synthetic job searches.",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help=f"dataset sizes in jobs (default: {' '.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), default=list(BENCHMARKS),
+                        metavar="NAME", help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the median is reported")
+    parser.add_argument("--data", default=DATA_FOLDER, help="where generated datasets are kept")
+    parser.add_argument("--no-tree", action="store_true", help="generate jobs.csv only, without job_positions")
+    parser.add_argument("--output", help="write the JSON report here instead of standard output")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="fraction a metric may slow down before it counts as a regression")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (_, needs_qt) in BENCHMARKS.items():
+            print(f"{name}{' (needs PyQt5)' if needs_qt else ''}")
+        return 0
+
+    report = run(args.sizes, args.only, args.repeat, os.path.abspath(args.data), not args.no_tree)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(report, json.load(file), args.threshold)
+    if report["skipped"]:
+        print(f"Skipped without PyQt5: {', '.join(report['skipped'])}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,244 @@
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from job_core import create_job_directory, plan_delete, plan_new_job
+from job_store import JobStore
+from journal import Journal
+from storage import CSV_FILE, JOBS_FOLDER, KEY_FIELD, CsvBackend, load_jobs, save_jobs
+
+STATUS_UPDATES = 1000
+FLOW_JOBS = 50  # Jobs added, duplicated and deleted by the flow benchmark
+NEW_DIRECTORIES = 1000
+NEW_POSTINGS = 200
+POSTING_LATENCY = 0.05  # Seconds the stand-in server takes per answer, like a remote one
+
+BENCHMARKS = {}  # name -> (function, needs Qt)
+
+
+def benchmark(name, qt=False):
+    # A benchmark runs inside a scratch workspace and returns {metric: seconds}
+    def register(function):
+        BENCHMARKS[name] = (function, qt)
+        return function
+    return register
+
+
+@contextmanager
+def workspace(dataset):
+    # A private copy of jobs.csv next to the shared job_positions tree, which
+    # is linked in rather than copied. Benchmarks remove what they create there.
+    path = tempfile.mkdtemp(prefix='run-', dir=os.path.dirname(os.path.abspath(dataset)))
+    shutil.copy2(os.path.join(dataset, CSV_FILE), path)
+    os.symlink(os.path.abspath(os.path.join(dataset, JOBS_FOLDER)), os.path.join(path, JOBS_FOLDER))
+    blobs = os.path.join(dataset, JOBS_FOLDER, '.blobs')
+    had_blobs = os.path.exists(blobs)
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(path)
+        if not had_blobs:
+            shutil.rmtree(blobs, ignore_errors=True)
+
+
+class Stopwatch:
+    def __init__(self):
+        self.results = {}
+
+    @contextmanager
+    def measure(self, metric):
+        start = time.perf_counter()
+        yield
+        self.results[metric] = time.perf_counter() - start
+
+
+@benchmark("load_jobs")
+def bench_load_jobs(rows):
+    watch = Stopwatch()
+    with watch.measure("load_jobs"):
+        load_jobs(CSV_FILE)
+    return watch.results
+
+
+@benchmark("save_jobs")
+def bench_save_jobs(rows):
+    jobs = load_jobs(CSV_FILE)
+    watch = Stopwatch()
+    with watch.measure("save_jobs"):
+        save_jobs(jobs, CSV_FILE)
+    return watch.results
+
+
+@benchmark("job_store")
+def bench_job_store(rows):
+    watch = Stopwatch()
+    with watch.measure("job_store_load"):
+        store = JobStore(CsvBackend(CSV_FILE))
+    keys = [job[KEY_FIELD] for job in store.jobs[:STATUS_UPDATES]]
+    with watch.measure("job_store_status_updates"):
+        for key in keys:
+            store.update(store.get(key), {"Status": "Interview", "Last Updated": "2025-01-01"})
+    with watch.measure("job_store_flush"):
+        store.close()
+    # The close left a cache of the records as written
+    with watch.measure("job_store_load_cached"):
+        store = JobStore(CsvBackend(CSV_FILE), journal=Journal())
+    # With a journal the same edits are appended instead of rewriting the file
+    for key in keys:
+        store.update(store.get(key), {"Status": "Applied", "Last Updated": "2025-01-02"})
+    with watch.measure("job_store_journal_flush"):
+        store.flush()
+    with watch.measure("job_store_journal_replay"):
+        JobStore(CsvBackend(CSV_FILE), journal=Journal())
+    with watch.measure("job_store_compact"):
+        store.close()
+    return watch.results
+
+
+@benchmark("create_job_directory")
+def bench_create_job_directory(rows):
+    watch = Stopwatch()
+    with watch.measure("create_job_directory"):
+        paths = [create_job_directory("Benchmark Position", "Benchmark Company", f"B{number}")
+                 for number in range(NEW_DIRECTORIES)]
+    for path in paths:
+        os.rmdir(path)
+    return watch.results
+
+
+@benchmark("ingest_postings")
+def bench_ingest_postings(rows):
+    from benchmarks.postings import PostingServer
+    from ingest import ingest_postings
+
+    store = JobStore(CsvBackend(CSV_FILE))
+    watch = Stopwatch()
+    with PostingServer(latency=POSTING_LATENCY) as server:
+        # One host, so the per-host spacing is turned off to measure the pool
+        with watch.measure("ingest_postings"):
+            jobs, _, errors = ingest_postings(store, server.urls(NEW_POSTINGS), interval=0)
+    if errors:
+        raise RuntimeError(f"{len(errors)} postings failed, the first: {errors[0][1]}")
+    for job in jobs:
+        shutil.rmtree(os.path.dirname(job["Snapshot"]))
+    return watch.results
+
+
+def _application():
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication(["nextstep-benchmarks"])
+
+
+def _wait(app, done, timeout=600):
+    from PyQt5.QtCore import QEventLoop
+    deadline = time.monotonic() + timeout
+    while not done():
+        if time.monotonic() > deadline:
+            raise TimeoutError("The window did not finish in time")
+        app.processEvents(QEventLoop.AllEvents, 10)
+
+
+@contextmanager
+def _window(watch=None):
+    # The real main window, offscreen. With a watch it is timed until the first
+    # page is shown and until every job is loaded.
+    import job_manager_gui
+
+    app = _application()
+    first_page = []
+    start = time.perf_counter()
+    window = job_manager_gui.JobManagerGUI()
+    window.loader.chunk_loaded.connect(
+        lambda *args: first_page or first_page.append(time.perf_counter() - start)
+    )
+    window.show()
+    _wait(app, lambda: window.loader.isFinished() and window.store.loaded)
+    app.processEvents()
+    if watch is not None:
+        watch.results["populate_jobs"] = time.perf_counter() - start
+        if first_page:
+            watch.results["populate_jobs_first_page"] = first_page[0]
+    try:
+        yield app, window
+    finally:
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+
+
+@benchmark("populate_jobs", qt=True)
+def bench_populate_jobs(rows):
+    watch = Stopwatch()
+    with _window(watch):
+        pass
+    # Unchanged file: records and layout come from the caches the first window left
+    cached = Stopwatch()
+    with _window(cached):
+        pass
+    watch.results.update((f"{metric}_cached", seconds) for metric, seconds in cached.results.items())
+    return watch.results
+
+
+@benchmark("gui_status_updates", qt=True)
+def bench_gui_status_updates(rows):
+    watch = Stopwatch()
+    with _window() as (app, window):
+        keys = [window.proxy.key(row) for row in range(min(STATUS_UPDATES, window.proxy.rowCount()))]
+        with watch.measure("gui_status_updates"):
+            for key in keys:
+                window.update_status(key, "Interview")
+            app.processEvents()
+    return watch.results
+
+
+@benchmark("hide_rejected", qt=True)
+def bench_hide_rejected(rows):
+    watch = Stopwatch()
+    with _window() as (app, window):
+        with watch.measure("hide_rejected"):
+            window.hide_rejected_checkbox.setChecked(True)
+            app.processEvents()
+        with watch.measure("show_rejected"):
+            window.hide_rejected_checkbox.setChecked(False)
+            app.processEvents()
+    return watch.results
+
+
+@benchmark("job_flows", qt=True)
+def bench_job_flows(rows):
+    # Add, duplicate and delete through the window, files and all, the way
+    # the dialogs do once they are accepted
+    watch = Stopwatch()
+    with _window() as (app, window):
+        template = window.store.jobs[0]
+        added = []
+        with watch.measure("add_jobs"):
+            for number in range(FLOW_JOBS):
+                job, operations = plan_new_job(
+                    template["Position"], template["Company"], f"B{number:05d}", "Not started",
+                    resume=template["Resume/CV"], cover_letter=template["Cover Letter"], blobs=window.blobs
+                )
+                key = window.store.reserve_key(job)
+                window.run_file_task(key, operations, lambda job=job: window.store.add(job), pending_job=job)
+                added.append(key)
+            _wait(app, lambda: not window.file_callbacks)
+
+        before = {job[KEY_FIELD] for job in window.store}
+        with watch.measure("duplicate_jobs"):
+            for key in added:
+                window.duplicate_job(key)
+            _wait(app, lambda: not window.file_callbacks)
+        added += [job[KEY_FIELD] for job in window.store if job[KEY_FIELD] not in before]
+
+        with watch.measure("delete_jobs"):
+            for key in added:
+                job = window.store.get(key)
+                operations = plan_delete(window.store, key, keep_files=False)
+                window.run_file_task(key, operations, lambda job=job: window.remove_job(job))
+            _wait(app, lambda: not window.file_callbacks)
+    return watch.results
@@ -0,0 +1,235 @@
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+
+from storage import JOBS_FOLDER
+
+BLOBS_FOLDER = os.path.join(JOBS_FOLDER, '.blobs')
+CHUNK_SIZE = 1024 * 1024
+FICLONE = 0x40049409  # Linux ioctl that shares extents between two files
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reflink(source, destination):
+    # Copy-on-write clone where the filesystem supports it (Btrfs, XFS, APFS)
+    if sys.platform.startswith('linux'):
+        import fcntl
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    if sys.platform == 'darwin':
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(source), os.fsencode(destination), 0) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        return True
+    return False
+
+
+def _probe_reflink(directory):
+    # Clones a one-byte file in directory; True when the filesystem allowed it
+    fd, source = tempfile.mkstemp(prefix='.probe-', dir=directory)
+    clone = source + '.clone'
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(b'\0')
+        try:
+            return _reflink(source, clone)
+        except OSError:
+            return False
+    finally:
+        for path in (source, clone):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _existing(path):
+    # path, or the nearest folder above it that exists
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+
+def detach(path):
+    # Documents used to be hardlinked to their blob, sharing their bytes with
+    # every other job, and such a file gets its own copy before it is edited.
+    # New documents are never hardlinked; reflinks copy on write anyway.
+    if not os.path.isfile(path) or os.stat(path).st_nlink < 2:
+        return False
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.detach-', dir=directory)
+    os.close(fd)
+    try:
+        shutil.copy2(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+class BlobStore:
+    def __init__(self, root=BLOBS_FOLDER):
+        self.root = root
+        self._reflinks = {}  # st_dev -> whether that volume can clone files
+
+    def reflinks(self, directory):
+        # Whether files in directory can be cloned from the blobs, probed once
+        # per volume. Without clones a blob is one more full copy to write and
+        # sync, so documents are copied straight into place instead.
+        device = os.stat(directory).st_dev
+        if device != os.stat(_existing(self.root)).st_dev:
+            return False
+        if device not in self._reflinks:
+            self._reflinks[device] = _probe_reflink(directory)
+        return self._reflinks[device]
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, path, progress=None, cancelled=None):
+        # Hash while copying, so a new file is read only once
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.put-', dir=self.root)
+        digest = hashlib.sha256()
+        try:
+            with open(path, 'rb') as source, os.fdopen(fd, 'wb') as destination:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    if cancelled is not None:
+                        cancelled()
+                    digest.update(chunk)
+                    destination.write(chunk)
+                    if progress is not None:
+                        progress(len(chunk))
+            blob = self.blob_path(digest.hexdigest())
+            if os.path.exists(blob):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                shutil.copystat(path, tmp_path)
+                os.replace(tmp_path, blob)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest.hexdigest()
+
+    def link(self, digest, destination):
+        # Returns how the file was placed: "reflink" or "copy". Never a
+        # hardlink: a document edited in place by another program (an editor,
+        # a sync client) would change the blob and every job's copy with it.
+        blob = self.blob_path(digest)
+        directory = os.path.dirname(os.path.abspath(destination))
+        fd, tmp_path = tempfile.mkstemp(prefix='.link-', dir=directory)
+        os.close(fd)
+        os.remove(tmp_path)
+        try:
+            method = self._place(blob, tmp_path)
+            os.replace(tmp_path, destination)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return method
+
+    def _place(self, blob, path):
+        try:
+            if _reflink(blob, path):
+                shutil.copystat(blob, path)
+                return "reflink"
+        except OSError:
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.copy2(blob, path)
+        return "copy"
+
+    def dedupe(self, root=JOBS_FOLDER):
+        # Collapse identical files under job_positions onto shared blobs, as
+        # reflinks. Files hardlinked by earlier versions get their own copies;
+        # on a volume that cannot clone, that is all there is to do.
+        root = os.path.abspath(root)
+        blobs = os.path.abspath(self.root)
+        shared = os.path.isdir(root) and self.reflinks(root)
+        by_size = {}
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = [name for name in dirs if os.path.abspath(os.path.join(directory, name)) != blobs]
+            for name in files:
+                path = os.path.join(directory, name)
+                if os.path.isfile(path) and not os.path.islink(path):
+                    detach(path)
+                    if shared:
+                        by_size.setdefault(os.path.getsize(path), []).append(path)
+
+        linked = 0
+        saved = 0
+        for size, paths in by_size.items():
+            # Only files that share a size can share content
+            if len(paths) < 2:
+                continue
+            by_hash = {}
+            for path in paths:
+                by_hash.setdefault(file_hash(path), []).append(path)
+            for digest, same in by_hash.items():
+                if len(same) < 2:
+                    continue
+                blob = self.blob_path(digest)
+                created = not os.path.exists(blob)
+                if created:
+                    self.put(same[0])
+                count = 0
+                for path in same:
+                    if self.link(digest, path) == "copy":
+                        break  # The filesystem cannot share files; nothing to gain
+                    count += 1
+                # A freshly created blob costs one copy of its own
+                linked += count
+                saved += max(0, count - created) * size
+        return linked, saved
+
+    def prune(self):
+        # Blobs no job is hardlinked to any more are dropped. Reflinked copies
+        # own their extents, so removing the blob never affects them. Folders
+        # left empty go too, so a volume that cannot clone keeps no blob tree.
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        for directory, _, files in os.walk(self.root, topdown=False):
+            for name in files:
+                path = os.path.join(directory, name)
+                if os.stat(path).st_nlink == 1:
+                    os.remove(path)
+                    removed += 1
+            if not os.listdir(directory):
+                os.rmdir(directory)
+        return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the shared document store under job_positions.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    dedupe_parser = subparsers.add_parser("dedupe", help="replace identical resumes and cover letters with links")
+    dedupe_parser.add_argument("--prune", action="store_true", help="also remove blobs no job refers to")
+    args = parser.parse_args(argv)
+
+    store = BlobStore()
+    linked, saved = store.dedupe()
+    print(f"Linked {linked} files, {saved / (1024 * 1024):.1f} MB shared")
+    if args.prune:
+        print(f"Removed {store.prune()} unused blobs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import Qt, QObject, QRect, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QPainter, QPixmap
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QSpinBox, QCheckBox, QSizePolicy
+)
+
+from analytics import GHOST_DAYS, PipelineStats
+from jobs_model import STATUS_COLORS, DEFAULT_STATUS_COLOR
+
+WEEKS_SHOWN = 26
+REFRESH_DELAY = 300  # Milliseconds of quiet before edits redraw the charts
+BAR_COLOR = QColor(100, 149, 237)  # Cornflower Blue
+MARGIN = 12
+
+
+def _draw_bars(painter, rect, title, bars):
+    # bars: [(label, value, color)], drawn bottom-up with the value on top
+    metrics = painter.fontMetrics()
+    line = metrics.height()
+    painter.setPen(Qt.black)
+    painter.drawText(rect.x(), rect.y() + line, title)
+    if not bars:
+        return
+    area = QRect(rect.x(), rect.y() + 2 * line + MARGIN // 2, rect.width(), rect.height() - 4 * line - MARGIN // 2)
+    peak = max(value for _, value, _ in bars) or 1
+    slot = area.width() / len(bars)
+    # Labels that would overlap are thinned out, the bars never are
+    widest = max(metrics.horizontalAdvance(label) for label, _, _ in bars) + 6
+    every = max(1, int(widest // slot) + 1)
+    for number, (label, value, color) in enumerate(bars):
+        x = int(area.x() + number * slot)
+        height = int(area.height() * value / peak)
+        bar = QRect(x + 2, area.bottom() - height, max(1, int(slot) - 4), height)
+        painter.fillRect(bar, color)
+        painter.setPen(Qt.darkGray)
+        painter.drawRect(bar)
+        painter.setPen(Qt.black)
+        if number % every == 0:
+            label_rect = QRect(x - int(slot), area.bottom() + 2, int(slot) * 3, line)
+            painter.drawText(label_rect, Qt.AlignHCenter | Qt.AlignTop, label)
+        if slot >= metrics.horizontalAdvance(str(value)):
+            painter.drawText(QRect(x, bar.top() - line, int(slot), line), Qt.AlignHCenter, str(value))
+
+
+def render_dashboard(summary, width, height):
+    # Runs on the dashboard's worker thread: painting a QImage needs no GUI thread
+    image = QImage(max(width, 1), max(height, 1), QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.white)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    half_width = (width - 3 * MARGIN) // 2
+    half_height = (height - 3 * MARGIN) // 2
+
+    statuses = [
+        (status, count, STATUS_COLORS.get(status, DEFAULT_STATUS_COLOR))
+        for status, count in sorted(summary["statuses"].items(), key=lambda item: -item[1])
+    ]
+    _draw_bars(painter, QRect(MARGIN, MARGIN, half_width, half_height), "Jobs per status", statuses)
+
+    funnel = [(stage, count, STATUS_COLORS.get(stage, BAR_COLOR)) for stage, count in summary["funnel"]]
+    _draw_bars(painter, QRect(2 * MARGIN + half_width, MARGIN, half_width, half_height), "Funnel", funnel)
+
+    weeks = [(week[5:], count, BAR_COLOR) for week, count in summary["weeks"][-WEEKS_SHOWN:]]
+    _draw_bars(
+        painter, QRect(MARGIN, 2 * MARGIN + half_height, width - 2 * MARGIN, half_height),
+        f"Applications per week (last {WEEKS_SHOWN}, by Submitted)", weeks
+    )
+    painter.end()
+    return image
+
+
+def describe(summary):
+    lines = [f"{summary['total']} jobs"]
+    for name, rate in summary["conversion"]:
+        lines.append(f"{name}: {'n/a' if rate is None else f'{rate:.0%}'}")
+    medians = ", ".join(
+        f"{status} {days:g} days" for status, days in sorted(summary["median_days"].items())
+    )
+    if medians:
+        lines.append(f"Median time from Submitted to the current status: {medians}")
+    lines.append(f"Ghosted (Applied, no update for {summary['ghost_days']} days): {summary['ghosted']}")
+    return "\n".join(lines)
+
+
+class DashboardSignals(QObject):
+    # Carries worker results to the GUI thread
+    rendered = pyqtSignal(object, int)  # QImage, generation it was drawn for
+    archive_read = pyqtSignal(object)   # PipelineStats of the archive
+    failed = pyqtSignal(str)
+
+
+class DashboardDialog(QDialog):
+    # Reads the counts the model keeps up to date; nothing here walks the jobs.
+    # Archived jobs are counted from the totals stored with the archive.
+    def __init__(self, model, archive, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.archive = archive
+        self.archive_stats = PipelineStats()
+        self.generation = 0  # Renders for an older state are dropped
+        self.setWindowTitle("Dashboard")
+        self.setGeometry(150, 150, 900, 600)
+
+        self.chart = QLabel()
+        self.chart.setMinimumSize(400, 300)
+        self.chart.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
+        self.summary_label = QLabel()
+        self.summary_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+
+        self.ghost_days = QSpinBox()
+        self.ghost_days.setRange(1, 365)
+        self.ghost_days.setValue(GHOST_DAYS)
+        self.ghost_days.setPrefix("Ghosted after ")
+        self.ghost_days.setSuffix(" days")
+        self.ghost_days.valueChanged.connect(self.schedule_refresh)
+        self.archived_checkbox = QCheckBox("Include archived jobs")
+        self.archived_checkbox.setChecked(True)
+        self.archived_checkbox.toggled.connect(self.schedule_refresh)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.close)
+
+        controls = QHBoxLayout()
+        controls.addWidget(self.ghost_days)
+        controls.addWidget(self.archived_checkbox)
+        controls.addStretch()
+        controls.addWidget(close_button)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.chart, 1)
+        layout.addWidget(self.summary_label)
+        layout.addLayout(controls)
+        self.setLayout(layout)
+
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dashboard")
+        self.signals = DashboardSignals(self)
+        self.signals.rendered.connect(self.show_chart)
+        self.signals.archive_read.connect(self.archive_read)
+        self.signals.failed.connect(self.summary_label.setText)
+
+        # A burst of edits, such as a batch status change, redraws once
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(REFRESH_DELAY)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.model.stats_changed.connect(self.schedule_refresh)
+        self.archive_changed()
+
+    def _submit(self, signal, function, *args):
+        future = self.worker.submit(function, *args)
+        future.add_done_callback(lambda future: self._done(future, signal))
+
+    def _done(self, future, signal):
+        # Runs on the worker thread
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            signal(future.result())
+        else:
+            self.signals.failed.emit(str(error))
+
+    def archive_changed(self):
+        self._submit(self.signals.archive_read.emit, self.archive.stats)
+
+    def archive_read(self, stats):
+        self.archive_stats = stats
+        self.schedule_refresh()
+
+    def schedule_refresh(self):
+        if self.isVisible():
+            self.refresh_timer.start()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.schedule_refresh()
+
+    def refresh(self):
+        stats = self.model.stats
+        if self.archived_checkbox.isChecked():
+            stats = stats.merged(self.archive_stats)
+        summary = stats.summary(ghost_days=self.ghost_days.value())
+        self.summary_label.setText(describe(summary))
+        self.generation += 1
+        generation = self.generation
+        size = self.chart.size()
+        self._submit(
+            lambda image: self.signals.rendered.emit(image, generation),
+            render_dashboard, summary, size.width(), size.height()
+        )
+
+    def show_chart(self, image, generation):
+        if generation == self.generation:
+            self.chart.setPixmap(QPixmap.fromImage(image))
+
+    def closeEvent(self, event):
+        self.refresh_timer.stop()
+        super().closeEvent(event)
+
+    def shutdown(self):
+        self.worker.shutdown(cancel_futures=True)
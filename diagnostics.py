@@ -0,0 +1,113 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView,
+    QPushButton, QLabel, QFileDialog, QMessageBox
+)
+
+import instrumentation
+
+DIAGNOSTICS_COLUMNS = ["Name", "Category", "Calls", "Total (ms)", "Mean (ms)", "Max (ms)", "Read", "Written"]
+
+
+def format_bytes(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024 or unit == "GB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+
+
+class NumericItem(QTableWidgetItem):
+    # Sorts by the raw number rather than the formatted text
+    def __init__(self, text, value):
+        super().__init__(text)
+        self.value = value
+        self.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+
+    def __lt__(self, other):
+        if isinstance(other, NumericItem):
+            return self.value < other.value
+        return super().__lt__(other)
+
+
+class DiagnosticsDialog(QDialog):
+    def __init__(self, recorder=instrumentation.recorder, parent=None):
+        super().__init__(parent)
+        self.recorder = recorder
+        self.setWindowTitle("Diagnostics")
+        self.setGeometry(150, 150, 800, 400)
+
+        self.table = QTableWidget(0, len(DIAGNOSTICS_COLUMNS))
+        self.table.setHorizontalHeaderLabels(DIAGNOSTICS_COLUMNS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setSortingEnabled(True)
+
+        self.totals_label = QLabel()
+
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset)
+        export_json_button = QPushButton("Export JSON")
+        export_json_button.clicked.connect(self.export_json)
+        export_trace_button = QPushButton("Export Chrome Trace")
+        export_trace_button.clicked.connect(self.export_chrome_trace)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.close)
+
+        button_layout = QHBoxLayout()
+        for button in (refresh_button, reset_button, export_json_button, export_trace_button, close_button):
+            button_layout.addWidget(button)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.table)
+        layout.addWidget(self.totals_label)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+        self.refresh()
+
+    def refresh(self):
+        summary = self.recorder.summary()
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(summary))
+        for row, entry in enumerate(summary):
+            items = [
+                QTableWidgetItem(entry["name"]),
+                QTableWidgetItem(entry["category"]),
+                NumericItem(str(entry["calls"]), entry["calls"]),
+                NumericItem(f"{entry['total'] * 1000:.1f}", entry["total"]),
+                NumericItem(f"{entry['mean'] * 1000:.2f}", entry["mean"]),
+                NumericItem(f"{entry['max'] * 1000:.1f}", entry["max"]),
+                NumericItem(format_bytes(entry["bytes_read"]), entry["bytes_read"]),
+                NumericItem(format_bytes(entry["bytes_written"]), entry["bytes_written"]),
+            ]
+            for column, item in enumerate(items):
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+        self.table.resizeColumnsToContents()
+
+        read = sum(entry["bytes_read"] for entry in summary)
+        written = sum(entry["bytes_written"] for entry in summary)
+        self.totals_label.setText(f"Read {format_bytes(read)}, written {format_bytes(written)}")
+
+    def reset(self):
+        self.recorder.reset()
+        self.refresh()
+
+    def export_json(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Diagnostics", "nextstep-profile.json", "JSON Files (*.json)")
+        if path:
+            try:
+                self.recorder.export_json(path)
+            except OSError as e:
+                QMessageBox.critical(self, "Error Exporting Diagnostics", str(e))
+
+    def export_chrome_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Chrome Trace", "nextstep-trace.json", "JSON Files (*.json)")
+        if path:
+            try:
+                self.recorder.export_chrome_trace(path)
+            except OSError as e:
+                QMessageBox.critical(self, "Error Exporting Diagnostics", str(e))
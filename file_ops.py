@@ -0,0 +1,278 @@
+import errno
+import hashlib
+import os
+import shutil
+import threading
+
+import instrumentation
+
+MAX_WORKERS = 4
+CHUNK_SIZE = 1024 * 1024
+
+
+class TransferCancelled(Exception):
+    pass
+
+
+class FileOperation:
+    def __init__(self, kind, source, destination=None, blobs=None):
+        if kind not in ("copy", "link", "move", "rmtree", "detach"):
+            raise ValueError(f"Unknown file operation: {kind}")
+        if kind == "link" and blobs is None:
+            raise ValueError("A link operation needs a BlobStore")
+        if kind == "detach":
+            destination = source  # Copied over itself, which breaks a hardlink
+        self.kind = kind
+        self.source = source
+        self.destination = destination
+        self.blobs = blobs
+        self.size = self._measure()
+        self.replaces = destination is not None and os.path.exists(destination)
+
+    def __repr__(self):
+        return f"FileOperation({self.kind!r}, {self.source!r}, {self.destination!r})"
+
+    def _measure(self):
+        # Copies and moves report bytes, rmtree reports removed entries
+        try:
+            if self.kind == "rmtree":
+                return sum(len(files) + len(dirs) for _, dirs, files in os.walk(self.source)) + 1
+            return os.path.getsize(self.source)
+        except OSError:
+            return 0
+
+    def run(self, task):
+        with instrumentation.span(f"file_{self.kind}", "files", source=self.source,
+                                  destination=self.destination) as span:
+            if self.kind in ("copy", "detach") or self.kind == "link" and not self._clones():
+                self._copy(task)
+                span.read(self.size)
+                span.wrote(self.size)
+            elif self.kind == "link":
+                # Shared documents go through the blob store and are cloned into place
+                digest = self.blobs.put(self.source, task.advance, task.check_cancelled)
+                span.read(self.size)
+                span.wrote(self.size)  # put() hashes through a temporary copy
+                task.check_cancelled()
+                method = self.blobs.link(digest, self.destination)
+                span.annotate(method=method)
+                if method == "copy":
+                    span.wrote(self.size)
+            elif self.kind == "move":
+                try:
+                    # Replaces a file already there on every platform, as a copy an
+                    # interrupted move finished before it could remove the original
+                    os.replace(self.source, self.destination)
+                    task.advance(self.size)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    # Another device: copy, then drop the original once the copy
+                    # landed and reads back the same
+                    self._copy(task, verify=True)
+                    os.remove(self.source)
+                    span.read(2 * self.size)
+                    span.wrote(self.size)
+            else:
+                self._rmtree(task)
+
+    def _clones(self):
+        # A link is a plain copy on a volume that cannot clone files: the blob
+        # would only be one more copy to write and sync
+        return self.blobs.reflinks(os.path.dirname(os.path.abspath(self.destination)))
+
+    def undo(self):
+        if self.kind in ("copy", "link"):
+            if not self.replaces and os.path.exists(self.destination):
+                os.remove(self.destination)
+        elif self.kind == "move":
+            shutil.move(self.destination, self.source)
+
+    def _copy(self, task, verify=False):
+        partial = self.destination + ".part"
+        digest = hashlib.sha256()
+        try:
+            with open(self.source, "rb") as source, open(partial, "wb") as destination:
+                while True:
+                    task.check_cancelled()
+                    chunk = source.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    destination.write(chunk)
+                    if verify:
+                        digest.update(chunk)
+                    task.advance(len(chunk))
+                if verify:
+                    destination.flush()
+                    os.fsync(destination.fileno())
+            if verify and _file_digest(partial, task) != digest.digest():
+                raise OSError(f"The copy of {self.source} does not match the original")
+            shutil.copystat(self.source, partial)
+            os.replace(partial, self.destination)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+
+    def _rmtree(self, task):
+        for root, dirs, files in os.walk(self.source, topdown=False):
+            for name in files:
+                task.check_cancelled()
+                os.remove(os.path.join(root, name))
+                task.advance(1)
+            for name in dirs:
+                path = os.path.join(root, name)
+                if os.path.islink(path):
+                    os.remove(path)
+                else:
+                    os.rmdir(path)
+                task.advance(1)
+        os.rmdir(self.source)
+        task.advance(1)
+
+
+def _file_digest(path, task):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while True:
+            task.check_cancelled()
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                return digest.digest()
+            digest.update(chunk)
+
+
+class FileTask:
+    def __init__(self, key, operations, on_progress=None, on_finished=None):
+        self.key = key
+        self.operations = list(operations)
+        self.total = sum(op.size for op in self.operations)
+        self.done = 0
+        self.error = None
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._remaining = len(self.operations)
+        self._completed = []
+        self._percent = -1
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def succeeded(self):
+        return self.error is None and not self.cancelled
+
+    @property
+    def percent(self):
+        return 100 if not self.total else min(100, self.done * 100 // self.total)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check_cancelled(self):
+        if self._cancelled.is_set():
+            raise TransferCancelled()
+
+    def advance(self, amount):
+        with self._lock:
+            self.done += amount
+            percent = self.percent
+            if percent == self._percent:
+                return
+            self._percent = percent
+        # Only whole-percent steps are reported, so callers are not flooded
+        if self.on_progress:
+            self.on_progress(self.key, percent)
+
+    def _operation_finished(self, operation, error):
+        with self._lock:
+            if error is None:
+                self._completed.append(operation)
+            elif not isinstance(error, TransferCancelled) and self.error is None:
+                self.error = error
+                self._cancelled.set()  # Stop the sibling transfers too
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last:
+            self._finish()
+
+    def run_operation(self, operation):
+        error = None
+        try:
+            self.check_cancelled()
+            operation.run(self)
+        except BaseException as e:
+            error = e
+        self._operation_finished(operation, error)
+
+    def _finish(self):
+        if not self.succeeded:
+            # Put everything back the way it was, newest first
+            for operation in reversed(self._completed):
+                try:
+                    operation.undo()
+                except OSError:
+                    pass
+        if self.on_finished:
+            self.on_finished(self)
+
+
+def run_operations(key, operations, on_progress=None):
+    # The same transfer and rollback as the queue, one operation after the
+    # other on the calling thread, for scripts and the command line
+    task = FileTask(key, operations, on_progress)
+    if not task.operations:
+        task._finish()
+    for operation in task.operations:
+        task.run_operation(operation)
+    return task
+
+
+class FileOperationQueue:
+    def __init__(self, max_workers=MAX_WORKERS):
+        # concurrent.futures pulls in logging; the command line never needs it
+        from concurrent.futures import ThreadPoolExecutor
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="file-ops")
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._tasks
+
+    def submit(self, key, operations, on_progress=None, on_finished=None):
+        task = FileTask(key, operations, on_progress, self._finished_callback(on_finished))
+        with self._lock:
+            if key in self._tasks:
+                raise ValueError(f"A file transfer is already running for {key}")
+            self._tasks[key] = task
+        if not task.operations:
+            self._executor.submit(task._finish)
+        for operation in task.operations:
+            self._executor.submit(task.run_operation, operation)
+        return task
+
+    def _finished_callback(self, on_finished):
+        def finished(task):
+            with self._lock:
+                self._tasks.pop(task.key, None)
+            if on_finished:
+                on_finished(task)
+        return finished
+
+    def cancel(self, key):
+        with self._lock:
+            task = self._tasks.get(key)
+        if task is not None:
+            task.cancel()
+        return task is not None
+
+    def shutdown(self, cancel=False):
+        if cancel:
+            with self._lock:
+                for task in self._tasks.values():
+                    task.cancel()
+        self._executor.shutdown(wait=True)
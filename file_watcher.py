@@ -0,0 +1,53 @@
+import os
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+RELOAD_DELAY = 500  # ms of quiet before a burst of sync-client writes is handled
+
+
+class JobsFileWatcher(QObject):
+    # Both signals are debounced; the receiver decides whether anything really changed
+    jobs_changed = pyqtSignal()
+    folder_changed = pyqtSignal()
+
+    def __init__(self, csv_path, folder, delay=RELOAD_DELAY, parent=None):
+        super().__init__(parent)
+        self.csv_path = os.path.abspath(csv_path)
+        self.folder = os.path.abspath(folder)
+
+        self._jobs_timer = self._debounce(delay, self.jobs_changed)
+        self._folder_timer = self._debounce(delay, self.folder_changed)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._file_changed)
+        self.watcher.directoryChanged.connect(self._directory_changed)
+        self._watch()
+
+    def _debounce(self, delay, signal):
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.setInterval(delay)
+        timer.timeout.connect(signal.emit)
+        return timer
+
+    def _watch(self):
+        # Saving through a temp file and a rename drops the old file from the
+        # watch list, so the paths are re-added after every event
+        watched = set(self.watcher.files()) | set(self.watcher.directories())
+        paths = [
+            path for path in (self.csv_path, os.path.dirname(self.csv_path), self.folder)
+            if path not in watched and os.path.exists(path)
+        ]
+        if paths:
+            self.watcher.addPaths(paths)
+
+    def _file_changed(self, path):
+        self._watch()
+        self._jobs_timer.start()
+
+    def _directory_changed(self, path):
+        self._watch()
+        if path == self.folder:
+            self._folder_timer.start()
+        else:
+            self._jobs_timer.start()
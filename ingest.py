@@ -0,0 +1,470 @@
+import asyncio
+import email.utils
+import html
+import json
+import os
+import re
+import ssl
+import tempfile
+import time
+from html.parser import HTMLParser
+from urllib.parse import parse_qs, quote, urljoin, urlsplit, urlunsplit
+
+import instrumentation
+from file_ops import TransferCancelled
+from job_core import APPLICATION_STATUSES, discard_job_directory, plan_new_job
+from storage import JOBS_FOLDER, job_directory
+
+INGEST_CONNECTIONS = 8  # Postings downloaded at once
+INGEST_HOST_INTERVAL = 0.25  # Seconds between two requests to the same host
+INGEST_RETRIES = 3
+INGEST_TIMEOUT = 20.0  # Seconds for one request, from connecting to the last byte
+CANCEL_POLL = 0.1  # Seconds between two looks at whether the caller cancelled
+RETRY_DELAY = 1.0  # Before the first retry; doubled for each one after it
+MAX_RETRY_AFTER = 60.0  # A server asking for a longer wait is not waited for that long
+MAX_REDIRECTS = 5
+MAX_POSTING_SIZE = 10 * 1024 * 1024
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+USER_AGENT = "NextStep/1.0 (job posting ingest)"
+SNAPSHOT_NAME = "posting.html"
+HTML_TYPES = {"text/html", "application/xhtml+xml"}
+# Query parameters that carry the posting's ID on common job boards
+ID_PARAMETERS = ("gh_jid", "jobId", "jobid", "job_id", "jk", "jid", "reqId", "requisitionId", "id")
+TITLE_SEPARATORS = (" at ", " - ", " | ", " – ", " — ")
+# What a posting's fields may not bring into its directory name: path
+# separators, parent references, drive colons and characters Windows reserves
+UNSAFE_NAME = re.compile(r'[\x00-\x1f<>:"/\\|?*]+|\.{2,}')
+
+
+class Response:
+    def __init__(self, url, status, reason, headers, body):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers  # lower-cased names
+        self.body = body
+
+    @property
+    def content_type(self):
+        return self.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    def text(self):
+        charset = "utf-8"
+        for parameter in self.headers.get("content-type", "").split(";")[1:]:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "charset" and value.strip():
+                charset = value.strip().strip('"')
+        try:
+            return self.body.decode(charset, errors="replace")
+        except LookupError:
+            return self.body.decode("utf-8", errors="replace")
+
+
+def normalize_url(url):
+    # For comparing links: no fragment, lower-case host, no trailing slash
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+
+
+async def _read_body(reader, headers):
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        size = 0
+        while True:
+            chunk_size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if not chunk_size:
+                # Trailers, up to the blank line
+                while (await reader.readline()).strip():
+                    pass
+                return b"".join(chunks)
+            size += chunk_size
+            if size > MAX_POSTING_SIZE:
+                raise ValueError("The posting is larger than 10 MB")
+            chunks.append(await reader.readexactly(chunk_size))
+            await reader.readline()
+    if "content-length" in headers:
+        length = int(headers["content-length"])
+        if length > MAX_POSTING_SIZE:
+            raise ValueError("The posting is larger than 10 MB")
+        return await reader.readexactly(length)
+    # Neither: the body ends when the server closes the connection
+    chunks = []
+    size = 0
+    while chunk := await reader.read(65536):
+        size += len(chunk)
+        if size > MAX_POSTING_SIZE:
+            raise ValueError("The posting is larger than 10 MB")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def _request(url):
+    # One GET over its own connection. HTTP/1.1 without keep-alive: postings
+    # are usually on different hosts, and the pool bounds the open sockets.
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"Not a web address: {url}")
+    secure = parts.scheme == "https"
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, parts.port or (443 if secure else 80),
+        ssl=ssl.create_default_context() if secure else None
+    )
+    try:
+        target = quote(parts.path or "/", safe="/%:@!$&'()*+,;=~") + (f"?{parts.query}" if parts.query else "")
+        host = parts.netloc.rpartition("@")[2]
+        writer.write(
+            f"GET {target} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n"
+            f"Accept: text/html,application/xhtml+xml,application/pdf;q=0.9,*/*;q=0.8\r\n"
+            f"Accept-Encoding: identity\r\nConnection: close\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
+        status_line = (await reader.readline()).decode("latin-1").split(" ", 2)
+        if len(status_line) < 2 or not status_line[0].startswith("HTTP/") or not status_line[1].isdigit():
+            raise ValueError(f"{parts.hostname} did not answer with HTTP")
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        status = int(status_line[1])
+        body = b"" if status in REDIRECT_STATUSES else await _read_body(reader, headers)
+        return Response(url, status, status_line[2].strip() if len(status_line) > 2 else "", headers, body)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+
+def _retry_after(headers):
+    # Seconds the server asked us to wait, or None
+    value = headers.get("retry-after", "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return min(float(value), MAX_RETRY_AFTER)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return min(max(when.timestamp() - time.time(), 0.0), MAX_RETRY_AFTER)
+
+
+class HostLimiter:
+    # Spaces the requests to each host by interval seconds. Each request
+    # reserves the next free slot, so waiting requests keep their order.
+    # Used on the event loop thread only.
+    def __init__(self, interval=INGEST_HOST_INTERVAL):
+        self.interval = interval
+        self._next = {}  # host -> loop time at which its next request may start
+
+    async def wait(self, host):
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next.get(host, now))
+        self._next[host] = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def defer(self, host, delay):
+        # A host that answered 429 or 503 with Retry-After gets nothing until then
+        now = asyncio.get_running_loop().time()
+        self._next[host] = max(self._next.get(host, now), now + delay)
+
+
+async def fetch(url, pool, limiter, retries=INGEST_RETRIES, timeout=INGEST_TIMEOUT):
+    # Follows redirects; retries connection errors, timeouts and RETRY_STATUSES
+    # with a doubling delay, or as long as Retry-After says. Raises OSError or
+    # ValueError once the retries are used up.
+    attempt = 0
+    redirects = 0
+    while True:
+        host = urlsplit(url).hostname
+        await limiter.wait(host)
+        delay = None
+        try:
+            async with pool:
+                response = await asyncio.wait_for(_request(url), timeout)
+        except (OSError, EOFError, asyncio.TimeoutError) as e:
+            error = OSError(f"{host}: {str(e) or 'timed out'}")
+        else:
+            if response.status in REDIRECT_STATUSES and "location" in response.headers:
+                redirects += 1
+                if redirects > MAX_REDIRECTS:
+                    raise ValueError(f"{url} redirects too many times")
+                url = urljoin(url, response.headers["location"])
+                continue
+            if 200 <= response.status < 300:
+                return response
+            error = ValueError(f"{host} answered {response.status} {response.reason}".rstrip())
+            if response.status not in RETRY_STATUSES:
+                raise error
+            delay = _retry_after(response.headers)
+            if delay is not None:
+                limiter.defer(host, delay)
+        if attempt >= retries:
+            raise error
+        if delay is None:
+            delay = RETRY_DELAY * 2 ** attempt
+            await asyncio.sleep(delay)
+        attempt += 1
+        instrumentation.event("ingest_retry", "ingest", url=url, attempt=attempt, error=str(error))
+
+
+class _PostingParser(HTMLParser):
+    # Collects what extract_posting() reads: <title>, <meta> and JSON-LD scripts
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.meta = {}
+        self.json_ld = []
+        self._tag = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or "" for name, value in attrs}
+        if tag == "meta":
+            name = (attrs.get("property") or attrs.get("name") or "").lower()
+            if name and "content" in attrs:
+                self.meta.setdefault(name, attrs["content"])
+        elif tag == "title" or tag == "script" and attrs.get("type", "").lower() == "application/ld+json":
+            self._tag = tag
+            self._text = []
+
+    def handle_data(self, data):
+        if self._tag is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag != self._tag:
+            return
+        text = "".join(self._text)
+        if tag == "title":
+            self.title = self.title or text
+        else:
+            self.json_ld.append(text)
+        self._tag = None
+
+
+def _clean(value):
+    return " ".join(html.unescape(str(value)).split())
+
+
+def _job_postings(value):
+    # Every JobPosting object in a JSON-LD document, including inside @graph
+    if isinstance(value, list):
+        for item in value:
+            yield from _job_postings(item)
+    elif isinstance(value, dict):
+        kind = value.get("@type")
+        if kind == "JobPosting" or isinstance(kind, list) and "JobPosting" in kind:
+            yield value
+        yield from _job_postings(value.get("@graph", []))
+
+
+def _value(value, name):
+    # A JSON-LD property that may be a list, a plain string or an object
+    if isinstance(value, list):
+        value = value[0] if value else ""
+    if isinstance(value, dict):
+        value = value.get(name) or ""
+    return _clean(value)
+
+
+def _split_title(title):
+    # "Position at Company", "Position - Company" and the like
+    for separator in TITLE_SEPARATORS:
+        position, found, company = title.partition(separator)
+        if found and position.strip() and company.strip():
+            return position.strip(), company.strip()
+    return title, ""
+
+
+def _id_from_url(url):
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    for parameter in ID_PARAMETERS:
+        if query.get(parameter, [""])[0].strip():
+            return query[parameter][0].strip()
+    segments = [segment for segment in parts.path.split("/") if segment]
+    # Boards put the number last, sometimes behind a slug ("/jobs/4125-data-engineer")
+    for segment in reversed(segments):
+        if any(character.isdigit() for character in segment):
+            return segment
+    return segments[-1] if segments else ""
+
+
+def extract_posting(url, text):
+    # {"Position", "Company", "ID"} from a posting's HTML: the schema.org
+    # JobPosting that job boards embed for search engines first, then the
+    # page's Open Graph tags and title, and the ID from the address.
+    parser = _PostingParser()
+    parser.feed(text)
+    parser.close()
+    posting = {"Position": "", "Company": "", "ID": ""}
+    for script in parser.json_ld:
+        try:
+            document = json.loads(script)
+        except ValueError:
+            continue
+        for job_posting in _job_postings(document):
+            posting["Position"] = posting["Position"] or _value(job_posting.get("title", ""), "name")
+            posting["Company"] = posting["Company"] or _value(job_posting.get("hiringOrganization", ""), "name")
+            posting["ID"] = posting["ID"] or _value(job_posting.get("identifier", ""), "value")
+    title_position, title_company = _split_title(_clean(parser.meta.get("og:title") or parser.title))
+    posting["Position"] = posting["Position"] or title_position
+    posting["Company"] = posting["Company"] or _clean(parser.meta.get("og:site_name", "")) or title_company
+    posting["ID"] = posting["ID"] or _id_from_url(url)
+    # The fields name the job directory, and the page is written by whoever runs the board
+    return {field: _safe_name(value) for field, value in posting.items()}
+
+
+def _safe_name(value):
+    return " ".join(UNSAFE_NAME.sub(" ", value).split()).strip(" .")
+
+
+def _posting_key(company, job_id):
+    return company.casefold(), job_id.casefold()
+
+
+class KnownPostings:
+    # The links and (company, ID) pairs of the jobs there are, so a posting
+    # is only added once. Used on the event loop thread only.
+    def __init__(self, jobs=()):
+        self.links = set()
+        self.ids = set()
+        for job in jobs:
+            self.add(job.get("Candidate Home Link") or "", job.get("Company") or "", job.get("ID") or "")
+
+    def add(self, link, company, job_id):
+        if link:
+            self.links.add(normalize_url(link))
+        if company and job_id:
+            self.ids.add(_posting_key(company, job_id))
+
+    def has_link(self, link):
+        return normalize_url(link) in self.links
+
+    def has_id(self, company, job_id):
+        return _posting_key(company, job_id) in self.ids
+
+
+def _write_snapshot(path, data):
+    fd, tmp_path = tempfile.mkstemp(prefix='.posting-', suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_posting(url, posting, response, status):
+    # Creates the job directory, writes the page into it and returns the record
+    directory = job_directory(posting["Position"], posting["Company"], posting["ID"])
+    if os.path.dirname(os.path.normpath(directory)) != os.path.normpath(JOBS_FOLDER):
+        raise ValueError(f"The posting would be saved outside {JOBS_FOLDER}: {directory}")
+    with instrumentation.span("save_posting", "ingest", url=url) as span:
+        job, _ = plan_new_job(posting["Position"], posting["Company"], posting["ID"], status, url)
+        snapshot = os.path.join(directory, SNAPSHOT_NAME)
+        _write_snapshot(snapshot, response.body)
+        span.wrote(len(response.body))
+    job["Snapshot"] = snapshot
+    return job
+
+
+async def _watch(cancel, gathered):
+    while not cancel.is_set():
+        await asyncio.sleep(CANCEL_POLL)
+    gathered.cancel()
+
+
+def _save(saved, *args):
+    # Runs on the loop's executor; what it saved is known even if the wait for it was cancelled
+    job = save_posting(*args)
+    saved.append(job)
+    return job
+
+
+async def _ingest(urls, known, status, connections, interval, retries, timeout, saved, cancel):
+    pool = asyncio.Semaphore(connections)
+    limiter = HostLimiter(interval)
+    loop = asyncio.get_running_loop()
+    results = {}  # input position -> job
+    skipped = []
+    errors = []
+
+    async def ingest_one(number, url):
+        try:
+            response = await fetch(url, pool, limiter, retries, timeout)
+            if response.content_type and response.content_type not in HTML_TYPES:
+                raise ValueError(f"Not a web page ({response.content_type}); add it with the file as its snapshot")
+            posting = extract_posting(response.url, response.text())
+            if known.has_id(posting["Company"], posting["ID"]):
+                skipped.append((url, f"{posting['Company']} {posting['ID']} is already a job"))
+                return
+            # Claimed before the await, so a second address of the same posting is skipped
+            known.add(url, posting["Company"], posting["ID"])
+            results[number] = await loop.run_in_executor(None, _save, saved, url, posting, response, status)
+        except (OSError, ValueError) as e:
+            errors.append((url, str(e)))
+
+    tasks = []
+    for number, url in enumerate(urls):
+        url = url.strip()
+        if not url:
+            continue
+        if known.has_link(url):
+            # Saved before, or listed twice: not even downloaded
+            skipped.append((url, "already a job"))
+            continue
+        known.add(url, "", "")
+        tasks.append(ingest_one(number, url))
+    gathered = asyncio.gather(*tasks)
+    if cancel is not None:
+        watcher = loop.create_task(_watch(cancel, gathered))
+    await gathered
+    if cancel is not None:
+        watcher.cancel()
+    return [results[number] for number in sorted(results)], skipped, errors
+
+
+def fetch_postings(urls, jobs=(), status=APPLICATION_STATUSES[0], connections=INGEST_CONNECTIONS,
+                   interval=INGEST_HOST_INTERVAL, retries=INGEST_RETRIES, timeout=INGEST_TIMEOUT, cancel=None):
+    # Downloads the postings concurrently, at most connections at a time, and
+    # saves each into its job directory. Nothing is added to a store: returns
+    # (new records in the order of urls, [(url, reason skipped)], [(url, error)]).
+    # Postings already among jobs, by link or by company and ID, are skipped.
+    # Setting the threading.Event cancel stops the downloads, takes back what
+    # was saved and raises TransferCancelled.
+    # Runs its own event loop, so call it from a thread without one.
+    saved = []
+    with instrumentation.span("fetch_postings", "ingest", urls=len(urls)):
+        try:
+            return asyncio.run(_ingest(list(urls), KnownPostings(jobs), status, connections, interval, retries,
+                                       timeout, saved, cancel))
+        except asyncio.CancelledError:
+            # asyncio.run waited for the saves already running, so saved is complete
+            for job in saved:
+                _discard_posting(job)
+            raise TransferCancelled() from None
+
+
+def _discard_posting(job):
+    try:
+        os.remove(job["Snapshot"])
+    except OSError:
+        pass
+    discard_job_directory(job)
+
+
+def ingest_postings(store, urls, archived=(), **options):
+    # fetch_postings(), then all new jobs are committed with a single write
+    jobs, skipped, errors = fetch_postings(urls, store.jobs + list(archived), **options)
+    store.add_many(jobs, "import")
+    return jobs, skipped, errors
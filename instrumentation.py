@@ -0,0 +1,211 @@
+import datetime
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+PROFILE_ENV = 'NEXTSTEP_PROFILE'  # Any value but "" or "0" turns recording on
+MAX_SPANS = 100_000  # Individual spans kept for the trace; totals are always kept
+
+
+class Span:
+    __slots__ = ("name", "category", "args", "start", "thread", "bytes_read", "bytes_written")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = time.perf_counter()
+        self.thread = threading.get_ident()
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def read(self, count):
+        self.bytes_read += count
+
+    def wrote(self, count):
+        self.bytes_written += count
+
+    def annotate(self, **args):
+        self.args.update(args)
+
+
+class NullSpan:
+    # Handed out while recording is off, so instrumented code never has to check
+    __slots__ = ()
+
+    def read(self, count):
+        pass
+
+    def wrote(self, count):
+        pass
+
+    def annotate(self, **args):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class _SpanContext:
+    __slots__ = ("recorder", "name", "category", "args", "span")
+
+    def __init__(self, recorder, name, category, args):
+        self.recorder = recorder
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.span = self.recorder.begin(self.name, self.category, **self.args)
+        return self.span
+
+    def __exit__(self, *exc_info):
+        self.recorder.end(self.span)
+        return False
+
+
+class Recorder:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.origin = time.perf_counter()
+            self.created = datetime.datetime.now()
+            self.spans = []    # (name, category, start, duration, thread, args) in seconds since origin
+            self.events = []   # (name, category, time, thread, args)
+            self.stats = {}    # name -> [category, calls, total, max, bytes read, bytes written]
+            self.dropped = 0   # spans not kept because MAX_SPANS was reached
+
+    def span(self, name, category="app", **args):
+        # with recorder.span("load_jobs", "storage") as span: ... span.read(size)
+        return _SpanContext(self, name, category, args)
+
+    def begin(self, name, category="app", **args):
+        # For work that ends in another callback, such as the threaded startup load
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(name, category, args)
+
+    def end(self, span):
+        if span is NULL_SPAN:
+            return
+        duration = time.perf_counter() - span.start
+        with self._lock:
+            stats = self.stats.get(span.name)
+            if stats is None:
+                stats = self.stats[span.name] = [span.category, 0, 0.0, 0.0, 0, 0]
+            stats[1] += 1
+            stats[2] += duration
+            stats[3] = max(stats[3], duration)
+            stats[4] += span.bytes_read
+            stats[5] += span.bytes_written
+            if len(self.spans) < MAX_SPANS:
+                args = dict(span.args)
+                if span.bytes_read:
+                    args["bytes_read"] = span.bytes_read
+                if span.bytes_written:
+                    args["bytes_written"] = span.bytes_written
+                self.spans.append((span.name, span.category, span.start - self.origin, duration, span.thread, args))
+            else:
+                self.dropped += 1
+
+    def event(self, name, category="app", **args):
+        # Something worth seeing on the timeline that has no duration
+        if not self.enabled:
+            return
+        with self._lock:
+            self.events.append((name, category, time.perf_counter() - self.origin, threading.get_ident(), args))
+
+    def traced(self, name=None, category="app"):
+        def decorate(function):
+            span_name = name or function.__name__
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.span(span_name, category):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def summary(self):
+        # One row per span name, most expensive first
+        with self._lock:
+            rows = [
+                {
+                    "name": name,
+                    "category": category,
+                    "calls": calls,
+                    "total": total,
+                    "mean": total / calls,
+                    "max": longest,
+                    "bytes_read": read,
+                    "bytes_written": written,
+                }
+                for name, (category, calls, total, longest, read, written) in self.stats.items()
+            ]
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+    def to_json(self):
+        with self._lock:
+            spans = [
+                {"name": name, "category": category, "start": start, "duration": duration,
+                 "thread": thread, "args": args}
+                for name, category, start, duration, thread, args in self.spans
+            ]
+            events = [
+                {"name": name, "category": category, "time": at, "thread": thread, "args": args}
+                for name, category, at, thread, args in self.events
+            ]
+            dropped = self.dropped
+        summary = self.summary()
+        return {
+            "created": self.created.isoformat(timespec="seconds"),
+            "summary": summary,
+            "spans": spans,
+            "events": events,
+            "dropped_spans": dropped,
+        }
+
+    def chrome_trace(self):
+        # Trace Event Format, for chrome://tracing or https://ui.perfetto.dev
+        pid = os.getpid()
+        with self._lock:
+            trace = [
+                {"name": name, "cat": category, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6,
+                 "pid": pid, "tid": thread, "args": args}
+                for name, category, start, duration, thread, args in self.spans
+            ]
+            trace += [
+                {"name": name, "cat": category, "ph": "i", "s": "t", "ts": at * 1e6,
+                 "pid": pid, "tid": thread, "args": args}
+                for name, category, at, thread, args in self.events
+            ]
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def export_json(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_json(), file, indent=2)
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.chrome_trace(), file)
+
+
+recorder = Recorder(enabled=os.environ.get(PROFILE_ENV, '') not in ('', '0'))
+
+span = recorder.span
+begin = recorder.begin
+end = recorder.end
+event = recorder.event
+traced = recorder.traced
+
+
+def enable():
+    recorder.enabled = True
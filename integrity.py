@@ -0,0 +1,219 @@
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+from blob_store import BLOBS_FOLDER, file_hash
+from storage import DOCUMENT_FIELDS, JOBS_FOLDER, KEY_FIELD, job_directory
+
+STAT_CACHE = 'file_cache.json'
+SCAN_WORKERS = 16  # Stats mostly wait on the file system, which is slow on synced folders
+MISSING = "missing"  # Not at its path and nowhere to be found
+MOVED = "moved"      # Not at its path, but found elsewhere in job_positions
+
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+class StatCache:
+    # path -> [mtime_ns, size, sha256 or None], kept between runs. A hash is
+    # trusted while mtime and size match, and remembered after the file
+    # disappears, so a renamed file can still be found by its content.
+    def __init__(self, path=STAT_CACHE):
+        self.path = path
+        self.changed = False
+        try:
+            with open(path, encoding='utf-8') as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def digest(self, path, stat):
+        entry = self.entries.get(path)
+        if entry is not None and entry[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return entry[2]
+        return None
+
+    def put(self, path, stat, digest):
+        self.entries[path] = [stat.st_mtime_ns, stat.st_size, digest]
+        self.changed = True
+
+    def keep(self, paths):
+        dropped = set(self.entries) - set(paths)
+        for path in dropped:
+            del self.entries[path]
+        self.changed = self.changed or bool(dropped)
+
+    def save(self):
+        if not self.changed:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.file_cache-', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(self.entries, file)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.changed = False
+
+
+class IntegrityScanner:
+    # Checks the files the jobs refer to without touching the GUI thread.
+    # scan() returns {key: {field: (state, candidate)}} with an entry, possibly
+    # empty, for every job it was given; candidate is where a MOVED file is now.
+    def __init__(self, root=JOBS_FOLDER, cache=None, workers=SCAN_WORKERS):
+        self.root = root
+        self.cache = StatCache() if cache is None else cache
+        self.workers = workers
+        self.referenced = set()  # every path the last full scan saw, so a repair never takes another job's file
+        self._lock = threading.Lock()
+
+    def scan(self, jobs, full=False):
+        with self._lock, instrumentation.span("scan_files", "files", jobs=len(jobs), full=full) as span:
+            references = [
+                (job[KEY_FIELD], field, job[field], job)
+                for job in jobs for field in DOCUMENT_FIELDS if job.get(field)
+            ]
+            paths = list({path for _, _, path, _ in references})
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scan") as executor:
+                stats = dict(zip(paths, executor.map(_stat, paths)))
+                self._hash_changed(executor, stats, span)
+
+            if full:
+                self.referenced = set(paths)
+                self.cache.keep(paths)
+            else:
+                self.referenced.update(paths)
+
+            results = {job[KEY_FIELD]: {} for job in jobs}
+            locator = None
+            for key, field, path, job in references:
+                if stats[path] is not None:
+                    continue
+                if locator is None:
+                    locator = _Locator(self.root, self.cache)  # Walked once, and only when something is missing
+                candidate = locator.find(path, job, self.referenced)
+                results[key][field] = (MISSING, None) if candidate is None else (MOVED, candidate)
+            self.cache.save()
+            span.annotate(problems=sum(len(fields) for fields in results.values()))
+            return results
+
+    def _hash_changed(self, executor, stats, span):
+        # A file seen for the first time is only stat'ed: reading it would
+        # download every document a cloud folder keeps online only. Files that
+        # changed since the last scan are hashed, once per mtime; hardlinked
+        # copies share one hash.
+        by_inode = {}
+        for path, stat in stats.items():
+            if stat is None:
+                continue
+            entry = self.cache.entries.get(path)
+            if entry is None:
+                self.cache.put(path, stat, None)
+            elif entry[:2] != [stat.st_mtime_ns, stat.st_size]:
+                by_inode.setdefault((stat.st_dev, stat.st_ino), []).append(path)
+        groups = list(by_inode.values())
+        for group, digest in zip(groups, executor.map(_hash_or_none, [group[0] for group in groups])):
+            if digest is None:
+                continue
+            span.read(stats[group[0]].st_size)
+            for path in group:
+                self.cache.put(path, stats[path], digest)
+
+
+def _hash_or_none(path):
+    try:
+        return file_hash(path)
+    except OSError:
+        return None
+
+
+class _Locator:
+    # Finds where a missing file went. The job's current directory is tried
+    # first, by name and then by the content last seen at the old path; after
+    # that the only unclaimed file in job_positions with that name or content.
+    def __init__(self, root, cache):
+        self.cache = cache
+        self.names = {}
+        self.digests = {}
+        self._sizes = None
+        blobs = os.path.normpath(BLOBS_FOLDER)
+        for directory, subdirectories, files in os.walk(root):
+            subdirectories[:] = [
+                name for name in subdirectories if os.path.join(directory, name) != blobs
+            ]
+            for name in files:
+                self.names.setdefault(name, []).append(os.path.join(directory, name))
+
+    @property
+    def sizes(self):
+        # Only stat'ed when a file has to be found by its content
+        if self._sizes is None:
+            self._sizes = {}
+            for paths in self.names.values():
+                for path in paths:
+                    stat = _stat(path)
+                    if stat is not None:
+                        self._sizes.setdefault(stat.st_size, []).append((path, stat))
+        return self._sizes
+
+    def _same_content(self, path, directory=None):
+        entry = self.cache.entries.get(path)
+        if entry is None or entry[2] is None:
+            return []
+        matches = []
+        for candidate, stat in self.sizes.get(entry[1], []):
+            if directory is not None and os.path.dirname(candidate) != directory:
+                continue
+            digest = self.cache.digest(candidate, stat)
+            if digest is None:
+                if candidate not in self.digests:
+                    self.digests[candidate] = _hash_or_none(candidate)
+                digest = self.digests[candidate]
+            if digest == entry[2]:
+                matches.append(candidate)
+        return matches
+
+    def find(self, path, job, referenced):
+        # The file found is claimed, so two records are never pointed at the same one
+        job_dir = os.path.normpath(job_directory(job["Position"], job["Company"], job["ID"]))
+        named = self.names.get(os.path.basename(path), [])
+        in_job_dir = [candidate for candidate in named if os.path.dirname(candidate) == job_dir]
+        candidates = (
+            in_job_dir or self._same_content(path, job_dir)
+            or [candidate for candidate in named if candidate not in referenced]
+            or [candidate for candidate in self._same_content(path) if candidate not in referenced]
+        )
+        candidates = [candidate for candidate in candidates if candidate not in referenced or candidate in in_job_dir]
+        if len(candidates) != 1:
+            return None
+        referenced.add(candidates[0])
+        return candidates[0]
+
+
+def repairs(problems):
+    # {key: {field: new path}} for every file that was found elsewhere
+    moved = {}
+    for key, fields in problems.items():
+        changes = {field: candidate for field, (state, candidate) in fields.items() if state == MOVED}
+        if changes:
+            moved[key] = changes
+    return moved
+
+
+def repair(store, problems):
+    # Points the records at where their files are now; returns {key: changed fields}
+    changed = {}
+    with store.batch():
+        for key, changes in repairs(problems).items():
+            if key in store:
+                changed[key] = store.update(store.get(key), changes, "repair")
+    return changed
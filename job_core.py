@@ -0,0 +1,402 @@
+import csv
+import datetime
+import json
+import os
+
+import instrumentation
+from file_ops import FileOperation, TransferCancelled, run_operations
+from storage import DOCUMENT_FIELDS, JOBS_FOLDER, KEY_FIELD, JobRecord, job_directory
+
+APPLICATION_STATUSES = ["Not started", "Applied", "Interview", "Rejection", "Offer"]
+# Columns a bulk import reads; the file paths are copied (or moved, for the snapshot) into place
+IMPORT_FIELDS = [
+    "Position", "Company", "ID", "Status", "Candidate Home Link", "Snapshot", "Resume/CV", "Cover Letter"
+]
+IMPORT_WORKERS = 8
+# Fields that follow the job directory: a record only gets them once its files moved
+RELOCATION_FIELDS = ("Position", "Company", "ID") + DOCUMENT_FIELDS
+
+
+def today():
+    return datetime.date.today().strftime("%Y-%m-%d")
+
+
+@instrumentation.traced(category="files")
+def create_job_directory(position_name, company_name, job_id):
+    if not os.path.exists(JOBS_FOLDER):
+        os.makedirs(JOBS_FOLDER)
+
+    path = job_directory(position_name, company_name, job_id)
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    return path
+
+
+def discard_job_directory(job):
+    # Takes back the directory planned for a job that was never added; one
+    # that holds files, its own or another job's, is left alone
+    try:
+        os.rmdir(job_directory(job["Position"], job["Company"], job["ID"]))
+    except OSError:
+        pass
+
+
+def rename_job_directory(old_path, new_position_name, new_company_name, new_job_id):
+    return job_directory(new_position_name, new_company_name, new_job_id)
+
+
+def _same_path(first, second):
+    return os.path.normcase(os.path.abspath(first)) == os.path.normcase(os.path.abspath(second))
+
+
+def _inside(path, directory):
+    path, directory = os.path.normcase(os.path.abspath(path)), os.path.normcase(os.path.abspath(directory))
+    return os.path.commonpath([path, directory]) == directory
+
+
+def plan_relocation(source, destination, resume=False):
+    # Operations that move a job directory. Within one device that is a
+    # single rename; across devices, and when finishing an interrupted move,
+    # every file is moved on its own, in parallel, and a copy is verified
+    # before its original goes. remove_empty_tree() clears what is left.
+    if not os.path.isdir(source):
+        os.makedirs(destination, exist_ok=True)
+        return []
+    if not resume and os.path.exists(destination) and not os.path.samefile(source, destination):
+        raise ValueError(f"{destination} already exists; choose another position, company or ID.")
+    parent = os.path.dirname(os.path.abspath(destination))
+    os.makedirs(parent, exist_ok=True)
+    if not resume and os.stat(source).st_dev == os.stat(parent).st_dev:
+        return [FileOperation("move", source, destination)]
+    operations = []
+    for root, _, files in os.walk(source):
+        target = os.path.join(destination, os.path.relpath(root, source))
+        os.makedirs(target, exist_ok=True)
+        for name in files:
+            operations.append(FileOperation("move", os.path.join(root, name), os.path.join(target, name)))
+    return operations
+
+
+def remove_empty_tree(path):
+    # Directories a file by file move emptied; anything still in them stays
+    for root, _, _ in os.walk(path, topdown=False):
+        try:
+            os.rmdir(root)
+        except OSError:
+            pass
+
+
+def plan_edit(store, key, changes):
+    # Returns (the fields that change, operations, new job directory). A new
+    # position, company or ID moves the job directory, and the documents in
+    # it are pointed at their new place; the record must only get the
+    # changes once the operations succeeded.
+    job = store.get(key)
+    changes = {field: value for field, value in changes.items() if job.get(field) != value}
+    fields = {**job, **changes}
+    source = store.job_dir(key)
+    destination = rename_job_directory(source, fields["Position"], fields["Company"], fields["ID"])
+    if _same_path(source, destination):
+        return changes, [], destination
+    operations = plan_relocation(source, destination)
+    for field in DOCUMENT_FIELDS:
+        path = fields.get(field)
+        if path and _inside(path, source):
+            changes[field] = os.path.join(destination, os.path.relpath(path, source))
+    return changes, operations, destination
+
+
+def split_relocation(changes):
+    # (the changes that wait for the directory to move, the ones made right
+    # away); only the first go into the intent, so finishing the move cannot
+    # undo edits made to the job while its files were moving
+    moved = {field: value for field, value in changes.items() if field in RELOCATION_FIELDS}
+    return moved, {field: value for field, value in changes.items() if field not in moved}
+
+
+def finish_relocation(store, log, intent):
+    # Gives the record its changes once its directory moved, saves it and
+    # drops the intent; returns the fields changed
+    key = intent["key"]
+    changed = set()
+    if key in store:
+        changed = store.update(store.get(key), intent["changes"], "move")
+        store.flush()
+    remove_empty_tree(intent["source"])
+    log.finish(intent)
+    return changed
+
+
+def resume_relocations(store, log):
+    # Finishes the directory moves that were interrupted; returns the keys
+    # of the jobs moved and the errors of those left for the next start
+    moved = []
+    errors = []
+    for intent in log.pending():
+        key = intent["key"]
+        try:
+            _transfer(key, plan_relocation(intent["source"], intent["destination"], resume=True))
+        except Exception as e:
+            errors.append(f"{key}: {e}")
+            continue
+        finish_relocation(store, log, intent)
+        moved.append(key)
+    return moved, errors
+
+
+def validate_job(position_name, company_name, job_id, status):
+    # Raises ValueError with the message the dialogs show
+    if not position_name or not company_name or not job_id:
+        raise ValueError("Position, Company, and ID are required.")
+    if status not in APPLICATION_STATUSES:
+        raise ValueError("Invalid application status.")
+
+
+def plan_new_job(position_name, company_name, job_id, status, candidate_home_link="",
+                 snapshot="", resume="", cover_letter="", blobs=None):
+    # Returns the record and the file operations that put its documents in
+    # place. The job directory is created; nothing else is touched yet.
+    validate_job(position_name, company_name, job_id, status)
+    new_job = JobRecord.from_dict({
+        "Position": position_name,
+        "Company": company_name,
+        "Candidate Home Link": candidate_home_link,
+        "ID": job_id,
+        "Snapshot": snapshot,
+        "Status": status,
+        "Resume/CV": os.path.basename(resume),
+        "Cover Letter": cover_letter,
+        "Last Updated": today()
+    })
+
+    job_dir = create_job_directory(position_name, company_name, job_id)
+    operations = []
+    # Resumes and cover letters are shared through the blob store when there is one
+    document_kind = "copy" if blobs is None else "link"
+    if resume and os.path.isfile(resume):
+        new_resume_path = os.path.join(job_dir, os.path.basename(resume))
+        operations.append(FileOperation(document_kind, resume, new_resume_path, blobs))
+        new_job["Resume/CV"] = new_resume_path
+
+    # Move snapshot file to the new directory
+    if snapshot and os.path.isfile(snapshot):
+        new_snapshot_path = os.path.join(job_dir, os.path.basename(snapshot))
+        operations.append(FileOperation("move", snapshot, new_snapshot_path))
+        new_job["Snapshot"] = new_snapshot_path
+
+    # Copy cover letter to the new directory
+    if cover_letter and os.path.isfile(cover_letter):
+        new_cover_letter = os.path.join(job_dir, os.path.basename(cover_letter))
+        operations.append(FileOperation(document_kind, cover_letter, new_cover_letter, blobs))
+        new_job["Cover Letter"] = new_cover_letter
+
+    return new_job, operations
+
+
+def plan_duplicate(job, blobs=None):
+    new_job = job.copy()
+    del new_job[KEY_FIELD]  # The store assigns the copy its own key
+    new_job["ID"] = f"{job['ID']}_copy"
+    new_job["Last Updated"] = today()
+    new_job["Submitted"] = ""  # Reset Submitted date
+
+    new_job_dir = create_job_directory(new_job["Position"], new_job["Company"], new_job["ID"])
+
+    operations = []
+    document_kind = "copy" if blobs is None else "link"
+    for field in ("Resume/CV", "Cover Letter", "Snapshot"):
+        if os.path.isfile(job[field]):
+            new_path = os.path.join(new_job_dir, os.path.basename(job[field]))
+            operations.append(FileOperation(document_kind, job[field], new_path, blobs))
+            new_job[field] = new_path
+    return new_job, operations
+
+
+def plan_delete(store, key, keep_files=True):
+    job_dir = store.job_dir(key)
+    if keep_files or not os.path.isdir(job_dir):
+        return []
+    return [FileOperation("rmtree", job_dir)]
+
+
+def plan_detach(path):
+    # Documents hardlinked to a blob by earlier versions get their own copy
+    # before they are opened, as an editor would change every job's copy;
+    # for a directory, the files in it
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in os.listdir(path)]
+    else:
+        paths = [path]
+    return [FileOperation("detach", document) for document in paths
+            if os.path.isfile(document) and os.stat(document).st_nlink > 1]
+
+
+def status_changes(new_status):
+    if new_status not in APPLICATION_STATUSES:
+        raise ValueError("Invalid application status.")
+    changes = {"Status": new_status}
+
+    if new_status == "Applied":
+        changes["Submitted"] = today()
+
+    # Update Last Updated field
+    changes["Last Updated"] = today()
+    return changes
+
+
+def _transfer(key, operations):
+    task = run_operations(key, operations)
+    if not task.succeeded:
+        raise task.error or TransferCancelled()
+
+
+def add_job(store, job, operations, action="add"):
+    # Runs the transfers on the calling thread and commits the job once they
+    # landed; a failed transfer is rolled back and nothing is added
+    key = store.reserve_key(job)
+    try:
+        _transfer(key, operations)
+    except BaseException:
+        store.release_key(key)
+        discard_job_directory(job)
+        raise
+    return store.add(job, action)
+
+
+def duplicate_job(store, key, blobs=None):
+    new_job, operations = plan_duplicate(store.get(key), blobs)
+    return add_job(store, new_job, operations, "duplicate")
+
+
+def delete_job(store, key, keep_files=True):
+    job = store.get(key)
+    _transfer(key, plan_delete(store, key, keep_files))
+    store.remove(job)
+    return job
+
+
+def plan_archive(store, keys, pack_files=False):
+    # Returns (copies of the records, directories to pack). A directory that
+    # a job staying active also uses is never packed.
+    keys = list(keys)
+    directories = []
+    if pack_files:
+        archived = set(keys)
+        kept = {store.job_dir(job[KEY_FIELD]) for job in store if job[KEY_FIELD] not in archived}
+        directories = sorted(
+            directory for directory in {store.job_dir(key) for key in keys} - kept if os.path.isdir(directory)
+        )
+    return [store.get(key).copy() for key in keys], directories
+
+
+def archive_jobs(store, archive, keys, pack_files=False):
+    # The archive is written first: until the store is saved a job is in
+    # both, and the active copy wins. Returns (jobs, packed directories);
+    # the caller removes the directories once it flushed the store, which
+    # lets several calls share one write.
+    jobs, directories = plan_archive(store, keys, pack_files)
+    archive.add(jobs, directories)
+    with store.batch():
+        for job in jobs:
+            store.remove(store.get(job[KEY_FIELD]), "archive")
+    store.reserve_keys(job[KEY_FIELD] for job in jobs)
+    return jobs, directories
+
+
+def restore_jobs(store, archive, keys):
+    # Returns the jobs added back. Jobs that are active already are only
+    # dropped from the archive, which the caller does with archive.discard()
+    # once it flushed the store, so a crash in between loses nothing.
+    jobs = [job for job in archive.restore(keys) if job[KEY_FIELD] not in store]
+    store.add_many(jobs, "restore")
+    return jobs
+
+
+def sync_jobs(store, sync, archive=None):
+    # Sends this device's edits to the sync folder and applies the other
+    # devices'; returns (added, removed, changed, archived)
+    return sync.apply(store, sync.fetch(), archive)
+
+
+def set_status(store, key, new_status):
+    return store.update(store.get(key), status_changes(new_status), "status")
+
+
+def read_import(path):
+    # A CSV with the jobs.csv headers, or a JSON list of objects with the same names
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        if path.lower().endswith(".json"):
+            records = json.load(file)
+            if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+                raise ValueError("A JSON import must be a list of objects")
+        else:
+            records = list(csv.DictReader(file))
+    jobs = []
+    for record in records:
+        job = {field: str(record.get(field) or "").strip() for field in IMPORT_FIELDS}
+        job["Status"] = job["Status"] or APPLICATION_STATUSES[0]
+        jobs.append(job)
+    return jobs
+
+
+def plan_import(records, blobs=None, workers=IMPORT_WORKERS):
+    # Returns ([(record number, job, operations)], [(record number, error)]).
+    # Directories are created on a thread pool, which matters on synced folders.
+    from concurrent.futures import ThreadPoolExecutor
+
+    def plan(record):
+        try:
+            return plan_new_job(
+                record["Position"], record["Company"], record["ID"], record["Status"],
+                record["Candidate Home Link"], record["Snapshot"], record["Resume/CV"],
+                record["Cover Letter"], blobs
+            ), None
+        except (ValueError, OSError) as e:
+            return None, str(e)
+
+    planned = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import") as executor:
+        for number, (result, error) in enumerate(executor.map(plan, records), 1):
+            if error is None:
+                planned.append((number, *result))
+            else:
+                errors.append((number, error))
+    return planned, errors
+
+
+def import_jobs(store, records, blobs=None):
+    # Transfers every job's files, then commits all records with a single write.
+    # Returns (added jobs, [(record number, error)]).
+    planned, errors = plan_import(records, blobs)
+    added = []
+    for number, job, operations in planned:
+        key = store.reserve_key(job)
+        try:
+            _transfer(key, operations)
+        except Exception as e:
+            store.release_key(key)
+            discard_job_directory(job)
+            errors.append((number, str(e)))
+            continue
+        added.append(job)
+    store.add_many(added, "import")
+    return added, sorted(errors)
+
+
+def set_status_many(store, keys, new_status):
+    # Returns {key: changed fields}; the store writes once for the whole batch
+    changes = status_changes(new_status)
+    with store.batch():
+        return {key: store.update(store.get(key), changes, "status") for key in keys}
+
+
+def duplicate_many(store, keys, blobs=None):
+    with store.batch():
+        return [duplicate_job(store, key, blobs) for key in keys]
+
+
+def delete_many(store, keys, keep_files=True):
+    with store.batch():
+        return [delete_job(store, key, keep_files) for key in keys]
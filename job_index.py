@@ -0,0 +1,173 @@
+import math
+import re
+from bisect import bisect_left, insort
+
+from storage import KEY_FIELD
+
+TEXT_FIELDS = ("Position", "Company", "ID")
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class JobIndex:
+    def __init__(self, jobs=()):
+        self.jobs = {}           # key -> record
+        self._seq = {}           # key -> insertion number, the unsorted order
+        self._next_seq = 0
+        self._status_of = {}     # key -> status bucket the record is in
+        self._statuses = {}      # status -> keys
+        self._tokens = {}        # key -> tokens of Position, Company and ID
+        self._postings = {}      # token -> keys
+        self._vocabulary = []    # sorted tokens, for prefix lookups
+        self._orders = {}        # field -> sorted sort keys, built on first use
+        self._sort_keys = {}     # field -> {key: sort key} for the orders above
+        for job in jobs:
+            self.add(job)
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def __contains__(self, key):
+        return key in self.jobs
+
+    def sort_key(self, key, field=None):
+        # The insertion number breaks ties, so every sort key is unique
+        value = self.jobs[key].get(field, "").lower() if field else ""
+        return (value, self._seq[key], key)
+
+    def add(self, job):
+        key = job[KEY_FIELD]
+        self.jobs[key] = job
+        self._seq[key] = self._next_seq
+        self._next_seq += 1
+        self._index_status(key)
+        self._index_tokens(key)
+        for field, order in self._orders.items():
+            sort_key = self.sort_key(key, field)
+            self._sort_keys[field][key] = sort_key
+            insort(order, sort_key)
+
+    def add_many(self, jobs):
+        # Appending a batch and re-sorting once merges two sorted runs, which is
+        # far cheaper than one insort per record into a large order
+        orders = self._orders
+        self._orders = {}
+        for job in jobs:
+            self.add(job)
+        self._orders = orders
+        for field, order in orders.items():
+            sort_keys = self._sort_keys[field]
+            for job in jobs:
+                sort_key = self.sort_key(job[KEY_FIELD], field)
+                sort_keys[job[KEY_FIELD]] = sort_key
+                order.append(sort_key)
+            order.sort()
+
+    def remove(self, key):
+        self._statuses[self._status_of.pop(key)].discard(key)
+        for token in self._tokens.pop(key):
+            self._drop_posting(token, key)
+        for field, order in self._orders.items():
+            sort_key = self._sort_keys[field].pop(key)
+            del order[bisect_left(order, sort_key)]
+        del self.jobs[key]
+        del self._seq[key]
+
+    def update(self, key, fields):
+        # Only the structures that depend on the changed fields are touched
+        fields = set(fields)
+        if "Status" in fields:
+            self._statuses[self._status_of.pop(key)].discard(key)
+            self._index_status(key)
+        if fields & set(TEXT_FIELDS):
+            for token in self._tokens.pop(key):
+                self._drop_posting(token, key)
+            self._index_tokens(key)
+        for field, order in self._orders.items():
+            if field in fields:
+                sort_key = self.sort_key(key, field)
+                del order[bisect_left(order, self._sort_keys[field][key])]
+                self._sort_keys[field][key] = sort_key
+                insort(order, sort_key)
+
+    def _index_status(self, key):
+        status = self.jobs[key].get("Status", "")
+        self._status_of[key] = status
+        self._statuses.setdefault(status, set()).add(key)
+
+    def _index_tokens(self, key):
+        job = self.jobs[key]
+        tokens = set()
+        for field in TEXT_FIELDS:
+            tokens.update(tokenize(job.get(field, "")))
+        self._tokens[key] = tokens
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                insort(self._vocabulary, token)
+            postings.add(key)
+
+    def _drop_posting(self, token, key):
+        postings = self._postings[token]
+        postings.discard(key)
+        if not postings:
+            del self._postings[token]
+            del self._vocabulary[bisect_left(self._vocabulary, token)]
+
+    def order(self, field=None):
+        # Sorted once per field, then kept up to date by add/remove/update
+        if field not in self._orders:
+            sort_keys = {key: self.sort_key(key, field) for key in self.jobs}
+            self._sort_keys[field] = sort_keys
+            self._orders[field] = sorted(sort_keys.values())
+        return self._orders[field]
+
+    def _prefix_matches(self, prefix):
+        keys = set()
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            keys |= self._postings[self._vocabulary[position]]
+            position += 1
+        return keys
+
+    def filters_statuses(self, statuses):
+        return statuses is not None and not set(self._statuses) <= set(statuses)
+
+    def matches(self, key, tokens=(), statuses=None):
+        if self.filters_statuses(statuses) and self._status_of[key] not in statuses:
+            return False
+        job_tokens = self._tokens[key]
+        return all(any(token.startswith(prefix) for token in job_tokens) for prefix in tokens)
+
+    def candidates(self, tokens=(), statuses=None):
+        # None means every job; otherwise only the postings and buckets involved are read
+        result = None
+        for prefix in tokens:
+            keys = self._prefix_matches(prefix)
+            result = keys if result is None else result & keys
+            if not result:
+                return set()
+        if self.filters_statuses(statuses):
+            buckets = [self._statuses.get(status, set()) for status in statuses]
+            if result is None:
+                result = set().union(*buckets)
+            else:
+                result = {key for key in result if self._status_of[key] in statuses}
+        return result
+
+    def query(self, tokens=(), statuses=None, field=None):
+        # Returns the sort keys of the matching jobs in ascending order
+        candidates = self.candidates(tokens, statuses)
+        if candidates is None:
+            return list(self.order(field))
+        sort_keys = self._sort_keys.get(field)
+        if sort_keys is None:
+            return sorted(self.sort_key(key, field) for key in candidates)
+        # Sorting a few matches beats walking the whole maintained order
+        if len(candidates) * math.log2(len(candidates) + 2) < len(self.jobs):
+            return sorted(sort_keys[key] for key in candidates)
+        return [sort_key for sort_key in self._orders[field] if sort_key[2] in candidates]
@@ -1,112 +1,76 @@
+import argparse
+import pickle
+import sqlite3
 import sys
-import csv
 import os
-import shutil
-import datetime
+import threading
 
 import webbrowser
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QTableWidget, QTableWidgetItem, QVBoxLayout, 
+    QApplication, QMainWindow, QTableView, QAbstractItemView, QHeaderView, QVBoxLayout, 
     QPushButton, QWidget, QDialog, QFormLayout, QLineEdit, QComboBox, 
-    QFileDialog, QMessageBox, QHBoxLayout, QCheckBox, QMenu  
+    QFileDialog, QMessageBox, QHBoxLayout, QCheckBox, QMenu, QToolButton, QProgressBar, QShortcut, QSplitter,
+    QInputDialog, QToolTip
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QColor
-
-CSV_FILE = 'jobs.csv'
-JOBS_FOLDER = 'job_positions'
-APPLICATION_STATUSES = ["Not started", "Applied", "Interview", "Rejection", "Offer"]
-
-STATUS_COLORS = {
-    "Not started": QColor(255, 255, 255),  # White
-    "Applied": QColor(173, 216, 230),      # Light Blue
-    "Interview": QColor(255, 255, 0),      # Yellow
-    "Rejection": QColor(255, 0, 0),        # Red
-    "Offer": QColor(0, 255, 0)             # Green
-}
-
-def initialize_csv():
-    if not os.path.exists(CSV_FILE):
-        with open(CSV_FILE, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow([
-                "Position", 
-                "Company", 
-                "ID", 
-                "Snapshot",
-                "Status",
-                "Resume/CV",
-                "Cover Letter",
-                "Last Updated",
-                "Candidate Home Link",
-                "Submitted"  
-            ])
-
-def load_jobs():
-    jobs = []
-    if not os.path.exists(CSV_FILE):
-        return jobs
-
-    with open(CSV_FILE, mode='r', newline='', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            jobs.append(row)
-    return jobs
-
-def save_jobs(jobs):
-    with open(CSV_FILE, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        writer.writerow([
-            "Position", 
-            "Company", 
-            "ID", 
-            "Snapshot", 
-            "Status", 
-            "Resume/CV", 
-            "Cover Letter", 
-            "Last Updated",
-            "Candidate Home Link",
-            "Submitted"  
-        ])
-        for job in jobs:
-            writer.writerow([
-                job["Position"],
-                job["Company"],
-                job["ID"],
-                job["Snapshot"],
-                job["Status"],
-                job["Resume/CV"],
-                job["Cover Letter"],
-                job["Last Updated"],
-                job.get("Candidate Home Link", ""),
-                job.get("Submitted", "")])  
-
-def create_job_directory(position_name, company_name, job_id):
-    if not os.path.exists(JOBS_FOLDER):
-        os.makedirs(JOBS_FOLDER)
-
-    safe_position_name = position_name.replace(" ", "_")
-    safe_company_name  = company_name.replace(" ", "_")
-    safe_job_id        = job_id.replace(" ", "_")
-    dirname = f"{safe_position_name}-{safe_company_name}-{safe_job_id}"
-    path   = os.path.join(JOBS_FOLDER, dirname)
-
-    if not os.path.exists(path):
-        os.makedirs(path)
-
-    return path
-
-def rename_job_directory(old_path, new_position_name, new_company_name, new_job_id):
-    safe_position_name = new_position_name.replace(" ", "_")
-    safe_company_name  = new_company_name.replace(" ", "_")
-    safe_job_id        = new_job_id.replace(" ", "_")
-    new_dirname = f"{safe_position_name}-{safe_company_name}-{safe_job_id}"
-    new_path = os.path.join(JOBS_FOLDER, new_dirname)
-    return new_path
+from PyQt5.QtCore import Qt, QObject, QThread, QTimer, QCoreApplication, QByteArray, pyqtSignal
+from PyQt5.QtGui import QCursor, QKeySequence
+
+import instrumentation
+from archive import JobArchive
+from blob_store import BlobStore
+from dashboard import DashboardDialog
+from diagnostics import DiagnosticsDialog
+from file_ops import FileOperationQueue, TransferCancelled
+from file_watcher import JobsFileWatcher
+from ingest import fetch_postings
+from integrity import MISSING, MOVED, IntegrityScanner, repair
+from job_index import tokenize
+from job_core import (
+    APPLICATION_STATUSES, validate_job, discard_job_directory, plan_new_job, plan_duplicate, plan_edit, plan_archive, plan_delete,
+    plan_detach, plan_import, plan_relocation, read_import, finish_relocation, split_relocation, status_changes, today
+)
+from job_store import JobStore
+from journal import Journal
+from relocations import RelocationLog
+from storage import DOCUMENT_FIELDS, JOBS_FOLDER, KEY_FIELD, CsvBackend, open_backend, export_csv
+from sync import open_sync
+from jobs_model import JobsTableModel, JobsFilterProxyModel, JobsItemDelegate, COMPANY_COLUMN, FILE_COLUMNS, JOB_COLUMNS
+from preview_cache import PreviewCache
+from previews import PREVIEW_WIDTH, PreviewLoader, PreviewPane
+from text_index import TextIndex, documents_of
+from timeline import TimelineDialog
+
+LAYOUT_CACHE = 'layout.cache'
+AUTOSIZE_SAMPLE = 500  # Rows measured per column; larger tables are measured at evenly spread rows
+SYNC_INTERVAL = 30000  # Milliseconds between exchanges with the sync folder
+PREFETCH_DELAY = 150  # Milliseconds of quiet scrolling before the rows on screen are previewed
+
+
+def read_layout(signature, path=LAYOUT_CACHE):
+    # Column widths and window geometry saved for exactly this jobs file, or None
+    if signature is None:
+        return None
+    try:
+        with open(path, 'rb') as file:
+            layout = pickle.load(file)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+    if not isinstance(layout, dict) or layout.get("signature") != signature:
+        return None
+    return layout
+
+
+def write_layout(layout, path=LAYOUT_CACHE):
+    try:
+        with open(path, 'wb') as file:
+            pickle.dump(layout, file)
+    except OSError as e:
+        instrumentation.event("layout_not_saved", "gui", error=str(e))
 
 class AddJobDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, blobs, parent=None):
         super().__init__(parent)
+        self.blobs = blobs
         self.setWindowTitle("Add New Job")
         self.setGeometry(100, 100, 400, 300)
 
@@ -177,68 +141,25 @@ class AddJobDialog(QDialog):
         resume_path = self.resume_path.strip()
         cover_letter_path = self.cover_letter_path.strip()
 
-        if not position_name or not company_name or not job_id:
-            QMessageBox.warning(self, "Warning", "Position, Company, and ID are required.")
-            return
-
-        if status not in APPLICATION_STATUSES:
-            QMessageBox.warning(self, "Warning", "Invalid application status.")
+        try:
+            # The files are transferred in the background and the job is only
+            # committed once they have landed, see JobManagerGUI.run_file_task
+            self.new_job, self.operations = plan_new_job(
+                position_name, company_name, job_id, status, candidate_home_link,
+                link_to_snapshot, resume_path, cover_letter_path, self.blobs
+            )
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Warning", str(e))
             return
-
-        date_last_updated = datetime.date.today().strftime("%Y-%m-%d")
-        new_job = {
-            "Position": position_name,
-            "Company": company_name,
-            "Candidate Home Link": candidate_home_link,
-            "ID": job_id,
-            "Snapshot": link_to_snapshot,
-            "Status": status,
-            "Resume/CV": os.path.basename(resume_path),
-            "Cover Letter": cover_letter_path,
-            "Last Updated": date_last_updated
-        }
-
-        jobs = load_jobs()
-        jobs.append(new_job)
-
-        job_dir = create_job_directory(position_name, company_name, job_id)
-        if resume_path and os.path.isfile(resume_path):
-            try:
-                new_resume_path = os.path.join(job_dir, os.path.basename(resume_path))
-                shutil.copy2(resume_path, new_resume_path)
-                new_job["Resume/CV"] = new_resume_path
-            except Exception as e:
-                QMessageBox.critical(self, "Error Copying Resume", str(e))
-
-        # Move snapshot file to the new directory
-        if link_to_snapshot and os.path.isfile(link_to_snapshot):
-            try:
-                new_snapshot_path = os.path.join(job_dir, os.path.basename(link_to_snapshot))
-                shutil.move(link_to_snapshot, new_snapshot_path)
-                new_job["Snapshot"] = new_snapshot_path
-            except Exception as e:
-                QMessageBox.critical(self, "Error Moving Snapshot", str(e))
-
-        # Copy cover letter to the new directory
-        if cover_letter_path and os.path.isfile(cover_letter_path):
-            try:
-                new_cover_letter = os.path.join(job_dir, os.path.basename(cover_letter_path))
-                shutil.copy2(cover_letter_path, new_cover_letter)
-                new_job["Cover Letter"] = new_cover_letter
-            except Exception as e:
-                QMessageBox.critical(self, "Error Copying Cover Letter", str(e))
-
-        save_jobs(jobs)
         self.accept()
 
 class EditJobDialog(QDialog):
-    def __init__(self, parent, job, job_dir, row):
+    def __init__(self, parent, store, job):
         super().__init__(parent)
         self.setWindowTitle("Edit Job")
         self.setGeometry(100, 100, 400, 300)
+        self.store = store
         self.job = job
-        self.job_dir = job_dir
-        self.row = row
 
         self.position_name = QLineEdit(job["Position"])
         self.company_name = QLineEdit(job["Company"])
@@ -296,71 +217,82 @@ class EditJobDialog(QDialog):
             self.browse_cover_letter_button.setText(f"Cover Letter: {os.path.basename(file_path)}")
 
     def save_changes(self):
-        new_position_name = self.position_name.text().strip()
-        new_company_name = self.company_name.text().strip()
-        new_candidate_home_link = self.candidate_home_link.text().strip()
-        new_job_id = self.job_id.text().strip()
-        new_link_to_snapshot = self.link_to_snapshot.text().strip()
-        new_status = self.status.currentText()
-        new_resume_path = self.resume_path
-        new_cover_letter_path = self.cover_letter_path
-
-        if not new_position_name or not new_company_name or not new_job_id:
-            QMessageBox.warning(self, "Warning", "Position, Company, and ID are required.")
-            return
-
-        if new_status not in APPLICATION_STATUSES:
-            QMessageBox.warning(self, "Warning", "Invalid application status.")
+        changes = {
+            "Position": self.position_name.text().strip(),
+            "Company": self.company_name.text().strip(),
+            "Candidate Home Link": self.candidate_home_link.text().strip(),
+            "ID": self.job_id.text().strip(),
+            "Snapshot": self.link_to_snapshot.text().strip(),
+            "Status": self.status.currentText(),
+            "Resume/CV": self.resume_path,
+            "Cover Letter": self.cover_letter_path,
+            "Last Updated": today(),
+        }
+        try:
+            validate_job(changes["Position"], changes["Company"], changes["ID"], changes["Status"])
+            # The directory is moved by the caller, off the GUI thread
+            self.changes, self.operations, self.destination = plan_edit(self.store, self.job[KEY_FIELD], changes)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Warning", str(e))
             return
-        
-        old_path = self.job_dir
-        new_path = rename_job_directory(self.job_dir, new_position_name, new_company_name, new_job_id)
-        print(f"New Job Directory: {new_path}")
-        # Update paths to resume and snapshot files before renaming the directory
-        resume_path = self.job["Resume/CV"]
-        snapshot_path = self.job["Snapshot"]
-        cover_letter_path = self.job["Cover Letter"]
-
-        print(f"Checking if resume file exists: {resume_path}")
-        if os.path.isfile(resume_path):
-            new_resume_path = os.path.join(new_path, os.path.basename(resume_path))
-            self.job["Resume/CV"] = new_resume_path
-        else:
-            print(f"Resume file not found: {resume_path}")
-
-        print(f"Checking if snapshot file exists: {snapshot_path}")
-        if os.path.isfile(snapshot_path):
-            new_snapshot_path = os.path.join(new_path, os.path.basename(snapshot_path))
-            self.job["Snapshot"] = new_snapshot_path
-        else:
-            print(f"Snapshot file not found: {snapshot_path}")
+        self.accept()
 
-        print(f"Checking if cover letter file exists: {cover_letter_path}")
-        if os.path.isfile(cover_letter_path):
-            new_cover_letter_path = os.path.join(new_path, os.path.basename(cover_letter_path))
-            self.job["Cover Letter"] = new_cover_letter_path
-        else:
-            print(f"Cover letter file not found: {cover_letter_path}")
+class FileTaskSignals(QObject):
+    # Carries FileOperationQueue callbacks from the worker threads to the GUI thread
+    progress = pyqtSignal(str, int)
+    finished = pyqtSignal(object)
+
+class SearchIndexSignals(QObject):
+    # Reports index updates from the indexing thread to the GUI thread
+    updated = pyqtSignal()
+    failed = pyqtSignal(str)
+
+class IntegritySignals(QObject):
+    # Hands scan results from the scanning thread to the GUI thread
+    scanned = pyqtSignal(object, bool)  # {key: {field: (state, candidate)}}, full scan
+    failed = pyqtSignal(str)
+
+class ArchiveSignals(QObject):
+    # Results of archive reads and writes, from the archive thread to the GUI thread
+    loaded = pyqtSignal(object)    # archived records
+    archived = pyqtSignal(object)  # (records, directories packed)
+    restored = pyqtSignal(object)  # records with their files back in place
+    discarded = pyqtSignal()       # restored records dropped from the archive
+    failed = pyqtSignal(str)
+
+class SyncSignals(QObject):
+    # Change sets applied on the sync thread, shown on the GUI thread
+    applied = pyqtSignal(object)  # (changes applied, added, removed, changed, archived)
+    failed = pyqtSignal(str)
+
+class IngestSignals(QObject):
+    # Postings saved on the ingest thread, committed on the GUI thread
+    fetched = pyqtSignal(object)  # (records, [(url, reason skipped)], [(url, error)])
+    failed = pyqtSignal(str)
+
+class FileBatch:
+    # Transfers started together. The store holds its writes until the last
+    # of them finished, and errors are reported once for the whole batch.
+    def __init__(self, title):
+        self.title = title
+        self.keys = set()
+        self.errors = []
+
+class JobLoader(QThread):
+    # Parses the stored jobs off the GUI thread and hands them over in chunks
+    chunk_loaded = pyqtSignal(object, int)  # records, percent read
+    failed = pyqtSignal(str)
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
 
-        # Rename the directory after moving the files
-        
-        
-        os.rename(old_path, new_path)
-        self.job["Position"] = new_position_name
-        self.job["Company"] = new_company_name
-        self.job["Candidate Home Link"] = new_candidate_home_link
-        self.job["ID"] = new_job_id
-        self.job["Snapshot"] = new_link_to_snapshot
-        self.job["Status"] = new_status
-        self.job["Resume/CV"] = new_resume_path
-        self.job["Cover Letter"] = new_cover_letter_path
-        self.job["Last Updated"] = datetime.date.today().strftime("%Y-%m-%d")
-
-        jobs = load_jobs()
-        jobs[self.row] = self.job
-        save_jobs(jobs)
-        self.parent().populate_jobs()
-        self.accept()
+    def run(self):
+        try:
+            for jobs, fraction in self.store.load_chunks():
+                self.chunk_loaded.emit(jobs, int(fraction * 100))
+        except Exception as e:
+            self.failed.emit(str(e))
 
 class JobManagerGUI(QMainWindow):
     def __init__(self):
@@ -368,223 +300,1102 @@ class JobManagerGUI(QMainWindow):
         self.setWindowTitle("NextStep")
         self.setGeometry(100, 100, 1000, 400)
 
-        self.table = QTableWidget()
-        self.table.setColumnCount(9)
-        self.table.setHorizontalHeaderLabels([
-            "Position", "Company", "ID", "Snapshot", 
-            "Status", "Resume/CV", "Cover Letter", "Submitted", "Last Updated"
-        ])
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table.cellDoubleClicked.connect(self.edit_status)
+        self.model = JobsTableModel(self)
+        self.model.status_edited.connect(self.update_status)
+        self.proxy = JobsFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.delegate = JobsItemDelegate(APPLICATION_STATUSES, self)
+        self.delegate.open_requested.connect(self.open_file)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setItemDelegate(self.delegate)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.table.setEditTriggers(QAbstractItemView.DoubleClicked)  # Only the Status column is editable
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.open_context_menu)
-        self.table.cellClicked.connect(self.cell_clicked)  # Connect cellClicked signal
+        self.table.clicked.connect(self.cell_clicked)
+        # Start in file order; clicking a header sorts by that column
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
+
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search position, company or ID")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.apply_search)
+
+        self.document_search_checkbox = QCheckBox("Search documents")
+        self.document_search_checkbox.setToolTip("Rank jobs by the text of their resume, cover letter and snapshot")
+        self.document_search_checkbox.toggled.connect(self.apply_search)
+
+        self.status_filter_button = QToolButton()
+        self.status_filter_button.setText("Statuses")
+        self.status_filter_button.setPopupMode(QToolButton.InstantPopup)
+        status_menu = QMenu(self.status_filter_button)
+        self.status_filter_actions = []
+        for status in APPLICATION_STATUSES:
+            action = status_menu.addAction(status)
+            action.setCheckable(True)
+            action.setChecked(True)
+            action.toggled.connect(self.apply_status_filter)
+            self.status_filter_actions.append(action)
+        self.status_filter_button.setMenu(status_menu)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(self.search_edit)
+        filter_layout.addWidget(self.document_search_checkbox)
+        filter_layout.addWidget(self.status_filter_button)
 
         add_button = QPushButton("Add Job")
         add_button.setStyleSheet("background-color: green; color: white;")
         add_button.clicked.connect(self.open_add_job_dialog)
 
+        import_button = QPushButton("Import Jobs")
+        import_button.clicked.connect(self.open_import_dialog)
+
+        ingest_button = QPushButton("Add from Postings")
+        ingest_button.setToolTip("Add jobs from the addresses of their postings, with the pages saved as snapshots")
+        ingest_button.clicked.connect(self.open_ingest_dialog)
+
         refresh_button = QPushButton("Refresh")
-        refresh_button.clicked.connect(self.populate_jobs)
+        refresh_button.clicked.connect(self.reload_jobs)
+
+        self.export_button = QPushButton("Export CSV")
+        self.export_button.clicked.connect(self.export_jobs)
+
+        self.archive_button = QPushButton("Archive Rejected")
+        self.archive_button.setToolTip("Move rejected applications out of the list; they stay searchable when shown")
+        self.archive_button.clicked.connect(self.archive_rejected)
+
+        dashboard_button = QPushButton("Dashboard")
+        dashboard_button.clicked.connect(self.open_dashboard)
+
+        # Shown while the scan found files that can be pointed at their new place
+        self.repair_button = QPushButton()
+        self.repair_button.clicked.connect(self.repair_files)
+        self.repair_button.hide()
 
         exit_button = QPushButton("Exit")
         exit_button.clicked.connect(self.close)
 
         self.hide_rejected_checkbox = QCheckBox("Hide Rejected Applications")
-        self.hide_rejected_checkbox.stateChanged.connect(self.populate_jobs)
+        self.hide_rejected_checkbox.stateChanged.connect(self.apply_status_filter)
+
+        self.preview_checkbox = QCheckBox("Show Previews")
+        self.preview_checkbox.toggled.connect(self.toggle_previews)
+
+        # Previews are rendered on a worker pool into a bounded cache: ahead
+        # of time for the rows on screen while previews are shown, and for a
+        # document hovered over
+        self.preview_cache = PreviewCache()
+        self.previews = PreviewLoader(self.preview_cache, self)
+        self.previews.ready.connect(self.hover_preview_ready)
+        self.model.preview_lookup = self.preview_cache.cached
+        self.model.preview_request = self.previews.request
+        self.preview_pane = PreviewPane(self.previews)
+        self.preview_pane.hide()
+        self.prefetch_timer = QTimer(self)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.setInterval(PREFETCH_DELAY)
+        self.prefetch_timer.timeout.connect(self.prefetch_previews)
+        self.table.verticalScrollBar().valueChanged.connect(lambda value: self.prefetch_timer.start())
+        for signal in (self.proxy.modelReset, self.proxy.layoutChanged, self.proxy.rowsInserted, self.proxy.rowsRemoved):
+            signal.connect(lambda *args: self.prefetch_timer.start())
+        self.table.selectionModel().currentChanged.connect(self.show_preview)
 
         button_layout = QHBoxLayout()
         button_layout.addWidget(add_button)
+        button_layout.addWidget(import_button)
+        button_layout.addWidget(ingest_button)
+        button_layout.addWidget(self.export_button)
+        button_layout.addWidget(self.archive_button)
+        button_layout.addWidget(dashboard_button)
+        button_layout.addWidget(self.repair_button)
+        if instrumentation.recorder.enabled:
+            diagnostics_button = QPushButton("Diagnostics")
+            diagnostics_button.clicked.connect(self.open_diagnostics)
+            button_layout.addWidget(diagnostics_button)
         button_layout.addWidget(exit_button)
 
         main_layout = QVBoxLayout()
-        main_layout.addWidget(self.table)
+        main_layout.addLayout(filter_layout)
+        self.splitter = QSplitter()
+        self.splitter.addWidget(self.table)
+        self.splitter.addWidget(self.preview_pane)
+        self.splitter.setStretchFactor(0, 1)
+        main_layout.addWidget(self.splitter)
         main_layout.addLayout(button_layout)
         main_layout.addWidget(self.hide_rejected_checkbox)
+        main_layout.addWidget(self.preview_checkbox)
 
         container = QWidget()
         container.setLayout(main_layout)
         self.setCentralWidget(container)
 
-        initialize_csv()
+        self.load_progress = QProgressBar()
+        self.load_progress.setMaximumWidth(200)
+        self.load_progress.setFormat("Loading jobs... %p%")
+        self.statusBar().addPermanentWidget(self.load_progress)
+
+        # Text fields keep their own undo while they have the focus
+        QShortcut(QKeySequence.Undo, self, self.undo)
+        QShortcut(QKeySequence.Redo, self, self.redo)
+
+        self.store = JobStore(open_backend(), lazy=True, journal=Journal())
+        self.blobs = BlobStore()
+        self.file_ops = FileOperationQueue()
+        self.file_signals = FileTaskSignals(self)
+        self.file_signals.progress.connect(self.file_task_progress)
+        self.file_signals.finished.connect(self.file_task_finished)
+        self.pending_jobs = {}      # key -> job waiting for its files
+        self.file_callbacks = {}    # key -> (commit to run once the transfer succeeded, or else cleanup)
+        self.relocations = RelocationLog()
+        self.file_batches = {}      # key -> FileBatch the transfer belongs to
+        self.columns_fitted = False
+        self.layout_restored = False
+        self.diagnostics_dialog = None
+        self.dashboard_dialog = None
+
+        # Documents are indexed on one background thread, in the order they changed
+        from concurrent.futures import ThreadPoolExecutor
+        self.search_index = TextIndex()
+        self.search_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-index")
+        self.search_signals = SearchIndexSignals(self)
+        self.search_signals.updated.connect(self.search_index_updated)
+        self.search_signals.failed.connect(self.search_index_failed)
+
+        # Referenced files are checked in the background, the table is marked when a result arrives
+        self.scanner = IntegrityScanner()
+        self.scan_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="integrity")
+        self.integrity_signals = IntegritySignals(self)
+        self.integrity_signals.scanned.connect(self.files_scanned)
+        self.integrity_signals.failed.connect(self.scan_failed)
+
+        # Archived jobs are only read once rejected applications are shown
+        self.archive = JobArchive()
+        self.archive_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive")
+        self.archive_signals = ArchiveSignals(self)
+        self.archive_signals.loaded.connect(self.archive_loaded)
+        self.archive_signals.archived.connect(self.jobs_archived)
+        self.archive_signals.restored.connect(self.jobs_restored)
+        self.archive_signals.discarded.connect(self.archive_written)
+        self.archive_signals.failed.connect(self.archive_failed)
+        self.archive_requested = False
+        self.archive_shown = False
+
+        # Postings are downloaded and saved on their own thread, one list at a time
+        self.ingest_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+        self.ingest_signals = IngestSignals(self)
+        self.ingest_signals.fetched.connect(self.postings_fetched)
+        self.ingest_signals.failed.connect(self.ingest_failed)
+        self.ingest_running = False
+        self.ingest_cancel = threading.Event()  # Of the running fetch; set when the window closes
+        try:
+            archived_keys = self.archive.keys()
+        except ValueError as e:
+            QMessageBox.warning(self, "Error Reading Archive", str(e))
+            archived_keys = set()
+        self.store.reserve_keys(archived_keys)
+        if archived_keys:
+            self.hide_rejected_checkbox.setChecked(True)
         self.populate_jobs()
 
+        # Pick up edits made by other devices through a synced folder
+        if isinstance(self.store.backend, CsvBackend):
+            self.file_watcher = JobsFileWatcher(self.store.backend.path, JOBS_FOLDER, parent=self)
+            self.file_watcher.jobs_changed.connect(self.reload_jobs)
+            self.file_watcher.folder_changed.connect(self.model.refresh_files)
+            self.file_watcher.folder_changed.connect(self.scan_files)
+
+        # Edits are exchanged with other devices when NEXTSTEP_SYNC names a shared folder
+        self.sync = open_sync()
+        self.sync_running = False
+        if self.sync is not None:
+            self.sync_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sync")
+            self.sync_signals = SyncSignals(self)
+            self.sync_signals.applied.connect(self.changes_applied)
+            self.sync_signals.failed.connect(self.sync_failed)
+            self.sync_timer = QTimer(self)
+            self.sync_timer.timeout.connect(self.sync_jobs)
+            self.sync_timer.start(SYNC_INTERVAL)
+
+    def closeEvent(self, event):
+        # Let running transfers land and commit their jobs before the final flush
+        self.loader.wait()
+        self.file_ops.shutdown()
+        # Downloads are not waited for; postings not added yet are taken back
+        self.ingest_cancel.set()
+        self.ingest_worker.shutdown(cancel_futures=True)
+        QCoreApplication.processEvents()
+        # Whatever is not indexed yet is picked up by the next start's sync
+        self.search_worker.shutdown(cancel_futures=True)
+        self.search_index.close()
+        self.previews.shutdown()
+        self.scan_worker.shutdown(cancel_futures=True)
+        if self.dashboard_dialog is not None:
+            self.dashboard_dialog.shutdown()
+        # Archive writes are finished, not dropped; until the store is saved an archived job is in both
+        self.archive_worker.shutdown()
+        if self.sync is not None:
+            self.sync_timer.stop()
+            self.sync_worker.shutdown(cancel_futures=True)
+        try:
+            self.store.close()
+        except Exception as e:
+            QMessageBox.critical(self, "Error Saving Jobs", str(e))
+        else:
+            # Keyed by the file as last written, so the next start can skip measuring
+            self.save_layout()
+            if self.sync is not None:
+                try:
+                    self.sync.push()
+                except OSError as e:
+                    QMessageBox.warning(self, "Sync Error", str(e))
+        super().closeEvent(event)
+
     def open_context_menu(self, position):
+        index = self.table.currentIndex()
+        if not index.isValid():
+            return
+        # Resolve the records now; rows may move once the table refreshes
+        keys = self.selected_keys()
+        if len(keys) > 1:
+            self.open_batch_menu(keys, position)
+            return
+        key = self.proxy.key(index.row())
+
         menu = QMenu()
+        if self.model.is_archived(key):
+            restore_action = menu.addAction("Restore from Archive")
+            history_action = menu.addAction("History")
+            action = menu.exec_(self.table.viewport().mapToGlobal(position))
+            if action == restore_action:
+                self.restore_jobs([key])
+            elif action == history_action:
+                self.open_timeline(key)
+            return
+        if key in self.file_ops:
+            cancel_action = menu.addAction("Cancel File Transfer")
+            if menu.exec_(self.table.viewport().mapToGlobal(position)) == cancel_action:
+                self.file_ops.cancel(key)
+            return
+
         edit_action = menu.addAction("Edit")
         delete_action = menu.addAction("Delete")
         duplicate_action = menu.addAction("Duplicate")
         open_directory_action = menu.addAction("Open Directory")
+        archive_action = menu.addAction("Archive")
+        history_action = menu.addAction("History")
+        repair_action = None
+        problems = self.model.file_problems.get(key, {})
+        if any(state == MOVED for state, _ in problems.values()):
+            repair_action = menu.addAction("Repair File Paths")
 
         action = menu.exec_(self.table.viewport().mapToGlobal(position))
-        if action == edit_action:
-            self.open_edit_job_dialog(self.table.currentRow())
+        if action is None:
+            return
+        if action == repair_action:
+            self.repair_files([key])
+        elif action == edit_action:
+            self.open_edit_job_dialog(key)
         elif action == delete_action:
-            self.delete_job(self.table.currentRow())
+            self.delete_job(key)
         elif action == duplicate_action:
-            self.duplicate_job(self.table.currentRow())
+            self.duplicate_job(key)
         elif action == open_directory_action:
-            self.open_job_directory(self.table.currentRow())
+            self.open_job_directory(key)
+        elif action == archive_action:
+            self.archive_jobs([key])
+        elif action == history_action:
+            self.open_timeline(key)
+
+    def selected_keys(self):
+        return [self.proxy.key(index.row()) for index in self.table.selectionModel().selectedRows()]
+
+    def open_batch_menu(self, keys, position):
+        # Jobs still waiting for their files are left out; archived ones can only be restored
+        archived = [key for key in keys if self.model.is_archived(key)]
+        keys = [key for key in keys if key in self.store and key not in self.file_ops]
+        if not keys and not archived:
+            return
+
+        menu = QMenu()
+        status_actions = {}
+        duplicate_action = delete_action = archive_action = restore_action = None
+        if keys:
+            status_menu = menu.addMenu(f"Set Status of {len(keys)} Jobs")
+            status_actions = {status_menu.addAction(status): status for status in APPLICATION_STATUSES}
+            duplicate_action = menu.addAction(f"Duplicate {len(keys)} Jobs")
+            delete_action = menu.addAction(f"Delete {len(keys)} Jobs")
+            archive_action = menu.addAction(f"Archive {len(keys)} Jobs")
+        if archived:
+            restore_action = menu.addAction(f"Restore {len(archived)} Jobs from Archive")
+
+        action = menu.exec_(self.table.viewport().mapToGlobal(position))
+        if action is None:
+            return
+        if action in status_actions:
+            self.update_statuses(keys, status_actions[action])
+        elif action == duplicate_action:
+            self.duplicate_jobs(keys)
+        elif action == delete_action:
+            self.delete_jobs(keys)
+        elif action == archive_action:
+            self.archive_jobs(keys)
+        elif action == restore_action:
+            self.restore_jobs(archived)
 
     def populate_jobs(self):
-        jobs = load_jobs()
-        if self.hide_rejected_checkbox.isChecked():
-            jobs = [job for job in jobs if job["Status"] != "Rejection"]
-        self.table.setRowCount(len(jobs))
-        for row, job in enumerate(jobs):
-            self.table.setItem(row, 0, QTableWidgetItem(job["Position"]))
-            company_item = QTableWidgetItem(job["Company"])
-            link = job.get("Candidate Home Link", "")
-            if link:
-                company_item.setForeground(Qt.blue)
-                company_item.setFlags(company_item.flags() | Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-                company_item.setData(Qt.UserRole, link)
-            self.table.setItem(row, 1, company_item)
-            self.table.setItem(row, 2, QTableWidgetItem(job["ID"]))
-            
-            snapshot_button = QPushButton("Open")
-            snapshot_button.clicked.connect(lambda _, path=job["Snapshot"]: self.open_file(path))
-            if not job["Snapshot"]:
-                snapshot_button.setDisabled(True)
-            self.table.setCellWidget(row, 3, snapshot_button)
-            
-            status_item = QTableWidgetItem(job["Status"])
-            status_item.setBackground(STATUS_COLORS.get(job["Status"], QColor(255, 255, 255)))
-            self.table.setItem(row, 4, status_item)
-            
-            resume_button = QPushButton("Open")
-            resume_button.clicked.connect(lambda _, path=job["Resume/CV"]: self.open_file(path))
-            if not job["Resume/CV"]:
-                resume_button.setDisabled(True)
-            self.table.setCellWidget(row, 5, resume_button)
-            
-            cover_letter_button = QPushButton("Open")
-            cover_letter_button.clicked.connect(lambda _, path=job["Cover Letter"]: self.open_file(path))
-            if not job["Cover Letter"]:
-                cover_letter_button.setDisabled(True)
-            self.table.setCellWidget(row, 6, cover_letter_button)
-
-            self.table.setItem(row, 7, QTableWidgetItem(job["Last Updated"]))
-            self.table.setItem(row, 8, QTableWidgetItem(job.get("Submitted", "")))  # Add Submitted column
-
-        self.table.resizeColumnsToContents()  # Automatically adjust column widths
-        self.table.resizeRowsToContents()     # Automatically adjust row heights
-
-        # Adjust the width of the "Status" column to fit the arrow
-        self.table.setColumnWidth(4, self.table.columnWidth(4) + 20)
+        # The window is shown right away and fills up while the file is parsed;
+        # jobs can be added and edited in the meantime
+        self.export_button.setEnabled(False)
+        self.load_span = instrumentation.begin("populate_jobs", "gui")
+        self.loader = JobLoader(self.store, self)
+        self.loader.chunk_loaded.connect(self.jobs_loaded)
+        self.loader.failed.connect(self.loading_failed)
+        self.loader.finished.connect(self.loading_finished)
+        self.loader.start()
+
+    def jobs_loaded(self, jobs, percent):
+        with instrumentation.span("add_jobs_to_model", "gui", rows=len(jobs)):
+            self.model.add_jobs(jobs)
+        self.load_progress.setValue(percent)
+        if not self.columns_fitted:
+            self.columns_fitted = True
+            self.layout_restored = self.restore_layout()
+            if not self.layout_restored:
+                # Sized from the first page, so columns do not jump while loading
+                self.fit_columns()
+
+    def loading_failed(self, message):
+        QMessageBox.critical(
+            self, "Error Loading Jobs",
+            f"{message}\n\nChanges made in this session will not be saved."
+        )
+
+    def loading_finished(self):
+        instrumentation.end(self.load_span)
+        self.load_progress.hide()
+        self.export_button.setEnabled(self.store.loaded)
+        # Catch edits that reached the file while it was being read
+        self.reload_jobs()
+        if self.store.loaded and not self.layout_restored:
+            self.fit_columns()
+        if self.store.loaded:
+            self.resume_relocations()
+            # Only files that changed since the last run are read again
+            self.index_documents(self.search_index.sync, [dict(job) for job in self.store.jobs])
+            self.scan_files()
+
+    def resume_relocations(self):
+        # Directory moves that were interrupted, by a crash or a full disk, are finished first
+        for intent in self.relocations.pending():
+            if intent["key"] in self.file_ops:
+                continue
+            try:
+                operations = plan_relocation(intent["source"], intent["destination"], resume=True)
+            except OSError as e:
+                self.statusBar().showMessage(f"Could not finish moving {intent['source']}: {e}", 10000)
+                continue
+            self.run_file_task(intent["key"], operations, lambda intent=intent: self.relocation_resumed(intent))
+
+    def relocation_resumed(self, intent):
+        changed = finish_relocation(self.store, self.relocations, intent)
+        if changed:
+            self.model.update_job(intent["key"], changed)
+
+    def fit_columns(self):
+        # Measures at most AUTOSIZE_SAMPLE rows per column, spread over the
+        # whole table. The delegate already reserves room for the Status combo arrow.
+        rows = self.proxy.rowCount()
+        with instrumentation.span("fit_columns", "gui", rows=rows):
+            if rows <= AUTOSIZE_SAMPLE:
+                sample = range(rows)
+            else:
+                sample = [row * rows // AUTOSIZE_SAMPLE for row in range(AUTOSIZE_SAMPLE)]
+            header = self.table.horizontalHeader()
+            for column in range(self.proxy.columnCount()):
+                width = max(
+                    [header.sectionSizeHint(column)] +
+                    [self.table.sizeHintForIndex(self.proxy.index(row, column)).width() for row in sample]
+                )
+                self.table.setColumnWidth(column, width)
 
         # Adjust the window width to fit all columns
-        total_width = sum(self.table.columnWidth(col) for col in range(self.table.columnCount()))
+        total_width = sum(self.table.columnWidth(col) for col in range(self.model.columnCount()))
         self.setFixedWidth(total_width + 65)  # Add some padding
 
-    def open_add_job_dialog(self):
-        dialog = AddJobDialog(self)
-        if dialog.exec_() == QDialog.Accepted:
-            self.populate_jobs()
+    def restore_layout(self):
+        # An unchanged jobs file gets the widths and window it had last time, unmeasured
+        layout = read_layout(getattr(self.store.backend, "signature", None))
+        if layout is None:
+            return False
+        for column, width in enumerate(layout["widths"]):
+            self.table.setColumnWidth(column, width)
+        self.restoreGeometry(QByteArray(layout["geometry"]))
+        self.setFixedWidth(layout["width"])
+        return True
+
+    def save_layout(self):
+        signature = getattr(self.store.backend, "signature", None)
+        if signature is None or not self.store.loaded:
+            return
+        write_layout({
+            "signature": signature,
+            "widths": [self.table.columnWidth(column) for column in range(self.model.columnCount())],
+            "geometry": bytes(self.saveGeometry()),
+            "width": self.width(),
+        })
+
+    def reload_jobs(self):
+        try:
+            result = self.store.reload()
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Error Reloading Jobs", str(e))
+            return
+        if result is None:
+            return  # Our own write, or nothing that matters changed
+        self.apply_store_changes(*result)
+
+    def undo(self):
+        result = self.store.undo()
+        if result is None:
+            self.statusBar().showMessage("Nothing to undo", 3000)
+            return
+        self.apply_store_changes(*result)
 
-    def open_edit_job_dialog(self, row):
-        jobs = load_jobs()
-        job = jobs[row]
-        job_dir = create_job_directory(job["Position"], job["Company"], job["ID"])
-        dialog = EditJobDialog(self, job, job_dir, row)
+    def redo(self):
+        result = self.store.redo()
+        if result is None:
+            self.statusBar().showMessage("Nothing to redo", 3000)
+            return
+        self.apply_store_changes(*result)
+
+    def apply_store_changes(self, added, removed, changed):
+        # Shows records the store added, removed or changed by itself
+        self.model.remove_jobs([job[KEY_FIELD] for job in removed])
+        for job in removed:
+            self.index_documents(self.search_index.remove_job, job[KEY_FIELD])
+        for job in added:
+            self.model.add_job(job)
+        for key, fields in changed.items():
+            self.model.update_job(key, fields)
+        self.job_files_changed(
+            [job[KEY_FIELD] for job in added] +
+            [key for key, fields in changed.items() if any(field in fields for field in DOCUMENT_FIELDS)]
+        )
+
+    def sync_jobs(self):
+        # Change sets are exchanged and applied on the sync thread, with the
+        # documents they bring; the table is updated here once they are in
+        if self.sync_running or not self.store.loaded:
+            return
+        self.sync_running = True
+        future = self.sync_worker.submit(self.exchange_changes)
+        future.add_done_callback(self.exchange_done)
+
+    def exchange_changes(self):
+        # Runs on the sync thread
+        self.store.flush()
+        self.sync.push()
+        change_sets = self.sync.fetch()
+        if not change_sets:
+            return 0, [], [], {}, []
+        count = sum(len(change_set["changes"]) for change_set in change_sets)
+        return (count, *self.sync.apply(self.store, change_sets, self.archive))
+
+    def exchange_done(self, future):
+        # Runs on the sync thread
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.sync_signals.failed.emit(str(error))
+        else:
+            self.sync_signals.applied.emit(future.result())
+
+    def sync_failed(self, message):
+        # The sync folder may be unmounted for a while; the next round tries again
+        self.sync_running = False
+        self.statusBar().showMessage(f"Sync failed: {message}", 10000)
+
+    def changes_applied(self, result):
+        self.sync_running = False
+        count, added, removed, changed, archived = result
+        if not count:
+            return
+        # Jobs restored on another device leave the archived rows
+        restored = [job for job in added if self.model.is_archived(job[KEY_FIELD])]
+        self.model.remove_jobs([job[KEY_FIELD] for job in restored])
+        self.apply_store_changes(added, removed, changed)
+        if archived and self.archive_shown:
+            self.model.add_jobs(archived, archived=True)
+        if archived or restored:
+            self.archive_written()
+        self.statusBar().showMessage(f"Synced {count} changes from other devices", 5000)
+
+    def toggle_previews(self, checked):
+        self.preview_pane.setVisible(checked)
+        # Rows on screen are rendered ahead only while previews are shown
+        self.prefetch_timer.start()
+        if checked:
+            width = self.splitter.width()
+            self.splitter.setSizes([max(width - PREVIEW_WIDTH, width // 2), PREVIEW_WIDTH])
+            self.show_preview(self.table.currentIndex())
+
+    def show_preview(self, index, previous=None):
+        # The document of the current cell, or else the first one the row has
+        if not self.preview_checkbox.isChecked():
+            return
+        if not index.isValid():
+            self.preview_pane.show_document(None, None)
+            return
+        job = self.model.job(self.model.row_of(self.proxy.key(index.row())))
+        if index.column() in FILE_COLUMNS:
+            field = JOB_COLUMNS[index.column()]
+        else:
+            documents = documents_of(job)
+            field = documents[0][2] if documents else JOB_COLUMNS[FILE_COLUMNS[0]]
+        self.preview_pane.show_document(field, job.get(field))
+
+    def prefetch_previews(self):
+        # Scrolling through thousands of jobs renders a screenful at a time.
+        # With previews off nothing is read ahead: on a cloud folder that
+        # would download documents no one asked to see.
+        if not self.preview_checkbox.isChecked():
+            self.previews.prefetch([])
+            return
+        count = self.proxy.rowCount()
+        first = self.table.rowAt(0)
+        if not count or first < 0:
+            return
+        last = self.table.rowAt(self.table.viewport().height() - 1)
+        if last < 0:
+            last = count - 1
+        paths = []
+        for row in range(first, last + 1):
+            job = self.model.job(self.model.row_of(self.proxy.key(row)))
+            paths.extend(path for path, _, _ in documents_of(job))
+        self.previews.prefetch(paths)
+
+    def hover_preview_ready(self, path, preview):
+        # A tooltip shown while the document under the pointer was rendering gets its picture
+        if not QToolTip.isVisible():
+            return
+        viewport = self.table.viewport()
+        index = self.table.indexAt(viewport.mapFromGlobal(QCursor.pos()))
+        if not index.isValid() or index.column() not in FILE_COLUMNS:
+            return
+        row = self.model.row_of(self.proxy.key(index.row()))
+        if self.model.job(row).get(JOB_COLUMNS[index.column()]) != path:
+            return
+        QToolTip.showText(QCursor.pos(), self.model.data(self.model.index(row, index.column()), Qt.ToolTipRole), viewport)
+
+    def open_diagnostics(self):
+        # Modeless, so it can stay open next to the table and be refreshed
+        if self.diagnostics_dialog is None:
+            self.diagnostics_dialog = DiagnosticsDialog(parent=self)
+        self.diagnostics_dialog.refresh()
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+
+    def open_timeline(self, key):
+        job = self.model.job(self.model.row_of(key))
+        dialog = TimelineDialog(self.store.timeline(key), f"{job['Position']} at {job['Company']}", self)
+        dialog.exec_()
+
+    def open_dashboard(self):
+        if self.dashboard_dialog is None:
+            self.dashboard_dialog = DashboardDialog(self.model, self.archive, parent=self)
+        self.dashboard_dialog.show()
+        self.dashboard_dialog.raise_()
+
+    def job_files_changed(self, keys):
+        # Reindexes and rechecks the documents of jobs whose files were added, moved or edited
+        if not keys:
+            return
+        for key in keys:
+            self.index_job(key)
+        self.scan_files(keys)
+
+    def scan_files(self, keys=None):
+        # Without keys every job is checked and results for jobs not listed are dropped
+        full = keys is None
+        jobs = self.store.jobs if full else [self.store.get(key) for key in keys if key in self.store]
+        future = self.scan_worker.submit(self.scanner.scan, [dict(job) for job in jobs], full)
+        future.add_done_callback(lambda future: self.scan_done(future, full))
+
+    def scan_done(self, future, full):
+        # Runs on the scanning thread
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self.integrity_signals.scanned.emit(future.result(), full)
+        else:
+            self.integrity_signals.failed.emit(str(error))
+
+    def files_scanned(self, results, full):
+        # Jobs deleted while the scan ran are left out
+        results = {key: fields for key, fields in results.items() if key in self.store}
+        self.model.set_file_problems(results, replace=full)
+        states = [state for fields in self.model.file_problems.values() for state, _ in fields.values()]
+        moved = states.count(MOVED)
+        missing = states.count(MISSING)
+        self.repair_button.setText(f"Repair File Paths ({moved})")
+        self.repair_button.setToolTip("Point jobs at files that were renamed or moved within job_positions")
+        self.repair_button.setVisible(moved > 0)
+        if missing:
+            self.statusBar().showMessage(f"{missing} referenced files are missing", 10000)
+
+    def scan_failed(self, message):
+        self.statusBar().showMessage(f"Checking files failed: {message}", 10000)
+
+    def repair_files(self, keys=None):
+        problems = self.model.file_problems
+        if keys is not None:
+            problems = {key: problems[key] for key in keys if key in problems}
+        changed = repair(self.store, problems)
+        for key, fields in changed.items():
+            self.model.update_job(key, fields)
+        self.job_files_changed(list(changed))
+
+    def index_documents(self, function, *args):
+        future = self.search_worker.submit(function, *args)
+        future.add_done_callback(self.indexing_done)
+
+    def index_job(self, key):
+        # A copy, so the indexing thread never reads a record while it is edited
+        self.index_documents(self.search_index.update_job, dict(self.store.get(key)))
+
+    def indexing_done(self, future):
+        # Runs on the indexing thread
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self.search_signals.updated.emit()
+        else:
+            self.search_signals.failed.emit(str(error))
+
+    def search_index_updated(self):
+        if self.document_search_checkbox.isChecked():
+            self.search_documents()
+
+    def search_index_failed(self, message):
+        self.statusBar().showMessage(f"Document search index not updated: {message}", 10000)
+
+    def apply_search(self):
+        if self.document_search_checkbox.isChecked():
+            self.search_edit.setPlaceholderText("Search resumes, cover letters and snapshots")
+            self.proxy.set_search("")
+            self.search_documents()
+        else:
+            self.search_edit.setPlaceholderText("Search position, company or ID")
+            self.proxy.set_ranking(None)
+            self.proxy.set_search(self.search_edit.text())
+
+    def search_documents(self):
+        text = self.search_edit.text()
+        if not tokenize(text):
+            self.proxy.set_ranking(None)
+            return
+        try:
+            results = self.search_index.search(text)
+        except sqlite3.Error as e:
+            self.statusBar().showMessage(f"Document search failed: {e}", 10000)
+            return
+        self.proxy.set_ranking([key for key, _, _ in results])
+        self.statusBar().showMessage(f"{len(results)} jobs with matching documents", 5000)
+
+    def apply_status_filter(self):
+        statuses = [action.text() for action in self.status_filter_actions if action.isChecked()]
+        if self.hide_rejected_checkbox.isChecked() and "Rejection" in statuses:
+            statuses.remove("Rejection")
+        self.proxy.set_statuses(statuses)
+        if "Rejection" in statuses and not self.archive_requested:
+            self.load_archive()
+
+    def load_archive(self):
+        # Read once, the first time rejected applications are shown
+        self.archive_requested = True
+        self.run_archive_task(self.archive_signals.loaded, self.archive.load)
+
+    def run_archive_task(self, signal, function, *args):
+        future = self.archive_worker.submit(function, *args)
+        future.add_done_callback(lambda future: self.archive_task_done(future, signal))
+
+    def archive_task_done(self, future, signal):
+        # Runs on the archive thread
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.archive_signals.failed.emit(str(error))
+        elif signal is not None:
+            signal.emit(future.result())
+
+    def archive_failed(self, message):
+        QMessageBox.warning(self, "Archive Error", message)
+
+    def archive_loaded(self, jobs):
+        # A job that was archived and is active again (the store was not saved in between) shows once
+        self.archive_shown = True
+        jobs = [job for job in jobs if job[KEY_FIELD] not in self.store and self.model.row_of(job[KEY_FIELD]) is None]
+        self.model.add_jobs(jobs, archived=True)
+        if jobs:
+            self.statusBar().showMessage(f"{len(jobs)} archived jobs shown", 5000)
+
+    def archive_rejected(self):
+        self.archive_jobs([job[KEY_FIELD] for job in self.store if job.get("Status") == "Rejection"])
+
+    def archive_jobs(self, keys):
+        # Jobs still waiting for their files are left out
+        keys = [key for key in keys if key in self.store and key not in self.file_ops]
+        if not keys:
+            return
+        pack_files_checkbox = QCheckBox("Compress their files")
+        msg_box = QMessageBox(self)
+        msg_box.setIcon(QMessageBox.Question)
+        msg_box.setText(f"Archive {len(keys)} jobs?")
+        msg_box.setInformativeText(
+            "Archived jobs are shown with rejected applications and can be restored at any time."
+        )
+        msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        msg_box.setCheckBox(pack_files_checkbox)
+        if msg_box.exec_() != QMessageBox.Yes:
+            return
+
+        jobs, directories = plan_archive(self.store, keys, pack_files_checkbox.isChecked())
+
+        def archive():
+            self.archive.add(jobs, directories)
+            return jobs, directories
+        self.run_archive_task(self.archive_signals.archived, archive)
+
+    def jobs_archived(self, result):
+        # The archive holds the jobs now; they leave the store and the table
+        jobs, directories = result
+        keys = [job[KEY_FIELD] for job in jobs if job[KEY_FIELD] in self.store]
+        self.remove_jobs([self.store.get(key) for key in keys], "archive")
+        self.store.reserve_keys(job[KEY_FIELD] for job in jobs)
+        if self.archive_shown:
+            self.model.add_jobs(jobs, archived=True)
+        else:
+            self.apply_status_filter()  # Reads the archive if rejected applications are shown
+        self.statusBar().showMessage(f"Archived {len(jobs)} jobs", 5000)
+        self.archive_written()
+        if directories:
+            # Packed directories go once no saved job refers to them any more
+            self.run_archive_task(None, self.remove_archived_directories, directories)
+
+    def archive_written(self):
+        if self.dashboard_dialog is not None:
+            self.dashboard_dialog.archive_changed()
+
+    def remove_archived_directories(self, directories):
+        # Runs on the archive thread
+        self.store.flush()
+        self.archive.remove_directories(directories)
+
+    def restore_jobs(self, keys):
+        self.run_archive_task(self.archive_signals.restored, self.archive.restore, keys)
+
+    def jobs_restored(self, jobs):
+        keys = [job[KEY_FIELD] for job in jobs]
+        self.model.remove_jobs([job[KEY_FIELD] for job in jobs if self.model.is_archived(job[KEY_FIELD])])
+        jobs = [job for job in jobs if job[KEY_FIELD] not in self.store]
+        self.store.add_many(jobs, "restore")
+        self.model.add_jobs(jobs)
+        self.job_files_changed([job[KEY_FIELD] for job in jobs])
+        self.statusBar().showMessage(f"Restored {len(jobs)} jobs", 5000)
+        # Dropped from the archive once the store saved them
+        self.run_archive_task(None, self.discard_restored, keys)
+
+    def discard_restored(self, keys):
+        # Runs on the archive thread
+        self.store.flush()
+        self.archive.discard(keys)
+        self.archive_signals.discarded.emit()
+
+    def export_jobs(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Jobs", "jobs.csv", "CSV Files (*.csv)")
+        if path:
+            try:
+                export_csv(self.store.jobs, path)
+            except OSError as e:
+                QMessageBox.critical(self, "Error Exporting Jobs", str(e))
+
+    def run_file_task(self, key, operations, on_success, pending_job=None, batch=None, on_failure=None):
+        if batch is not None:
+            batch.keys.add(key)
+            self.file_batches[key] = batch
+        if pending_job is not None:
+            self.pending_jobs[key] = pending_job
+            self.model.add_job(pending_job)
+        self.file_callbacks[key] = (on_success, on_failure)
+        self.file_ops.submit(key, operations, self.file_signals.progress.emit, self.file_signals.finished.emit)
+        self.model.set_progress(key, 0)
+
+    def file_task_progress(self, key, percent):
+        # Progress from a sibling worker can arrive after the task already finished
+        if key in self.file_callbacks:
+            self.model.set_progress(key, percent)
+
+    def file_task_finished(self, task):
+        on_success, on_failure = self.file_callbacks.pop(task.key)
+        pending_job = self.pending_jobs.pop(task.key, None)
+        self.model.set_progress(task.key, None)
+        if task.succeeded:
+            on_success()
+            if task.key in self.store:
+                self.job_files_changed([task.key])
+        else:
+            if pending_job is not None:
+                self.store.release_key(task.key)
+                self.model.remove_job(task.key)
+            if on_failure is not None:
+                on_failure()  # After the rollback
+            if task.error is not None and task.key not in self.file_batches:
+                QMessageBox.critical(self, "Error Transferring Files", str(task.error))
+
+        batch = self.file_batches.pop(task.key, None)
+        if batch is not None:
+            if task.error is not None:
+                batch.errors.append(f"{task.key}: {task.error}")
+            batch.keys.discard(task.key)
+            if not batch.keys:
+                self.finish_batch(batch)
+
+    def start_batch(self, title):
+        self.store.begin_batch()
+        return FileBatch(title)
+
+    def finish_batch(self, batch):
+        self.store.end_batch()
+        if batch.errors:
+            QMessageBox.warning(self, batch.title, "\n".join(batch.errors))
+
+    def open_add_job_dialog(self):
+        dialog = AddJobDialog(self.blobs, self)
         if dialog.exec_() == QDialog.Accepted:
-            self.populate_jobs()
+            job = dialog.new_job
+            key = self.store.reserve_key(job)
+            self.run_file_task(key, dialog.operations, lambda: self.store.add(job), pending_job=job,
+                               on_failure=lambda: discard_job_directory(job))
+
+    def open_import_dialog(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Jobs", "", "Job Lists (*.csv *.json);;CSV Files (*.csv);;JSON Files (*.json)"
+        )
+        if not path:
+            return
+        try:
+            records = read_import(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error Importing Jobs", str(e))
+            return
+        answer = QMessageBox.question(
+            self, "Import Jobs", f"Import {len(records)} jobs from {os.path.basename(path)}?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if answer != QMessageBox.Yes:
+            return
 
-    def delete_job(self, row):
-        jobs = load_jobs()
-        job = jobs[row]
-        job_dir = create_job_directory(job["Position"], job["Company"], job["ID"])
+        # Directories are created in parallel, files are transferred on the
+        # worker pool, and all records are saved with one write at the end
+        planned, errors = plan_import(records, self.blobs)
+        batch = self.start_batch("Import Jobs")
+        batch.errors = [f"Row {number}: {error}" for number, error in errors]
+        for _, job, operations in planned:
+            key = self.store.reserve_key(job)
+            self.run_file_task(key, operations, lambda job=job: self.store.add(job, "import"), pending_job=job, batch=batch,
+                               on_failure=lambda job=job: discard_job_directory(job))
+        if not batch.keys:
+            self.finish_batch(batch)
+
+    def open_ingest_dialog(self):
+        if self.ingest_running or not self.store.loaded:
+            QMessageBox.information(self, "Add from Postings", "Please wait until the jobs in progress are added.")
+            return
+        text, accepted = QInputDialog.getMultiLineText(
+            self, "Add from Postings", "Addresses of job postings, one per line:"
+        )
+        urls = [line.strip() for line in text.splitlines() if line.strip()] if accepted else []
+        if not urls:
+            return
+        # Postings that are jobs already, archived ones included, are skipped;
+        # the archive is read on the ingest thread
+        self.ingest_running = True
+        self.ingest_cancel = cancel = threading.Event()
+        jobs = self.store.jobs
+        future = self.ingest_worker.submit(lambda: fetch_postings(urls, jobs + self.archive.load(), cancel=cancel))
+        future.add_done_callback(self.ingest_done)
+        self.statusBar().showMessage(f"Downloading {len(urls)} postings...")
+
+    def ingest_done(self, future):
+        # Runs on the ingest thread; a fetch cancelled as the window closed reports nothing
+        if future.cancelled() or isinstance(future.exception(), TransferCancelled):
+            return
+        error = future.exception()
+        if error is not None:
+            self.ingest_signals.failed.emit(str(error))
+        else:
+            self.ingest_signals.fetched.emit(future.result())
+
+    def ingest_failed(self, message):
+        self.ingest_running = False
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Error Adding Postings", message)
+
+    def postings_fetched(self, result):
+        # Every saved posting is committed with a single write
+        self.ingest_running = False
+        jobs, skipped, errors = result
+        self.store.add_many(jobs, "import")
+        self.apply_store_changes(jobs, [], {})
+        self.statusBar().showMessage(f"Added {len(jobs)} jobs from postings", 5000)
+        if skipped or errors:
+            lines = [f"{url}: {reason}" for url, reason in skipped] + [f"{url}: {error}" for url, error in errors]
+            msg_box = QMessageBox(self)
+            msg_box.setIcon(QMessageBox.Warning if errors else QMessageBox.Information)
+            msg_box.setWindowTitle("Add from Postings")
+            msg_box.setText(
+                f"Added {len(jobs)} jobs. {len(skipped)} postings were already jobs, "
+                f"{len(errors)} could not be added."
+            )
+            msg_box.setDetailedText("\n".join(lines))
+            msg_box.exec_()
+
+    def open_edit_job_dialog(self, key):
+        job = self.store.get(key)
+        dialog = EditJobDialog(self, self.store, job)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        if not dialog.operations:
+            self.model.update_job(key, self.store.update(job, dialog.changes))
+            self.job_files_changed([key])
+            return
 
+        # The record keeps its old place until every file is in the new
+        # directory; the intent lets the next start finish an interrupted
+        # move. Everything else in the dialog is saved now.
+        moved, changes = split_relocation(dialog.changes)
+        source = self.store.job_dir(key)
+        if changes:
+            self.model.update_job(key, self.store.update(job, changes))
+        intent = self.relocations.begin(key, source, dialog.destination, moved)
+
+        def commit():
+            self.model.update_job(key, finish_relocation(self.store, self.relocations, intent))
+        self.run_file_task(key, dialog.operations, commit, on_failure=lambda: self.relocations.finish(intent))
+
+    def confirm_delete(self, text):
+        # Returns (confirmed, keep files)
         keep_files_checkbox = QCheckBox("Keep files")
         keep_files_checkbox.setChecked(True)
         msg_box = QMessageBox()
         msg_box.setIcon(QMessageBox.Warning)
-        msg_box.setText("Are you sure you want to delete this job?")
-        msg_box.setInformativeText("This action cannot be undone.")
+        msg_box.setText(text)
+        undo_keys = QKeySequence(QKeySequence.Undo).toString(QKeySequence.NativeText)
+        msg_box.setInformativeText(f"{undo_keys} brings the job back, but deleted files cannot be restored.")
         msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
         msg_box.setDefaultButton(QMessageBox.No)
         msg_box.setCheckBox(keep_files_checkbox)
         ret = msg_box.exec_()
+        return ret == QMessageBox.Yes, keep_files_checkbox.isChecked()
 
-        if ret == QMessageBox.Yes:
-            if not keep_files_checkbox.isChecked():
-                shutil.rmtree(job_dir)
-            jobs.pop(row)
-            save_jobs(jobs)
-            self.populate_jobs()
-
-    def duplicate_job(self, row):
-        jobs = load_jobs()
-        job = jobs[row]
-
-        new_job = job.copy()
-        new_job["ID"] = f"{job['ID']}_copy"
-        new_job["Last Updated"] = datetime.date.today().strftime("%Y-%m-%d")
-        new_job["Submitted"] = ""  # Reset Submitted date
-
-        new_job_dir = create_job_directory(new_job["Position"], new_job["Company"], new_job["ID"])
-
-        if os.path.isfile(job["Resume/CV"]):
-            new_resume_path = os.path.join(new_job_dir, os.path.basename(job["Resume/CV"]))
-            shutil.copy2(job["Resume/CV"], new_resume_path)
-            new_job["Resume/CV"] = new_resume_path
-
-        if os.path.isfile(job["Cover Letter"]):
-            new_cover_letter_path = os.path.join(new_job_dir, os.path.basename(job["Cover Letter"]))
-            shutil.copy2(job["Cover Letter"], new_cover_letter_path)
-            new_job["Cover Letter"] = new_cover_letter_path
-
-        if os.path.isfile(job["Snapshot"]):
-            new_snapshot_path = os.path.join(new_job_dir, os.path.basename(job["Snapshot"]))
-            shutil.copy2(job["Snapshot"], new_snapshot_path)
-            new_job["Snapshot"] = new_snapshot_path
-
-        jobs.append(new_job)
-        save_jobs(jobs)
-        self.populate_jobs()
+    def delete_job(self, key, keep_files=None, batch=None):
+        job = self.store.get(key)
+
+        if keep_files is None:
+            confirmed, keep_files = self.confirm_delete("Are you sure you want to delete this job?")
+            if not confirmed:
+                return
+
+        operations = plan_delete(self.store, key, keep_files)
+        if operations:
+            # The job stays listed until its directory is gone
+            self.run_file_task(key, operations, lambda: self.remove_job(job), batch=batch)
+            return
+        self.remove_job(job)
 
-    def open_job_directory(self, row):
-        jobs = load_jobs()
-        job = jobs[row]
-        job_dir = create_job_directory(job["Position"], job["Company"], job["ID"])
+    def delete_jobs(self, keys):
+        confirmed, keep_files = self.confirm_delete(f"Are you sure you want to delete these {len(keys)} jobs?")
+        if not confirmed:
+            return
+        batch = self.start_batch("Delete Jobs")
+        # Jobs whose files stay leave the table together; the others once their directory is gone
+        removed = []
+        for key in keys:
+            job = self.store.get(key)
+            operations = plan_delete(self.store, key, keep_files)
+            if operations:
+                self.run_file_task(key, operations, lambda job=job: self.remove_job(job), batch=batch)
+            else:
+                removed.append(job)
+        self.remove_jobs(removed)
+        if not batch.keys:
+            self.finish_batch(batch)
+
+    def remove_job(self, job, action="delete"):
+        self.remove_jobs([job], action)
+
+    def remove_jobs(self, jobs, action="delete"):
+        with self.store.batch():
+            for job in jobs:
+                self.store.remove(job, action)
+        self.model.remove_jobs([job[KEY_FIELD] for job in jobs])
+        for job in jobs:
+            self.index_documents(self.search_index.remove_job, job[KEY_FIELD])
+
+    def duplicate_job(self, key, batch=None):
+        try:
+            new_job, operations = plan_duplicate(self.store.get(key), self.blobs)
+        except OSError as e:
+            if batch is None:
+                QMessageBox.critical(self, "Error Duplicating Job", str(e))
+            else:
+                batch.errors.append(f"{key}: {e}")
+            return
+        new_key = self.store.reserve_key(new_job)
+        self.run_file_task(new_key, operations, lambda: self.store.add(new_job, "duplicate"), pending_job=new_job, batch=batch,
+                           on_failure=lambda: discard_job_directory(new_job))
+
+    def duplicate_jobs(self, keys):
+        batch = self.start_batch("Duplicate Jobs")
+        for key in keys:
+            self.duplicate_job(key, batch)
+        if not batch.keys:
+            self.finish_batch(batch)
+
+    def open_job_directory(self, key):
+        job_dir = self.store.job_dir(key)
         if os.path.exists(job_dir):
-            os.startfile(job_dir)
+            # Anything in the folder may get edited, so nothing in it stays
+            # hardlinked to a blob, as earlier versions placed documents
+            self.open_detached(job_dir)
         else:
             QMessageBox.warning(self, "Warning", f"Directory not found: {job_dir}")
 
-    def edit_status(self, row, column):
-        if column == 4:  # Status column
-            combo = QComboBox()
-            combo.addItems(APPLICATION_STATUSES)
-            combo.setCurrentText(self.table.item(row, column).text())
-            self.table.setCellWidget(row, column, combo)
-            combo.currentIndexChanged.connect(lambda: self.update_status(row, combo))
-
-    def update_status(self, row, combo):
-        new_status = combo.currentText()
-        status_item = QTableWidgetItem(new_status)
-        status_item.setBackground(STATUS_COLORS.get(new_status, QColor(255, 255, 255)))
-        self.table.setItem(row, 4, status_item)
-        self.table.removeCellWidget(row, 4)
-
-        jobs = load_jobs()
-        job = jobs[row]
-        job["Status"] = new_status
-
-        if new_status == "Applied":
-            job["Submitted"] = datetime.date.today().strftime("%Y-%m-%d")
-            self.table.setItem(row, 7, QTableWidgetItem(job["Submitted"]))  # Update Submitted column
-        
-        # Update Last Updated field
-        job["Last Updated"] = datetime.date.today().strftime("%Y-%m-%d")
-        self.table.setItem(row, 8, QTableWidgetItem(job["Last Updated"]))  # Update Last Updated column
+    def update_status(self, key, new_status):
+        if key not in self.store:
+            return  # Still waiting for its files
 
-        save_jobs(jobs)
+        changed = self.store.update(self.store.get(key), status_changes(new_status), "status")
+        self.model.update_job(key, changed)  # Repaints only the changed cells
 
-    def cell_clicked(self, row, column):
-        if column == 1:  # Company column
-            item = self.table.item(row, column)
-            link = item.data(Qt.UserRole)
+    def update_statuses(self, keys, new_status):
+        # The same change as a single status edit, saved once for the selection
+        with self.store.batch():
+            for key in keys:
+                self.update_status(key, new_status)
+
+    def cell_clicked(self, index):
+        if index.column() == COMPANY_COLUMN:
+            link = index.data(Qt.UserRole)
             if link:
                 webbrowser.open(link)
 
@@ -592,12 +1403,30 @@ class JobManagerGUI(QMainWindow):
         if path.startswith("http://") or path.startswith("https://"):
             webbrowser.open(path)
         elif os.path.exists(path):
-            os.startfile(path)
+            self.open_detached(path)
         else:
             QMessageBox.warning(self, "Warning", f"File not found: {path}")
 
-def main():
-    app = QApplication(sys.argv)
+    def open_detached(self, path):
+        # Hardlinked documents are copied on the file queue, and path opens once they are
+        operations = plan_detach(path)
+        if not operations:
+            os.startfile(path)
+        elif path not in self.file_ops:  # Otherwise it opens when the running copy is done
+            self.run_file_task(path, operations, lambda: os.startfile(path))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NextStep Job Manager")
+    parser.add_argument(
+        "--profile", action="store_true",
+        help=f"record timings and file I/O for the Diagnostics window (same as {instrumentation.PROFILE_ENV}=1)"
+    )
+    # Anything else is left for Qt, such as -platform or -style
+    args, qt_args = parser.parse_known_args(argv)
+    if args.profile:
+        instrumentation.enable()
+
+    app = QApplication(sys.argv[:1] + qt_args)
     window = JobManagerGUI()
     window.show()
     sys.exit(app.exec_())
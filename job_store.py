@@ -0,0 +1,569 @@
+import datetime
+import threading
+from contextlib import contextmanager
+
+import instrumentation
+
+from storage import CSV_FIELDS, KEY_FIELD, CsvBackend, JobRecord, job_key, job_directory
+
+FLUSH_DELAY = 1.0  # Seconds of quiet before pending edits are written out
+COMPACT_DELAY = 60.0  # Seconds of quiet before journaled edits are written to the backend
+COMPACT_ENTRIES = 10000  # Journal lines that trigger a compaction at the next flush
+UNDO_DEPTH = 100  # Edits, or batches of edits, that can be undone
+FIRST_PAGE_SIZE = 100  # Roughly one screenful, handed out before the rest is parsed
+LOAD_CHUNK_SIZE = 2000
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+def _values(job, fields=None):
+    # What a journal entry stores of a record; empty fields are left out
+    if fields is None:
+        return {field: value for field, value in job.items() if field != KEY_FIELD and value}
+    return {field: job.get(field) for field in fields}
+
+
+def _inverse(entry):
+    if entry["op"] == "add":
+        return {"op": "remove", "key": entry["key"]}
+    if entry["op"] == "remove":
+        return {"op": "add", "key": entry["key"], "fields": entry["before"]}
+    return {"op": "update", "key": entry["key"], "fields": entry["before"]}
+
+
+class JobStore:
+    def __init__(self, backend=None, flush_delay=FLUSH_DELAY, lazy=False, journal=None,
+                 compact_delay=COMPACT_DELAY, compact_entries=COMPACT_ENTRIES):
+        self.backend = backend or CsvBackend()
+        self.flush_delay = flush_delay
+        # With a journal a flush appends the edits to it, and the backend is
+        # rewritten only by compact(): after compact_delay seconds of quiet,
+        # once compact_entries lines piled up, and on close()
+        self.journal = journal
+        self.compact_delay = compact_delay
+        self.compact_entries = compact_entries
+        self.flush_error = None
+        self.load_error = None
+
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._timer = None
+        self._compact_timer = None
+        self._batch_depth = 0
+        self._jobs = {}       # key -> record, in file order
+        self._dirs = {}       # key -> job directory
+        self._reserved = set()  # keys handed out to jobs that are not added (back) yet
+        self._retired = set()   # keys of jobs deleted since the start, which undo may bring back
+        self._added = {}      # id(record) -> record not yet written
+        self._changed = {}    # id(record) -> (record, fields changed since the last flush)
+        self._removed = []    # records deleted since the last flush
+        self._entries = []    # journal entries not appended yet
+        self._undo = []       # groups of entries, the latest last
+        self._redo = []
+        self._group = None    # entries of the batch in progress
+        self._replaying = {}  # key -> journal entries to apply while loading
+        self._loaded = threading.Event()
+
+        # A lazy store is filled by iterating load_chunks(), usually on a worker thread
+        if not lazy:
+            for _ in self.load_chunks():
+                pass
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def __iter__(self):
+        return iter(self._jobs.values())
+
+    def __contains__(self, key):
+        return key in self._jobs
+
+    @property
+    def jobs(self):
+        return list(self._jobs.values())
+
+    def get(self, key):
+        return self._jobs[key]
+
+    def job_dir(self, key):
+        return self._dirs[key]
+
+    @property
+    def loaded(self):
+        return self._loaded.is_set() and self.load_error is None
+
+    @property
+    def is_dirty(self):
+        return bool(self._entries or self._added or self._changed or self._removed)
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def load_chunks(self, first=FIRST_PAGE_SIZE, size=LOAD_CHUNK_SIZE):
+        # Yields (records, fraction read) while the backend is still parsing.
+        # Nothing is written before the load completed: a half-read file must
+        # never replace the full one.
+        chunk = []
+        limit = first
+        try:
+            if self.journal is not None:
+                # Edits flushed after the last compaction, applied as their jobs stream in
+                for entry in self.journal.entries():
+                    self._replaying.setdefault(entry["key"], []).append(entry)
+            for job, fraction in self.backend.stream():
+                chunk.append(job)
+                if len(chunk) >= limit:
+                    yield self._load(chunk), fraction
+                    chunk, limit = [], size
+            chunk = self._load(chunk)
+            # Jobs added since the last compaction
+            with self._lock:
+                added = [self._replay(None, entries) for entries in self._replaying.values()]
+                self._replaying = {}
+            yield chunk + self._load([job for job in added if job is not None]), 1.0
+        except BaseException as e:
+            self.load_error = e
+            raise
+        finally:
+            self._loaded.set()
+        if self.is_dirty:
+            self.schedule_flush()
+
+    def _load(self, jobs):
+        loaded = []
+        with self._lock:
+            for job in jobs:
+                if id(job) not in self._added and self._assign_key(job):
+                    # Rows from before keys were stored get theirs written back
+                    self._changed[id(job)] = (job, {KEY_FIELD})
+                if job[KEY_FIELD] in self._replaying:
+                    job = self._replay(job, self._replaying.pop(job[KEY_FIELD]))
+                    if job is None:
+                        continue
+                self._index(job)
+                loaded.append(job)
+        return loaded
+
+    def _replay(self, job, entries):
+        # Applies a job's journal entries to its stored record, or to None when
+        # it is not stored. Entries set values rather than change them, so one
+        # that reached the backend before a crash is harmless to apply again.
+        stored = job
+        for entry in entries:
+            if entry["op"] == "remove":
+                job = None
+            elif entry["op"] == "add":
+                fields = entry["fields"]
+                if job is None:
+                    job = JobRecord.from_dict(fields)
+                for field in CSV_FIELDS:
+                    job[field] = fields.get(field, "")
+                job[KEY_FIELD] = entry["key"]
+            elif job is not None:
+                for field, value in entry["fields"].items():
+                    job[field] = value
+        if job is not stored:
+            if stored is not None:
+                self._removed.append(stored)
+            if job is not None:
+                self._reserved.discard(job[KEY_FIELD])
+                self._added[id(job)] = job
+        elif job is not None:
+            self._changed[id(job)] = (job, set(CSV_FIELDS))
+        return job
+
+    def _assign_key(self, job):
+        key = job.get(KEY_FIELD)
+        if key and key in self._reserved:
+            self._reserved.discard(key)
+            return False
+        if key and key not in self._jobs:
+            self._retired.discard(key)
+            return False
+        job[KEY_FIELD] = job_key(job.get("ID", ""), self._jobs, self._reserved, self._retired)
+        return True
+
+    def reserve_key(self, job):
+        # Lets a job be tracked by key while its files are still being transferred
+        with self._lock:
+            job[KEY_FIELD] = job_key(job.get("ID", ""), self._jobs, self._reserved, self._retired)
+            self._reserved.add(job[KEY_FIELD])
+        return job[KEY_FIELD]
+
+    def is_taken(self, key):
+        # A key in use, or handed out to a job waiting for its files or to an archived one
+        with self._lock:
+            return key in self._jobs or key in self._reserved
+
+    def release_key(self, key):
+        with self._lock:
+            self._reserved.discard(key)
+
+    def reserve_keys(self, keys):
+        # Keys of jobs kept elsewhere, such as the archive, which add() accepts back
+        with self._lock:
+            self._reserved.update(key for key in keys if key not in self._jobs)
+
+    def _index(self, job):
+        key = job[KEY_FIELD]
+        self._jobs[key] = job
+        self._dirs[key] = job_directory(job["Position"], job["Company"], job["ID"])
+
+    def add(self, job, action="add"):
+        with self._lock:
+            self._insert(job, action)
+            self._end_edit()
+        self.schedule_flush()
+        return job
+
+    def add_many(self, jobs, action="add"):
+        with self._lock:
+            for job in jobs:
+                self._insert(job, action)
+            self._end_edit()
+        self.schedule_flush()
+        return jobs
+
+    def _insert(self, job, action):
+        self._assign_key(job)
+        self._index(job)
+        self._added[id(job)] = job
+        self._record(action, "add", job[KEY_FIELD], fields=_values(job))
+
+    def update(self, job, changes=None, action="edit"):
+        with self._lock:
+            if changes is None:
+                # The record was edited in place; assume every field changed.
+                # What it held before is unknown, so this cannot be undone.
+                changed = set(CSV_FIELDS)
+                self._record(action, "update", job[KEY_FIELD], fields=_values(job, changed))
+            else:
+                changed = self._set(job, changes, action)
+            self._end_edit()
+        if changed:
+            self.schedule_flush()
+        return changed
+
+    def _set(self, job, changes, action):
+        before = {}
+        for field, value in changes.items():
+            if field != KEY_FIELD and job.get(field) != value:
+                before[field] = job.get(field)
+                job[field] = value
+        if not before:
+            return set()
+        changed = set(before)
+        if changed & {"Position", "Company", "ID"}:
+            self._index(job)
+        if id(job) not in self._added:
+            self._changed.setdefault(id(job), (job, set()))[1].update(changed)
+        self._record(action, "update", job[KEY_FIELD], fields={field: job.get(field) for field in before},
+                     before=before)
+        return changed
+
+    def remove(self, job, action="delete"):
+        with self._lock:
+            if self._jobs.get(job[KEY_FIELD]) is not job:
+                raise ValueError("Job is not in the store")
+            self._delete(job, action)
+            self._end_edit()
+        self.schedule_flush()
+
+    def _delete(self, job, action):
+        key = job[KEY_FIELD]
+        del self._jobs[key]
+        del self._dirs[key]
+        self._retired.add(key)
+        self._changed.pop(id(job), None)
+        if self._added.pop(id(job), None) is None:
+            self._removed.append(job)
+        self._record(action, "remove", key, before=_values(job))
+
+    def _record(self, action, op, key, fields=None, before=None):
+        # Called with the lock held. Archiving and restoring move jobs between
+        # the store and the archive, moves take the job directory along, and
+        # synced edits come from another device, so they are journaled but
+        # not undone.
+        entry = {"time": _now(), "action": action, "op": op, "key": key}
+        if fields is not None:
+            entry["fields"] = fields
+        if before is not None:
+            entry["before"] = before
+        self._entries.append(entry)
+        if action in ("undo", "redo"):
+            return
+        self._redo = []
+        if action in ("archive", "restore", "move", "sync") or before is None and op == "update":
+            # Undo would have to skip over this edit and revert older ones out of order
+            self._undo = []
+            self._group = []
+            return
+        if self._group is None:
+            self._group = []
+        self._group.append(entry)
+
+    def _end_edit(self):
+        # Ends an undo step, unless a batch is still collecting one
+        if self._batch_depth:
+            return
+        if self._group:
+            self._undo.append(self._group)
+            del self._undo[:-UNDO_DEPTH]
+        self._group = None
+
+    def undo(self):
+        # Reverts the latest edit, or batch of edits, and returns what changed
+        # as (added, removed, changed) like reload(). Files are not touched:
+        # a job whose directory was deleted comes back with missing files.
+        with self._lock:
+            if not self._undo:
+                return None
+            group = self._undo.pop()
+            result = self._apply([_inverse(entry) for entry in reversed(group)], "undo")
+            self._redo.append(group)
+        self.schedule_flush()
+        return result
+
+    def redo(self):
+        with self._lock:
+            if not self._redo:
+                return None
+            group = self._redo.pop()
+            result = self._apply(group, "redo")
+            self._undo.append(group)
+        self.schedule_flush()
+        return result
+
+    def _apply(self, entries, action):
+        added = {}
+        removed = []
+        changed = {}
+        for entry in entries:
+            key = entry["key"]
+            job = self._jobs.get(key)
+            if entry["op"] == "remove":
+                if job is None:
+                    continue
+                self._delete(job, action)
+                if added.pop(key, None) is None:
+                    removed.append(job)
+                changed.pop(key, None)
+            elif entry["op"] == "add":
+                # A key handed out in the meantime, to a job waiting for its
+                # files or to an archived one, is not taken back
+                if job is not None or key in self._reserved:
+                    continue
+                job = JobRecord.from_dict(entry["fields"])
+                job[KEY_FIELD] = key
+                self._index(job)
+                self._added[id(job)] = job
+                self._record(action, "add", key, fields=_values(job))
+                added[key] = job
+            elif job is not None:
+                fields = self._set(job, entry["fields"], action)
+                if fields and key not in added:
+                    changed.setdefault(key, set()).update(fields)
+        return list(added.values()), removed, changed
+
+    def timeline(self, key):
+        # The changes recorded for a job, oldest first, the ones not flushed yet included
+        with self._write_lock, self._lock:
+            recorded = self.journal.timeline(key) if self.journal is not None else []
+            return recorded + [entry for entry in self._entries if entry["key"] == key]
+
+    def begin_batch(self):
+        # Holds flushes back until the matching end_batch(), so a batch of
+        # edits is written once however long its file transfers take. Its
+        # edits are undone together.
+        with self._lock:
+            self._batch_depth += 1
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def end_batch(self):
+        with self._lock:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._end_edit()
+            pending = self._batch_depth == 0 and self.is_dirty
+        if pending:
+            self.schedule_flush()
+
+    @contextmanager
+    def batch(self):
+        self.begin_batch()
+        try:
+            yield self
+        finally:
+            self.end_batch()
+
+    def schedule_flush(self):
+        # Restart the countdown on every edit so a burst turns into a single write
+        with self._lock:
+            if self._batch_depth:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            if self._compact_timer is not None:
+                self._compact_timer.cancel()
+                self._compact_timer = None
+            self._timer = threading.Timer(self.flush_delay, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _schedule_compaction(self):
+        with self._lock:
+            if self._compact_timer is not None:
+                self._compact_timer.cancel()
+                self._compact_timer = None
+            if self._batch_depth or not (self._added or self._changed or self._removed):
+                return
+            self._compact_timer = threading.Timer(self.compact_delay, self._flush_in_background, (True,))
+            self._compact_timer.daemon = True
+            self._compact_timer.start()
+
+    def _flush_in_background(self, compact=False):
+        try:
+            self.flush(compact)
+        except Exception as e:
+            self.flush_error = e
+
+    def flush(self, compact=False):
+        # With a journal the edits are appended to it, and the backend is only
+        # written when compacting; without one it always is
+        self._loaded.wait()
+        if self.load_error is not None:
+            raise RuntimeError("The jobs were not loaded completely, so nothing was saved") from self.load_error
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                entries, self._entries = self._entries, []
+
+            if self.journal is not None:
+                try:
+                    self.journal.append(entries)
+                except BaseException:
+                    with self._lock:
+                        self._entries[:0] = entries
+                    raise
+                if not compact and len(self.journal) < self.compact_entries:
+                    self.flush_error = None
+                    self._schedule_compaction()
+                    return bool(entries)
+
+            with self._lock:
+                if self._compact_timer is not None:
+                    self._compact_timer.cancel()
+                    self._compact_timer = None
+                if not (self._added or self._changed or self._removed):
+                    if self.journal is not None:
+                        self.journal.compact()
+                    return bool(entries)
+                pending = self._added, self._changed, self._removed
+                self._added, self._changed, self._removed = {}, {}, []
+                payload = self.backend.prepare(
+                    self._jobs.values(), list(pending[0].values()), list(pending[1].values()), pending[2]
+                )
+
+            try:
+                with instrumentation.span("flush", "store", added=len(pending[0]),
+                                          changed=len(pending[1]), removed=len(pending[2])):
+                    self.backend.commit(payload)
+            except BaseException:
+                # Keep the records pending so the next flush retries them
+                with self._lock:
+                    self._restore(*pending)
+                raise
+            if self.journal is not None:
+                # Everything journaled so far is in the backend now
+                self.journal.compact()
+            self.flush_error = None
+            return True
+
+    def _restore(self, added, changed, removed):
+        present = {id(job) for job in self._jobs.values()}
+        for job_id, job in added.items():
+            if job_id in present:
+                self._added[job_id] = job
+                self._changed.pop(job_id, None)
+        for job_id, (job, fields) in changed.items():
+            if job_id not in self._added and job_id in present:
+                self._changed.setdefault(job_id, (job, set()))[1].update(fields)
+        self._removed = removed + self._removed
+
+    def reload(self):
+        # Applies edits another program or device made to the stored file and
+        # returns (added, removed, changed). Local edits that are not flushed yet
+        # win over the file; the next flush writes them back.
+        if not self.loaded:
+            return None
+        with self._write_lock:
+            if not self.backend.has_external_changes():
+                return None
+            loaded = self.backend.load()
+            with self._lock:
+                return self._merge(loaded)
+
+    def _merge(self, loaded):
+        removed_keys = {job[KEY_FIELD] for job in self._removed}
+        incoming = {}
+        for job in loaded:
+            key = job.get(KEY_FIELD)
+            if not key or key in incoming or key in self._reserved:
+                # A row typed in by hand has no key yet, and one from elsewhere
+                # cannot take the key of a job waiting for its files
+                key = job_key(job.get("ID", ""), self._jobs, self._reserved, self._retired, incoming)
+                job[KEY_FIELD] = key
+                self._added[id(job)] = job
+            incoming[key] = job
+
+        added = []
+        changed = {}
+        for key, job in incoming.items():
+            if key in removed_keys:
+                continue
+            local = self._jobs.get(key)
+            if local is None:
+                self._index(job)
+                added.append(job)
+                continue
+            if id(local) in self._changed or id(local) in self._added:
+                continue
+            fields = {field for field in CSV_FIELDS if (local.get(field) or "") != (job.get(field) or "")}
+            if fields:
+                for field in fields:
+                    local[field] = job.get(field) or ""
+                if fields & {"Position", "Company", "ID"}:
+                    self._index(local)
+                changed[key] = fields
+
+        removed = []
+        for key, job in list(self._jobs.items()):
+            if key not in incoming and id(job) not in self._added:
+                if id(job) in self._changed:
+                    # Deleted outside while edited here: the edit wins, as it does
+                    # for a changed field, and the whole row is written back
+                    del self._changed[id(job)]
+                    self._added[id(job)] = job
+                    continue
+                del self._jobs[key]
+                del self._dirs[key]
+                self._changed.pop(id(job), None)
+                removed.append(job)
+        if self.is_dirty:
+            self.schedule_flush()
+        return added, removed, changed
+
+    def close(self):
+        self.flush(compact=True)
+        self.backend.close()
@@ -0,0 +1,569 @@
+import html
+import os
+from bisect import bisect_left
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QAbstractProxyModel, QModelIndex, QEvent, QUrl, pyqtSignal
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import (
+    QApplication, QStyledItemDelegate, QStyleOptionButton, QStyleOptionViewItem,
+    QStyleOptionProgressBar, QStyle, QComboBox
+)
+
+from analytics import STATS_FIELDS, PipelineStats
+from integrity import MISSING
+from job_index import JobIndex, tokenize
+from storage import KEY_FIELD
+
+JOB_COLUMNS = [
+    "Position", "Company", "ID", "Snapshot",
+    "Status", "Resume/CV", "Cover Letter", "Submitted", "Last Updated"
+]
+COMPANY_COLUMN = 1
+STATUS_COLUMN = 4
+FILE_COLUMNS = (3, 5, 6)
+BATCH_INSERT_SIZE = 64  # Inserted source rows above which the proxy maps them as one block
+PROGRESS_ROLE = Qt.UserRole + 1  # Percentage of a running file transfer, shown in the Status cell
+TOOLTIP_PREVIEW_WIDTH = 180
+
+STATUS_COLORS = {
+    "Not started": QColor(255, 255, 255),  # White
+    "Applied": QColor(173, 216, 230),      # Light Blue
+    "Interview": QColor(255, 255, 0),      # Yellow
+    "Rejection": QColor(255, 0, 0),        # Red
+    "Offer": QColor(0, 255, 0)             # Green
+}
+DEFAULT_STATUS_COLOR = QColor(255, 255, 255)
+MISSING_FILE_COLOR = QColor(255, 200, 200)  # Light Red
+MOVED_FILE_COLOR = QColor(255, 225, 160)    # Light Orange
+ARCHIVED_COLOR = QColor(Qt.gray)
+
+
+class JobsTableModel(QAbstractTableModel):
+    # Emitted when the status delegate commits a new value; the window persists
+    # it and reports the changed fields back through update_job(). The model
+    # shares its records with the JobStore, so rows are never copied.
+    # stats_changed tells the dashboard that its counts moved.
+    status_edited = pyqtSignal(str, str)
+    stats_changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._jobs = []
+        self._rows = {}  # job key -> row
+        self._stale_from = None  # first row whose _rows entry a removal left out of date
+        self.job_index = JobIndex()
+        self.stats = PipelineStats()  # Of the active jobs; archived rows are counted by the archive
+        self._progress = {}  # job key -> percent of a running file transfer
+        self._file_problems = {}  # job key -> {field: (state, candidate)} from the integrity scan
+        self._archived = set()  # keys of rows shown from the archive; they are not in the store
+        self.preview_lookup = None  # document path -> its rendered preview file, or None
+        self.preview_request = None  # asks for a document's preview to be rendered
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._jobs)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(JOB_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return JOB_COLUMNS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        job = self._jobs[index.row()]
+        column = index.column()
+        value = job.get(JOB_COLUMNS[column], "")
+
+        problem = None
+        if column in FILE_COLUMNS:
+            problem = self._file_problems.get(job[KEY_FIELD], {}).get(JOB_COLUMNS[column])
+
+        if role == Qt.DisplayRole:
+            return "Open" if column in FILE_COLUMNS else value
+        if role == Qt.EditRole:
+            return value
+        if role == Qt.UserRole:
+            # Target opened when the cell is clicked: a file path or the home link
+            if column == COMPANY_COLUMN:
+                return job.get("Candidate Home Link", "")
+            if problem is not None:
+                return problem[1]  # Where a moved file is now; nothing for a missing one
+            return value if column in FILE_COLUMNS else None
+        if role == PROGRESS_ROLE and column == STATUS_COLUMN:
+            return self._progress.get(job[KEY_FIELD])
+        if role == Qt.BackgroundRole and column == STATUS_COLUMN:
+            return STATUS_COLORS.get(value, DEFAULT_STATUS_COLOR)
+        if role == Qt.ForegroundRole and job[KEY_FIELD] in self._archived:
+            return ARCHIVED_COLOR
+        if role == Qt.ForegroundRole and column == COMPANY_COLUMN:
+            if job.get("Candidate Home Link", ""):
+                return QColor(Qt.blue)
+        if role == Qt.BackgroundRole and problem is not None:
+            return MISSING_FILE_COLOR if problem[0] == MISSING else MOVED_FILE_COLOR
+        if role == Qt.ToolTipRole and job[KEY_FIELD] in self._archived:
+            return "Archived; restore the job to edit it"
+        if role == Qt.ToolTipRole and column in FILE_COLUMNS:
+            if problem is not None:
+                return f"Missing: {value}" if problem[0] == MISSING else f"Moved to {problem[1]}"
+            preview = self.preview_lookup(value) if value and self.preview_lookup is not None else None
+            if preview is not None:
+                url = QUrl.fromLocalFile(os.path.abspath(preview)).toString()
+                return f'<img src="{url}" width="{TOOLTIP_PREVIEW_WIDTH}"><br>{html.escape(value)}'
+            if value and self.preview_request is not None:
+                # Hovered over: worth rendering, and shown as soon as it is ready
+                self.preview_request(value)
+            return value or None
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        if index.column() == STATUS_COLUMN and self.key(index.row()) not in self._archived:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or index.column() != STATUS_COLUMN:
+            return False
+        job = self._jobs[index.row()]
+        if value == job.get("Status"):
+            return False
+        self.status_edited.emit(job[KEY_FIELD], value)
+        return True
+
+    def job(self, row):
+        return self._jobs[row]
+
+    def key(self, row):
+        return self._jobs[row][KEY_FIELD]
+
+    def row_of(self, key):
+        if self._stale_from is not None:
+            self._renumber()
+        return self._rows.get(key)
+
+    def _renumber(self):
+        for row in range(self._stale_from, len(self._jobs)):
+            self._rows[self._jobs[row][KEY_FIELD]] = row
+        self._stale_from = None
+
+    def set_jobs(self, jobs):
+        self.beginResetModel()
+        self._jobs = list(jobs)
+        self._rows = {job[KEY_FIELD]: row for row, job in enumerate(self._jobs)}
+        self._stale_from = None
+        self.job_index = JobIndex(self._jobs)
+        self.stats = PipelineStats(self._jobs)
+        self._archived = set()
+        self.endResetModel()
+        self.stats_changed.emit()
+
+    def add_job(self, job):
+        row = len(self._jobs)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._jobs.append(job)
+        self._rows[job[KEY_FIELD]] = row
+        self.job_index.add(job)
+        self.stats.add(job)
+        self.endInsertRows()
+        self.stats_changed.emit()
+
+    def is_archived(self, key):
+        return key in self._archived
+
+    def add_jobs(self, jobs, archived=False):
+        if not jobs:
+            return
+        if archived:
+            self._archived.update(job[KEY_FIELD] for job in jobs)
+        first = len(self._jobs)
+        self.beginInsertRows(QModelIndex(), first, first + len(jobs) - 1)
+        self._jobs.extend(jobs)
+        for row in range(first, len(self._jobs)):
+            self._rows[self._jobs[row][KEY_FIELD]] = row
+        self.job_index.add_many(jobs)
+        if not archived:
+            self.stats.add_many(jobs)
+        self.endInsertRows()
+        if not archived:
+            self.stats_changed.emit()
+
+    def remove_job(self, key):
+        self.remove_jobs([key])
+
+    def remove_jobs(self, keys):
+        # Rows go in runs of neighbours, the last run first, and the rows after
+        # them are renumbered once at the end instead of after every run; a
+        # slot that asks for a row in between gets the numbers brought up to date
+        rows = sorted(row for row in map(self.row_of, set(keys)) if row is not None)
+        if not rows:
+            return
+        runs = []
+        for row in rows:
+            if runs and runs[-1][1] == row - 1:
+                runs[-1][1] = row
+            else:
+                runs.append([row, row])
+        active = False
+        for first, last in reversed(runs):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for job in self._jobs[first:last + 1]:
+                key = job[KEY_FIELD]
+                del self._rows[key]
+                self.job_index.remove(key)
+                self._progress.pop(key, None)
+                self._file_problems.pop(key, None)
+                if key in self._archived:
+                    self._archived.discard(key)
+                else:
+                    active = True
+                self.stats.remove(key)
+            del self._jobs[first:last + 1]
+            self._stale_from = first
+            self.endRemoveRows()
+        if self._stale_from is not None:
+            self._renumber()
+        if active:
+            self.stats_changed.emit()
+
+    def set_progress(self, key, percent):
+        if percent is None:
+            self._progress.pop(key, None)
+        else:
+            self._progress[key] = percent
+        row = self.row_of(key)
+        if row is not None:
+            index = self.index(row, STATUS_COLUMN)
+            self.dataChanged.emit(index, index, [PROGRESS_ROLE])
+
+    @property
+    def file_problems(self):
+        return self._file_problems
+
+    def set_file_problems(self, problems, replace=False):
+        # problems: key -> {field: (state, candidate)}; an empty dict clears a job.
+        # With replace, jobs not mentioned are cleared too.
+        if replace:
+            keys = set(self._file_problems) | set(problems)
+            self._file_problems = {}
+        else:
+            keys = set(problems)
+        for key, fields in problems.items():
+            if fields:
+                self._file_problems[key] = fields
+            else:
+                self._file_problems.pop(key, None)
+        for key in keys:
+            row = self.row_of(key)
+            if row is not None:
+                self.dataChanged.emit(self.index(row, FILE_COLUMNS[0]), self.index(row, FILE_COLUMNS[-1]))
+
+    def refresh_files(self):
+        # Files came or went on disk; only the visible Open cells get repainted
+        if not self._jobs:
+            return
+        for column in FILE_COLUMNS:
+            self.dataChanged.emit(self.index(0, column), self.index(len(self._jobs) - 1, column))
+
+    def update_job(self, key, fields):
+        row = self.row_of(key)
+        if row is None or not fields:
+            return
+        self.job_index.update(key, fields)
+        if not STATS_FIELDS.isdisjoint(fields):
+            self.stats.update(self._jobs[row])
+            self.stats_changed.emit()
+        # Only the cells whose value actually changed are repainted
+        for column, field in enumerate(JOB_COLUMNS):
+            if field in fields or (column == COMPANY_COLUMN and "Candidate Home Link" in fields):
+                index = self.index(row, column)
+                self.dataChanged.emit(index, index)
+
+
+class JobsFilterProxyModel(QAbstractProxyModel):
+    # Filters and sorts through the source model's JobIndex. A reset only reads
+    # the matching jobs, and a changed record is moved on its own with bisect.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._tokens = []
+        self._statuses = None
+        self._field = None
+        self._ranks = None   # key -> rank of its documents in a search, best first
+        self._descending = False
+        self._order = []     # sort keys of the visible jobs, ascending
+        self._visible = {}   # key -> its sort key in _order
+
+    @property
+    def job_index(self):
+        return self.sourceModel().job_index
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.dataChanged.connect(self._source_data_changed)
+        model.rowsInserted.connect(self._source_rows_inserted)
+        model.rowsAboutToBeRemoved.connect(self._source_rows_about_to_be_removed)
+        model.modelReset.connect(self._rebuild)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.beginResetModel()
+        order = self.job_index.query(self._tokens, self._statuses, self._field)
+        if self._ranks is not None:
+            order = [sort_key for sort_key in order if sort_key[2] in self._ranks]
+            if self._field is None:
+                order = sorted(self._sort_key(sort_key[2]) for sort_key in order)
+        self._order = order
+        self._visible = {sort_key[2]: sort_key for sort_key in self._order}
+        self.endResetModel()
+
+    def _sort_key(self, key):
+        # Unsorted columns show document matches best first
+        if self._ranks is not None and self._field is None:
+            return (self._ranks[key],) + self.job_index.sort_key(key)[1:]
+        return self.job_index.sort_key(key, self._field)
+
+    def _matches(self, key):
+        if self._ranks is not None and key not in self._ranks:
+            return False
+        return self.job_index.matches(key, self._tokens, self._statuses)
+
+    def _row(self, position):
+        return len(self._order) - 1 - position if self._descending else position
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+        return self.sourceModel().columnCount()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        # Columns are never reordered, and the base class cannot map them while empty
+        return self.sourceModel().headerData(section, orientation, role)
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not 0 <= row < len(self._order) or not 0 <= column < self.columnCount():
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        if index is None:
+            return super().parent()
+        return QModelIndex()
+
+    def key(self, row):
+        return self._order[self._row(row)][2]
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        source_row = self.sourceModel().row_of(self.key(proxy_index.row()))
+        return self.sourceModel().index(source_row, proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        sort_key = self._visible.get(self.sourceModel().key(source_index.row()))
+        if sort_key is None:
+            return QModelIndex()
+        return self.index(self._row(bisect_left(self._order, sort_key)), source_index.column())
+
+    def set_search(self, text):
+        tokens = tokenize(text)
+        if tokens != self._tokens:
+            self._tokens = tokens
+            self._rebuild()
+
+    def set_ranking(self, keys):
+        # Only these jobs are shown, in this order unless a column is sorted; None shows all
+        ranks = None if keys is None else {key: rank for rank, key in enumerate(keys)}
+        if ranks != self._ranks:
+            self._ranks = ranks
+            self._rebuild()
+
+    def set_statuses(self, statuses):
+        statuses = None if statuses is None else set(statuses)
+        if statuses != self._statuses:
+            self._statuses = statuses
+            self._rebuild()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # The index keeps each column's order once it was sorted, so this is not a full sort
+        self._field = JOB_COLUMNS[column] if column >= 0 else None
+        self._descending = order == Qt.DescendingOrder
+        self._rebuild()
+
+    def _hide(self, key):
+        sort_key = self._visible.pop(key, None)
+        if sort_key is None:
+            return
+        position = bisect_left(self._order, sort_key)
+        row = self._row(position)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._order[position]
+        self.endRemoveRows()
+
+    def _show(self, key, sort_key):
+        position = bisect_left(self._order, sort_key)
+        row = len(self._order) - position if self._descending else position
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._order.insert(position, sort_key)
+        self._visible[key] = sort_key
+        self.endInsertRows()
+
+    def _refresh(self, key):
+        new = None
+        if key in self.job_index and self._matches(key):
+            new = self._sort_key(key)
+        old = self._visible.get(key)
+        if new == old:
+            return old is not None
+        if old is not None:
+            self._hide(key)
+        if new is not None:
+            self._show(key, new)
+        return False
+
+    def _source_data_changed(self, top_left, bottom_right, roles=()):
+        source = self.sourceModel()
+        for source_row in range(top_left.row(), bottom_right.row() + 1):
+            key = source.key(source_row)
+            if self._refresh(key):
+                # Still in place: repaint just the cells that changed
+                row = self._row(bisect_left(self._order, self._visible[key]))
+                self.dataChanged.emit(
+                    self.index(row, top_left.column()), self.index(row, bottom_right.column()), roles
+                )
+
+    def _source_rows_inserted(self, parent, first, last):
+        source = self.sourceModel()
+        if last - first < BATCH_INSERT_SIZE:
+            for source_row in range(first, last + 1):
+                self._refresh(source.key(source_row))
+            return
+        # A chunk from the startup load: usually every match sorts after the
+        # visible rows, so it goes in as one block instead of row by row
+        keys = [source.key(source_row) for source_row in range(first, last + 1)]
+        added = sorted(self._sort_key(key) for key in keys if self._matches(key))
+        if not added:
+            return
+        if self._order and added[0] < self._order[-1]:
+            self._rebuild()
+            return
+        position = len(self._order)
+        if self._descending:
+            self.beginInsertRows(QModelIndex(), 0, len(added) - 1)
+        else:
+            self.beginInsertRows(QModelIndex(), position, position + len(added) - 1)
+        self._order.extend(added)
+        self._visible.update((sort_key[2], sort_key) for sort_key in added)
+        self.endInsertRows()
+
+    def _source_rows_about_to_be_removed(self, parent, first, last):
+        source = self.sourceModel()
+        for source_row in range(first, last + 1):
+            self._hide(source.key(source_row))
+
+
+class JobsItemDelegate(QStyledItemDelegate):
+    open_requested = pyqtSignal(str)
+
+    def __init__(self, statuses, parent=None):
+        super().__init__(parent)
+        self.statuses = statuses
+        self._pressed = None
+
+    def _style(self, option):
+        return option.widget.style() if option.widget else QApplication.style()
+
+    def paint(self, painter, option, index):
+        column = index.column()
+        if column in FILE_COLUMNS:
+            background = index.data(Qt.BackgroundRole)
+            if background is not None:
+                painter.fillRect(option.rect, background)
+            button = QStyleOptionButton()
+            button.rect = option.rect.adjusted(2, 2, -2, -2)
+            button.text = "Open"
+            button.palette = option.palette
+            if index.data(Qt.UserRole):
+                button.state = QStyle.State_Enabled | QStyle.State_Raised
+            else:
+                button.state = QStyle.State_None
+            self._style(option).drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+            return
+
+        if column == STATUS_COLUMN and index.data(PROGRESS_ROLE) is not None:
+            progress = QStyleOptionProgressBar()
+            progress.rect = option.rect.adjusted(2, 2, -2, -2)
+            progress.minimum = 0
+            progress.maximum = 100
+            progress.progress = index.data(PROGRESS_ROLE)
+            progress.text = f"{progress.progress}%"
+            progress.textVisible = True
+            progress.state = QStyle.State_Enabled
+            self._style(option).drawControl(QStyle.CE_ProgressBar, progress, painter, option.widget)
+            return
+
+        if column == STATUS_COLUMN:
+            opt = QStyleOptionViewItem(option)
+            self.initStyleOption(opt, index)
+            painter.fillRect(opt.rect, STATUS_COLORS.get(opt.text, DEFAULT_STATUS_COLOR))
+            self._style(option).drawControl(QStyle.CE_ItemViewItem, opt, painter, option.widget)
+            return
+
+        super().paint(painter, option, index)
+
+    def sizeHint(self, option, index):
+        size = super().sizeHint(option, index)
+        if index.column() in FILE_COLUMNS:
+            size.setWidth(option.fontMetrics.horizontalAdvance("Open") + 24)
+        elif index.column() == STATUS_COLUMN:
+            # Leave room for the combo box arrow while editing
+            size.setWidth(size.width() + 20)
+        return size
+
+    def editorEvent(self, event, model, option, index):
+        if index.column() not in FILE_COLUMNS:
+            return super().editorEvent(event, model, option, index)
+
+        path = index.data(Qt.UserRole)
+        if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            if path:
+                self._pressed = (index.row(), index.column())
+            return True
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            pressed, self._pressed = self._pressed, None
+            if pressed == (index.row(), index.column()) and option.rect.contains(event.pos()):
+                self.open_requested.emit(path)
+            return True
+        if event.type() == QEvent.MouseButtonDblClick:
+            return True
+        return False
+
+    def createEditor(self, parent, option, index):
+        if index.column() != STATUS_COLUMN:
+            return None
+        combo = QComboBox(parent)
+        combo.addItems(self.statuses)
+        # Commit as soon as the user picks a value, like the old cell widget did
+        combo.activated.connect(lambda _: self._commit(combo))
+        return combo
+
+    def _commit(self, combo):
+        self.commitData.emit(combo)
+        self.closeEditor.emit(combo)
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data(Qt.EditRole))
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), Qt.EditRole)
+
+    def updateEditorGeometry(self, editor, option, index):
+        editor.setGeometry(option.rect)
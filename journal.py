@@ -0,0 +1,128 @@
+import json
+import os
+
+import instrumentation
+from storage import KEY_FIELD
+
+JOURNAL_FILE = 'jobs.journal'
+HISTORY_FILE = 'jobs.history'
+
+
+class Journal:
+    # Every change to a job as one JSON line, appended where a save used to
+    # rewrite the whole file. The journal holds the changes the store has not
+    # compacted into jobs.csv (or jobs.db) yet and is replayed on the next
+    # start, so a crash loses nothing that was flushed. The same lines go to
+    # the history, which is never compacted and answers timeline().
+    #
+    # A line is {"time", "action", "op", "key", "fields", "before"}: op is
+    # "add", "update" or "remove", action what the user did ("status",
+    # "duplicate", "undo", ...), fields the values set and before the values
+    # they replaced.
+    def __init__(self, path=JOURNAL_FILE, history_path=HISTORY_FILE):
+        self.path = path
+        self.history_path = history_path
+        self._count = None  # Lines in the journal, counted on first use
+        # A line torn by a crash would swallow the first entry appended after it
+        for file_path in (path, history_path):
+            _cut_torn_line(file_path)
+
+    def __len__(self):
+        if self._count is None:
+            self._count = len(self.entries())
+        return self._count
+
+    def entries(self):
+        # A line torn by a crash while it was appended is the last one and is skipped
+        entries = []
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        instrumentation.event("journal_line_skipped", "journal", path=self.path)
+        except FileNotFoundError:
+            pass
+        self._count = len(entries)
+        return entries
+
+    def append(self, entries):
+        if not entries:
+            return 0
+        text = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        data = text.encode('utf-8')
+        with instrumentation.span("append_journal", "journal", path=self.path, entries=len(entries)) as span:
+            with open(self.path, 'ab') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            # The history only serves timelines; the journal is what must survive a crash
+            with open(self.history_path, 'ab') as file:
+                file.write(data)
+            span.wrote(2 * len(data))
+        self._count = len(self) + len(entries)
+        return len(data)
+
+    def compact(self):
+        # Called once the store wrote everything in the journal to its backend
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._count = 0
+
+    def timeline(self, key):
+        # The entries for one job, oldest first. Lines that cannot mention the
+        # key are skipped without being parsed.
+        needle = json.dumps(key, ensure_ascii=False)
+        entries = []
+        try:
+            with open(self.history_path, encoding='utf-8') as file:
+                for line in file:
+                    if needle not in line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("key") == key:
+                        entries.append(entry)
+        except FileNotFoundError:
+            pass
+        return entries
+
+
+def _cut_torn_line(path):
+    # Truncates the file back to its last newline
+    try:
+        with open(path, 'r+b') as file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                step = min(position, 65536)
+                file.seek(position - step)
+                block = file.read(step)
+                newline = block.rfind(b"\n")
+                if newline >= 0:
+                    position = position - step + newline + 1
+                    break
+                position -= step
+            if position != end:
+                file.truncate(position)
+                instrumentation.event("journal_line_cut", "journal", path=path, size=end - position)
+    except FileNotFoundError:
+        pass
+
+
+def describe_entry(entry):
+    # One line for a timeline, such as "Status: Applied → Interview"
+    op = entry["op"]
+    if op == "add":
+        fields = entry.get("fields") or {}
+        return f"{fields.get('Position', '')} at {fields.get('Company', '')}, {fields.get('Status', '')}"
+    if op == "remove":
+        return "Removed from the list"
+    before = entry.get("before") or {}
+    return ", ".join(
+        f"{field}: {before[field] or '(empty)'} → {value or '(empty)'}" if field in before else f"{field}: {value}"
+        for field, value in entry.get("fields", {}).items() if field != KEY_FIELD
+    )
@@ -0,0 +1,245 @@
+import argparse
+import json
+import sys
+
+from archive import JobArchive
+from job_core import (
+    APPLICATION_STATUSES, add_job, archive_jobs, import_jobs, plan_new_job, read_import, restore_jobs,
+    resume_relocations, set_status_many, sync_jobs
+)
+from job_store import JobStore
+from journal import Journal, describe_entry
+from relocations import RelocationLog
+from storage import CSV_COLUMNS, KEY_FIELD, export_csv, job_row, open_backend
+
+LIST_COLUMNS = [KEY_FIELD, "Status", "Position", "Company", "ID", "Last Updated"]
+
+
+def list_jobs(store, args):
+    jobs = store.jobs
+    if args.archived:
+        # Only parsed when asked for; a job that is active already is listed once
+        jobs += [job for job in args.archive.load() if job[KEY_FIELD] not in store]
+    if args.status or args.search:
+        from job_index import JobIndex, tokenize
+        index = JobIndex(jobs)
+        matches = index.query(tokenize(args.search or ""), args.status or None)
+        jobs = [index.jobs[sort_key[2]] for sort_key in matches]
+
+    if args.format == "json":
+        json.dump([dict(job) for job in jobs], sys.stdout, indent=2)
+        print()
+    elif args.format == "csv":
+        import csv
+        writer = csv.writer(sys.stdout)
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(job_row(job) for job in jobs)
+    else:
+        rows = [[job.get(field, "") or "" for field in LIST_COLUMNS] for job in jobs]
+        widths = [max([len(field)] + [len(row[column]) for row in rows]) for column, field in enumerate(LIST_COLUMNS)]
+        for row in [LIST_COLUMNS] + rows:
+            print("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+
+
+def add(store, args):
+    from blob_store import BlobStore
+    job, operations = plan_new_job(
+        args.position, args.company, args.id, args.status, args.link or "",
+        args.snapshot or "", args.resume or "", args.cover_letter or "", BlobStore()
+    )
+    add_job(store, job, operations)
+    print(job[KEY_FIELD])
+
+
+def import_file(store, args):
+    from blob_store import BlobStore
+    added, errors = import_jobs(store, read_import(args.path), BlobStore())
+    for number, error in errors:
+        print(f"row {number}: {error}", file=sys.stderr)
+    print(f"Imported {len(added)} jobs")
+    if errors:
+        raise ValueError(f"{len(errors)} rows were not imported")
+
+
+def ingest_urls(store, args):
+    from ingest import INGEST_CONNECTIONS, ingest_postings
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file, encoding='utf-8') as file:
+            urls += [line.strip() for line in file if line.strip() and not line.lstrip().startswith("#")]
+    if not urls:
+        raise ValueError("No postings to add; pass their addresses or --file")
+    added, skipped, errors = ingest_postings(
+        store, urls, args.archive.load(), status=args.status, connections=args.connections or INGEST_CONNECTIONS
+    )
+    for url, reason in skipped:
+        print(f"{url}: skipped, {reason}", file=sys.stderr)
+    for url, error in errors:
+        print(f"{url}: {error}", file=sys.stderr)
+    print(f"Added {len(added)} jobs")
+    if errors:
+        raise ValueError(f"{len(errors)} postings were not added")
+
+
+def change_status(store, args):
+    missing = [key for key in args.keys if key not in store]
+    if missing:
+        raise ValueError(f"No job with key {', '.join(missing)}")
+    set_status_many(store, args.keys, args.status)
+
+
+def archive(store, args):
+    keys = args.keys or [job[KEY_FIELD] for job in store if job.get("Status") == "Rejection"]
+    missing = [key for key in keys if key not in store]
+    if missing:
+        raise ValueError(f"No active job with key {', '.join(missing)}")
+    jobs, directories = archive_jobs(store, args.archive, keys, args.files)
+    store.flush()
+    args.archive.remove_directories(directories)
+    print(f"Archived {len(jobs)} jobs")
+
+
+def restore(store, args):
+    missing = [key for key in args.keys if key not in args.archive.keys()]
+    if missing:
+        raise ValueError(f"No archived job with key {', '.join(missing)}")
+    jobs = restore_jobs(store, args.archive, args.keys)
+    store.flush()
+    args.archive.discard(args.keys)
+    print(f"Restored {len(jobs)} jobs")
+
+
+def search(store, args):
+    from text_index import TextIndex
+    index = TextIndex()
+    try:
+        # Brings the index up to date first; unchanged files are only stat'ed
+        index.sync(store.jobs, args.workers)
+        results = index.search(" ".join(args.words), args.limit)
+    finally:
+        index.close()
+    for key, score, fields in results:
+        print(f"{score:7.2f}  {key}  ({', '.join(fields)})")
+
+
+def history(store, args):
+    entries = store.timeline(args.key)
+    if not entries:
+        raise ValueError(f"No recorded changes for key {args.key}")
+    for entry in entries:
+        print(f"{entry['time'].replace('T', ' ')}  {entry['action']:<9}  {describe_entry(entry)}")
+
+
+def sync(store, args):
+    from sync import SYNC_ENV, open_sync
+    folder = open_sync(args.folder)
+    if folder is None:
+        raise ValueError(f"No sync folder; pass --folder or set {SYNC_ENV}")
+    added, removed, changed, archived = sync_jobs(store, folder, args.archive)
+    print(f"Device {folder.device}: {len(added)} jobs added, {len(changed)} changed, "
+          f"{len(removed) - len(archived)} deleted, {len(archived)} archived")
+
+
+def export(store, args):
+    export_csv(store.jobs, args.path)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="nextstep", description="Manage the job applications in this folder.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    list_parser = subparsers.add_parser("list", help="print the jobs")
+    list_parser.add_argument("--status", action="append", choices=APPLICATION_STATUSES,
+                             help="only jobs with this status; may be repeated")
+    list_parser.add_argument("--search", help="only jobs whose position, company or ID match these words")
+    list_parser.add_argument("--format", choices=["table", "csv", "json"], default="table")
+    list_parser.add_argument("--archived", action="store_true", help="include archived jobs")
+    list_parser.set_defaults(handler=list_jobs)
+
+    add_parser = subparsers.add_parser("add", help="add a job and copy its documents into place")
+    add_parser.add_argument("position")
+    add_parser.add_argument("company")
+    add_parser.add_argument("id")
+    add_parser.add_argument("--status", choices=APPLICATION_STATUSES, default=APPLICATION_STATUSES[0])
+    add_parser.add_argument("--link", help="candidate home link")
+    add_parser.add_argument("--resume", help="resume/CV file to copy")
+    add_parser.add_argument("--cover-letter", help="cover letter file to copy")
+    add_parser.add_argument("--snapshot", help="snapshot file to move")
+    add_parser.set_defaults(handler=add)
+
+    import_parser = subparsers.add_parser("import", help="add every job from a CSV or JSON file, saved once")
+    import_parser.add_argument("path", help="CSV with the jobs.csv headers, or a JSON list of objects")
+    import_parser.set_defaults(handler=import_file)
+
+    ingest_parser = subparsers.add_parser("ingest", help="add jobs from the addresses of their postings, saved once")
+    ingest_parser.add_argument("urls", nargs="*", metavar="url")
+    ingest_parser.add_argument("--file", help="a text file with one address per line")
+    ingest_parser.add_argument("--status", choices=APPLICATION_STATUSES, default=APPLICATION_STATUSES[0])
+    ingest_parser.add_argument("--connections", type=int,
+                               help="postings downloaded at once (default: 8)")
+    ingest_parser.set_defaults(handler=ingest_urls)
+
+    status_parser = subparsers.add_parser("set-status", help="change the status of one or more jobs")
+    status_parser.add_argument("keys", nargs="+", metavar="key", help="the jobs' keys, as shown by list")
+    status_parser.add_argument("status", choices=APPLICATION_STATUSES)
+    status_parser.set_defaults(handler=change_status)
+
+    archive_parser = subparsers.add_parser("archive", help="move jobs out of the active list into the archive")
+    archive_parser.add_argument("keys", nargs="*", metavar="key", help="the jobs' keys; every rejected job by default")
+    archive_parser.add_argument("--files", action="store_true",
+                                help="also compress the jobs' directories into job_positions/.archive")
+    archive_parser.set_defaults(handler=archive)
+
+    restore_parser = subparsers.add_parser("restore", help="move archived jobs back, with their files")
+    restore_parser.add_argument("keys", nargs="+", metavar="key", help="the jobs' keys, as shown by list --archived")
+    restore_parser.set_defaults(handler=restore)
+
+    search_parser = subparsers.add_parser("search", help="rank jobs by the text of their documents")
+    search_parser.add_argument("words", nargs="+")
+    search_parser.add_argument("--limit", type=int, default=20)
+    search_parser.add_argument("--workers", type=int, help="processes extracting text; 0 extracts in this one")
+    search_parser.set_defaults(handler=search)
+
+    history_parser = subparsers.add_parser("history", help="print every recorded change to a job")
+    history_parser.add_argument("key", help="the job's key, as shown by list")
+    history_parser.set_defaults(handler=history)
+
+    sync_parser = subparsers.add_parser("sync", help="exchange edits with other devices through a shared folder")
+    sync_parser.add_argument("--folder", help="the shared folder (default: $NEXTSTEP_SYNC)")
+    sync_parser.set_defaults(handler=sync)
+
+    export_parser = subparsers.add_parser("export", help="write all jobs to a CSV file")
+    export_parser.add_argument("path")
+    export_parser.set_defaults(handler=export)
+
+    subparsers.add_parser("gui", help="open the window (the default), Qt options are passed on", add_help=False)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] == "gui" or argv[0].startswith("-") and argv[0] not in ("-h", "--help"):
+        # Qt is only imported for the window
+        import job_manager_gui
+        return job_manager_gui.main(argv[1:] if argv and argv[0] == "gui" else argv)
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    store = JobStore(open_backend(), journal=Journal())
+    args.archive = JobArchive()
+    try:
+        # New jobs never take the key of an archived one
+        store.reserve_keys(args.archive.keys())
+        # Directory moves the window did not finish, after a crash
+        for error in resume_relocations(store, RelocationLog())[1]:
+            print(f"nextstep: could not finish moving the files of {error}", file=sys.stderr)
+        args.handler(store, args)
+    except (KeyError, ValueError, OSError) as e:
+        parser.exit(1, f"nextstep: error: {e}\n")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
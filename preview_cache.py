@@ -0,0 +1,138 @@
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+import instrumentation
+from blob_store import file_hash
+
+PREVIEW_FOLDER = 'previews'
+PREVIEW_CACHE_SIZE = 64 * 1024 * 1024  # Bytes of rendered previews kept on disk
+PREVIEW_NAME = re.compile(r'^[0-9a-f]{64}\.png$')  # sha256 of the document
+TMP_PREFIX = '.preview-'
+TMP_SUFFIX = '.tmp'
+
+
+class PreviewCache:
+    # Rendered previews on disk, one PNG per document content (sha256), so
+    # linked and duplicated documents are rendered once. Once the folder
+    # outgrows max_bytes the least recently used previews are deleted; a
+    # preview that is used is touched, so the order survives restarts.
+    def __init__(self, folder=PREVIEW_FOLDER, max_bytes=PREVIEW_CACHE_SIZE):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # file name -> size, least recently used first
+        self._size = 0
+        self._digests = {}  # document path -> (mtime_ns, size, sha256)
+        self._scan()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        return self._size
+
+    def _scan(self):
+        try:
+            names = os.listdir(self.folder)
+        except FileNotFoundError:
+            return
+        entries = []
+        for name in names:
+            path = os.path.join(self.folder, name)
+            if name.startswith(TMP_PREFIX) and name.endswith(TMP_SUFFIX):
+                # Left behind by a write that was interrupted
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            if not PREVIEW_NAME.match(name) or not os.path.isfile(path):
+                # Not ours; the folder may be shared with the user's own files
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime_ns, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._entries[name] = size
+            self._size += size
+
+    def _path(self, name):
+        return os.path.join(self.folder, name)
+
+    def digest(self, path):
+        # Read again only when the document's size or modification time changed
+        stat = os.stat(path)
+        with self._lock:
+            known = self._digests.get(path)
+        if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            return known[2]
+        digest = file_hash(path)
+        with self._lock:
+            self._digests[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def cached(self, path):
+        # The preview file of a document rendered before, or None. Cheap
+        # enough for the GUI thread: the document is not read.
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            known = self._digests.get(path)
+            if known is None or known[:2] != (stat.st_mtime_ns, stat.st_size):
+                return None
+            name = f"{known[2]}.png"
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        return self._path(name)
+
+    def get(self, digest):
+        name = f"{digest}.png"
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        path = self._path(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Deleted behind our back
+            with self._lock:
+                self._size -= self._entries.pop(name, 0)
+            return None
+        return path
+
+    def put(self, digest, data):
+        name = f"{digest}.png"
+        os.makedirs(self.folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=TMP_PREFIX, suffix=TMP_SUFFIX, dir=self.folder)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, self._path(name))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self._size += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            evicted = []
+            # The newest preview stays even when it alone is over the limit
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                evicted_name, size = self._entries.popitem(last=False)
+                self._size -= size
+                evicted.append(evicted_name)
+        for evicted_name in evicted:
+            try:
+                os.remove(self._path(evicted_name))
+            except FileNotFoundError:
+                pass
+        if evicted:
+            instrumentation.event("previews_evicted", "previews", count=len(evicted))
+        return self._path(name)
@@ -0,0 +1,197 @@
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import Qt, QObject, QRectF, QBuffer, QIODevice, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter, QColor, QFont, QPixmap
+from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QSizePolicy
+
+import instrumentation
+from text_index import extract_text
+
+PREVIEW_WIDTH = 360
+PREVIEW_HEIGHT = 466  # The proportions of an A4 page
+PREVIEW_WORKERS = 2
+PREVIEW_TEXT_LENGTH = 2000  # Characters drawn on a document that is previewed by its text
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+PAGE_MARGIN = 16
+
+
+def _render_pdf(path):
+    # The first page as it looks, with PyMuPDF when it is installed; None otherwise
+    try:
+        import fitz
+    except ImportError:
+        return None
+    with fitz.open(path) as document:
+        if not document.page_count:
+            return None
+        page = document[0]
+        zoom = PREVIEW_WIDTH / page.rect.width
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        return QImage.fromData(pixmap.tobytes("png"), "PNG")
+
+
+def _text_page(text):
+    # A page with the beginning of the document's text, for what cannot be drawn as it looks
+    image = QImage(PREVIEW_WIDTH, PREVIEW_HEIGHT, QImage.Format_RGB32)
+    image.fill(Qt.white)
+    painter = QPainter(image)
+    font = QFont()
+    font.setPixelSize(11)
+    painter.setFont(font)
+    text = " ".join(line.strip() for line in text[:PREVIEW_TEXT_LENGTH].splitlines() if line.strip())
+    if not text:
+        painter.setPen(QColor(Qt.gray))
+        text = "No text to preview"
+    margins = QRectF(PAGE_MARGIN, PAGE_MARGIN, PREVIEW_WIDTH - 2 * PAGE_MARGIN, PREVIEW_HEIGHT - 2 * PAGE_MARGIN)
+    painter.drawText(margins, Qt.TextWordWrap, text)
+    painter.end()
+    return image
+
+
+def render_preview(path):
+    # Runs on a worker thread: QImage and QPainter do not need the GUI thread
+    extension = os.path.splitext(path)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        image = QImage(path)
+        if image.isNull():
+            raise ValueError(f"{os.path.basename(path)} is not an image that can be read")
+        return image.scaled(PREVIEW_WIDTH, PREVIEW_HEIGHT, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    if extension == ".pdf":
+        image = _render_pdf(path)
+        if image is not None and not image.isNull():
+            return image
+    return _text_page(extract_text(path))
+
+
+def _png(image):
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+class PreviewLoader(QObject):
+    # Renders previews on a small worker pool into a PreviewCache. Requested
+    # documents are always rendered; prefetched ones only while they are on
+    # screen, so the rows scrolled past are dropped from the queue.
+    ready = pyqtSignal(str, str)   # document path, preview file
+    failed = pyqtSignal(str, str)  # document path, error
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self._worker = ThreadPoolExecutor(max_workers=PREVIEW_WORKERS, thread_name_prefix="previews")
+        self._lock = threading.Lock()
+        self._queued = set()
+        self._requested = set()
+        self._visible = set()
+
+    def request(self, path):
+        with self._lock:
+            self._requested.add(path)
+        self._submit(path)
+
+    def prefetch(self, paths):
+        paths = [path for path in paths if self.cache.cached(path) is None]
+        with self._lock:
+            self._visible = set(paths)
+        for path in paths:
+            self._submit(path)
+
+    def _submit(self, path):
+        with self._lock:
+            if path in self._queued:
+                return
+            self._queued.add(path)
+        self._worker.submit(self._render, path)
+
+    def _render(self, path):
+        # Runs on a worker thread
+        try:
+            with self._lock:
+                if path not in self._requested and path not in self._visible:
+                    return
+            digest = self.cache.digest(path)
+            preview = self.cache.get(digest)
+            if preview is None:
+                with instrumentation.span("render_preview", "previews", path=path) as span:
+                    data = _png(render_preview(path))
+                    span.read(os.path.getsize(path))
+                    span.wrote(len(data))
+                preview = self.cache.put(digest, data)
+            self.ready.emit(path, preview)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            self.failed.emit(path, str(e))
+        finally:
+            with self._lock:
+                self._queued.discard(path)
+                self._requested.discard(path)
+
+    def shutdown(self):
+        self._worker.shutdown(cancel_futures=True)
+
+
+class PreviewPane(QWidget):
+    # Shows the preview of one document next to the table
+    def __init__(self, loader, parent=None):
+        super().__init__(parent)
+        self.loader = loader
+        self.loader.ready.connect(self.preview_ready)
+        self.loader.failed.connect(self.preview_failed)
+        self.path = None
+
+        self.title = QLabel()
+        self.title.setWordWrap(True)
+        self.image = QLabel()
+        self.image.setAlignment(Qt.AlignCenter)
+        self.image.setMinimumWidth(PREVIEW_WIDTH // 2)
+        self.image.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
+        self.pixmap = None
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.title)
+        layout.addWidget(self.image, 1)
+        self.setLayout(layout)
+        self.show_document(None, None)
+
+    def show_document(self, field, path):
+        self.path = path or None
+        self.pixmap = None
+        self.image.clear()
+        if field is None:
+            self.title.setText("Select a job to preview its documents")
+            return
+        if not path or not os.path.isfile(path):
+            self.title.setText(f"{field}: no file")
+            return
+        self.title.setText(f"{field}: {os.path.basename(path)}")
+        preview = self.loader.cache.cached(path)
+        if preview is not None:
+            self.show_preview(preview)
+        else:
+            self.image.setText("Rendering preview...")
+            self.loader.request(path)
+
+    def show_preview(self, preview):
+        self.pixmap = QPixmap(preview)
+        self.fit_preview()
+
+    def fit_preview(self):
+        if self.pixmap is not None and not self.pixmap.isNull():
+            self.image.setPixmap(self.pixmap.scaled(self.image.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.fit_preview()
+
+    def preview_ready(self, path, preview):
+        if path == self.path:
+            self.show_preview(preview)
+
+    def preview_failed(self, path, message):
+        if path == self.path:
+            self.image.setText(f"No preview: {message}")
@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import threading
+import uuid
+
+import instrumentation
+
+RELOCATIONS_FILE = 'relocations.json'
+
+
+class RelocationLog:
+    # Job directories being moved, written down before the first file moves
+    # and dropped once the record points at the new place. What is left in
+    # it at startup was interrupted and is finished then, so a crash cannot
+    # leave a record and its directory out of step.
+    #
+    # An intent is {"id", "key", "source", "destination", "changes"}, with
+    # changes the fields the record gets once its files are in place.
+    def __init__(self, path=RELOCATIONS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def pending(self):
+        with self._lock:
+            return self._read()
+
+    def begin(self, key, source, destination, changes):
+        intent = {
+            "id": uuid.uuid4().hex, "key": key, "source": source, "destination": destination,
+            "changes": dict(changes),
+        }
+        with self._lock:
+            self._write(self._read() + [intent])
+        return intent
+
+    def finish(self, intent):
+        with self._lock:
+            intents = self._read()
+            remaining = [pending for pending in intents if pending["id"] != intent["id"]]
+            if len(remaining) != len(intents):
+                self._write(remaining)
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return []
+        except ValueError:
+            # Only ever replaced whole, so this is not a torn write
+            instrumentation.event("relocation_log_unreadable", "files", path=self.path)
+            return []
+
+    def _write(self, intents):
+        if not intents:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.relocations-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(intents, file, ensure_ascii=False)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
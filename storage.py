@@ -0,0 +1,484 @@
+import csv
+import hashlib
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+from collections.abc import MutableMapping
+
+import instrumentation
+
+CSV_FILE = 'jobs.csv'
+JOBS_FOLDER = 'job_positions'
+DB_FILE = 'jobs.db'
+CACHE_FILE = 'jobs.cache'
+CACHE_VERSION = 2
+STORAGE_ENV = 'NEXTSTEP_STORAGE'  # "csv" or "sqlite"
+CSV_FIELDS = [
+    "Position",
+    "Company",
+    "ID",
+    "Snapshot",
+    "Status",
+    "Resume/CV",
+    "Cover Letter",
+    "Last Updated",
+    "Candidate Home Link",
+    "Submitted"
+]
+KEY_FIELD = "Key"
+# The stable key is stored last so the file still reads naturally in a spreadsheet
+CSV_COLUMNS = CSV_FIELDS + [KEY_FIELD]
+# Fields holding the path of a file in the job's directory
+DOCUMENT_FIELDS = ("Snapshot", "Resume/CV", "Cover Letter")
+# Attribute of a JobRecord, and column of the jobs table, for every field
+RECORD_ATTRIBUTES = {
+    "Position": "position",
+    "Company": "company",
+    "ID": "job_id",
+    "Snapshot": "snapshot",
+    "Status": "status",
+    "Resume/CV": "resume",
+    "Cover Letter": "cover_letter",
+    "Last Updated": "last_updated",
+    "Candidate Home Link": "home_link",
+    "Submitted": "submitted",
+    KEY_FIELD: "key",
+}
+
+
+class JobRecord(MutableMapping):
+    # A job as a fixed set of slots instead of a dict, at a fraction of the
+    # memory, read and written like the dict it replaces. An absent field is
+    # None; values read from files are always strings. Arguments and row()
+    # follow CSV_COLUMNS. Readers build records with shared_record(), which
+    # keeps one copy of each repeated value.
+    __slots__ = tuple(RECORD_ATTRIBUTES[field] for field in CSV_COLUMNS)
+    __hash__ = None
+
+    def __init__(self, position=None, company=None, job_id=None, snapshot=None, status=None, resume=None,
+                 cover_letter=None, last_updated=None, home_link=None, submitted=None, key=None):
+        self.position = position
+        self.company = company
+        self.job_id = job_id
+        self.snapshot = snapshot
+        self.status = status
+        self.resume = resume
+        self.cover_letter = cover_letter
+        self.last_updated = last_updated
+        self.home_link = home_link
+        self.submitted = submitted
+        self.key = key
+
+    @classmethod
+    def from_dict(cls, fields):
+        # Fields the record has no slot for are dropped, as a save would drop them
+        return cls(*[fields.get(field) for field in CSV_COLUMNS])
+
+    def row(self):
+        return (
+            self.position, self.company, self.job_id, self.snapshot, self.status, self.resume,
+            self.cover_letter, self.last_updated, self.home_link, self.submitted, self.key
+        )
+
+    def copy(self):
+        return JobRecord(*self.row())
+
+    def __getitem__(self, field):
+        value = getattr(self, RECORD_ATTRIBUTES[field])
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def get(self, field, default=None):
+        attribute = RECORD_ATTRIBUTES.get(field)
+        value = None if attribute is None else getattr(self, attribute)
+        return default if value is None else value
+
+    def __setitem__(self, field, value):
+        setattr(self, RECORD_ATTRIBUTES[field], value)
+
+    def __delitem__(self, field):
+        if self.get(field) is None:
+            raise KeyError(field)
+        setattr(self, RECORD_ATTRIBUTES[field], None)
+
+    def __contains__(self, field):
+        return self.get(field) is not None
+
+    def __iter__(self):
+        return (field for field, value in zip(CSV_COLUMNS, self.row()) if value is not None)
+
+    def __len__(self):
+        return sum(value is not None for value in self.row())
+
+    def __repr__(self):
+        return f"JobRecord({dict(self)!r})"
+
+
+def initialize_csv(path=CSV_FILE):
+    if not os.path.exists(path):
+        write_rows(path, [])
+
+
+def shared_record(row, intern=sys.intern):
+    # Positions, companies, statuses and dates repeat across jobs; each is kept once
+    position, company, job_id, snapshot, status, resume, cover_letter, last_updated, home_link, submitted, key = row
+    return JobRecord(
+        position and intern(position), company and intern(company), job_id, snapshot, status and intern(status),
+        resume, cover_letter, last_updated and intern(last_updated), home_link, submitted and intern(submitted), key
+    )
+
+
+def read_records(lines):
+    # JobRecords from CSV lines. A file with the usual header is read by
+    # position; anything else, such as a file from before keys, by name.
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    if header == CSV_COLUMNS:
+        width = len(CSV_COLUMNS)
+        for row in reader:
+            if len(row) == width:
+                yield shared_record(row)
+            elif row:
+                yield shared_record(JobRecord.from_dict(dict(zip(header, row))).row())
+    else:
+        for row in reader:
+            if row:
+                yield shared_record(JobRecord.from_dict(dict(zip(header, row))).row())
+
+
+def load_jobs(path=CSV_FILE):
+    jobs = []
+    if not os.path.exists(path):
+        return jobs
+
+    with instrumentation.span("load_jobs", "storage", path=path) as span:
+        with open(path, mode='r', newline='', encoding='utf-8') as file:
+            jobs.extend(read_records(file))
+            span.read(file.buffer.tell())
+    return jobs
+
+
+def stream_jobs(path=CSV_FILE):
+    # Yields (record, fraction of the file read) as rows are parsed, so callers
+    # can show the first jobs before a large file has been read in full
+    if not os.path.exists(path):
+        return
+    size = os.path.getsize(path) or 1
+    read = 0
+
+    def lines(file):
+        nonlocal read
+        for line in file:
+            read += len(line)
+            yield line.decode('utf-8')
+
+    span = instrumentation.begin("load_jobs", "storage", path=path, streamed=True)
+    try:
+        with open(path, mode='rb') as file:
+            for job in read_records(lines(file)):
+                yield job, min(1.0, read / size)
+    finally:
+        span.read(read)
+        instrumentation.end(span)
+
+
+def _cached_jobs(rows):
+    count = len(rows) or 1
+    span = instrumentation.begin("load_jobs", "storage", cached=True)
+    try:
+        for number, row in enumerate(rows, 1):
+            # Repeated values were pickled once, so they are shared already
+            yield JobRecord(*row), number / count
+    finally:
+        instrumentation.end(span)
+
+
+def read_cache(path, signature):
+    # The rows cached for exactly this file content, or None. The header
+    # is a pickle of its own, so a stale cache is rejected before the rows are read.
+    if signature is None:
+        return None
+    try:
+        with open(path, 'rb') as file:
+            if pickle.load(file) != (CACHE_VERSION, signature):
+                return None
+            return pickle.load(file)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError, AttributeError, ImportError, IndexError):
+        return None
+
+
+def write_cache(path, signature, rows):
+    # Rows follow CSV_COLUMNS. Repeated values (statuses, dates, folder names)
+    # are pickled once, which makes reading the cache several times faster
+    # than parsing the CSV.
+    values = {}
+    rows = [tuple(values.setdefault(value, value) for value in row) for row in rows]
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.jobs-cache-', dir=directory)
+    try:
+        with instrumentation.span("write_cache", "storage", path=path) as span, os.fdopen(fd, 'wb') as file:
+            pickle.dump((CACHE_VERSION, signature), file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(rows, file, protocol=pickle.HIGHEST_PROTOCOL)
+            span.wrote(file.tell())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def job_row(job):
+    if isinstance(job, JobRecord):
+        return [value or "" for value in job.row()]
+    return [job.get(field, "") or "" for field in CSV_COLUMNS]
+
+
+def write_rows(path, rows):
+    # Write next to the target and swap it in, so a crash never leaves a torn file
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.jobs-', suffix='.tmp', dir=directory)
+    try:
+        # Every CSV write ends up here, the store's flushes included
+        with instrumentation.span("save_jobs", "storage", path=path) as span, \
+                os.fdopen(fd, mode='w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(CSV_COLUMNS)
+            writer.writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+            span.wrote(file.buffer.tell())
+        # mkstemp creates owner-only files; keep the permissions of the file we replace
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_jobs(jobs, path=CSV_FILE):
+    write_rows(path, [job_row(job) for job in jobs])
+
+
+def export_csv(jobs, path=CSV_FILE):
+    save_jobs(jobs, path)
+
+
+def file_signature(path, previous=None):
+    # (mtime, size, sha256) of a file. The hash is only recomputed when the
+    # cheap stat part differs from the previous signature.
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if previous is not None and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+        return previous
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return (stat.st_mtime_ns, stat.st_size, digest.hexdigest())
+
+
+def job_directory(position_name, company_name, job_id):
+    safe_position_name = position_name.replace(" ", "_")
+    safe_company_name  = company_name.replace(" ", "_")
+    safe_job_id        = job_id.replace(" ", "_")
+    dirname = f"{safe_position_name}-{safe_company_name}-{safe_job_id}"
+    return os.path.join(JOBS_FOLDER, dirname)
+
+
+def job_key(job_id, *taken):
+    base = job_id.strip().replace(" ", "_") or "job"
+    key = base
+    suffix = 2
+    while any(key in keys for keys in taken):
+        key = f"{base}-{suffix}"
+        suffix += 1
+    return key
+
+
+class CsvBackend:
+    # Parsed records are cached next to the CSV, keyed by its signature, so an
+    # unchanged file is never parsed twice. cache_path=None turns that off.
+    def __init__(self, path=CSV_FILE, cache_path=CACHE_FILE):
+        self.path = path
+        self.cache_path = cache_path
+        self.signature = None  # Of the file as this process last read or wrote it
+        self._uncached = None  # Rows written since the cache was, cached on close
+        initialize_csv(path)
+
+    def load(self):
+        return [job for job, _ in self.stream()]
+
+    def stream(self):
+        self.signature = file_signature(self.path)
+        if self.cache_path is not None:
+            rows = read_cache(self.cache_path, self.signature)
+            if rows is not None:
+                return _cached_jobs(rows)
+        return self._parse()
+
+    def _parse(self):
+        parsed = []
+        for job, fraction in stream_jobs(self.path):
+            # Taken before the store adds to the record
+            parsed.append(job.row())
+            yield job, fraction
+        if self.cache_path is not None and file_signature(self.path, self.signature) == self.signature:
+            self._write_cache(parsed)
+
+    def _write_cache(self, rows):
+        # Only a speedup: a cache that cannot be written is simply missing next time
+        try:
+            write_cache(self.cache_path, self.signature, rows)
+        except OSError as e:
+            instrumentation.event("cache_not_written", "storage", error=str(e))
+
+    def has_external_changes(self):
+        signature = file_signature(self.path, self.signature)
+        if signature is None or signature == self.signature:
+            return False
+        if self.signature is not None and signature[2] == self.signature[2]:
+            # Touched but not edited
+            self.signature = signature
+            return False
+        return True
+
+    def prepare(self, jobs, added, changed, removed):
+        # A CSV can only be rewritten as a whole
+        return [job_row(job) for job in jobs]
+
+    def commit(self, rows):
+        write_rows(self.path, rows)
+        # Remember our own write so the file watcher does not reload it
+        self.signature = file_signature(self.path)
+        self._uncached = rows
+
+    def close(self):
+        if self._uncached is not None and self.cache_path is not None:
+            self._write_cache(self._uncached)
+            self._uncached = None
+
+
+# Column name in the jobs table for every record field
+SQL_COLUMNS = RECORD_ATTRIBUTES
+SQL_FIELDS = [KEY_FIELD] + CSV_FIELDS
+
+
+class SqliteBackend:
+    def __init__(self, path=DB_FILE, csv_path=CSV_FILE):
+        self.path = path
+        # Flushes run on the store's timer thread; the store serializes them
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        if csv_path and self._meta("csv_imported") is None:
+            self._import_csv(csv_path)
+
+    def _create_schema(self):
+        columns = ", ".join(
+            f"{SQL_COLUMNS[field]} TEXT NOT NULL DEFAULT ''" for field in CSV_FIELDS
+        )
+        with self.connection:
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS jobs (key TEXT PRIMARY KEY, {columns})")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS jobs_company ON jobs (company)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS jobs_last_updated ON jobs (last_updated)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+    def _meta(self, name):
+        row = self.connection.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _import_csv(self, csv_path):
+        # One-shot migration: an existing jobs.csv is copied in on first start
+        # and left in place untouched
+        taken = set()
+        rows = []
+        for job in load_jobs(csv_path):
+            if not job.get(KEY_FIELD) or job[KEY_FIELD] in taken:
+                job[KEY_FIELD] = job_key(job.get("ID", ""), taken)
+            taken.add(job[KEY_FIELD])
+            rows.append(self._values(job))
+        with self.connection:
+            self.connection.executemany(self._insert_sql, rows)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('csv_imported', ?)",
+                (os.path.abspath(csv_path),)
+            )
+
+    @property
+    def _insert_sql(self):
+        columns = ", ".join(SQL_COLUMNS[field] for field in SQL_FIELDS)
+        placeholders = ", ".join("?" for _ in SQL_FIELDS)
+        return f"INSERT INTO jobs ({columns}) VALUES ({placeholders})"
+
+    def _values(self, job):
+        return [job.get(field, "") or "" for field in SQL_FIELDS]
+
+    def has_external_changes(self):
+        # The database is not meant to be edited outside the program
+        return False
+
+    def load(self):
+        # Selected in CSV_COLUMNS order, which is the order JobRecord takes
+        columns = ", ".join(SQL_COLUMNS[field] for field in CSV_COLUMNS)
+        cursor = self.connection.execute(f"SELECT {columns} FROM jobs ORDER BY rowid")
+        return [shared_record(row) for row in cursor]
+
+    def stream(self):
+        total = self.connection.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] or 1
+        columns = ", ".join(SQL_COLUMNS[field] for field in CSV_COLUMNS)
+        span = instrumentation.begin("load_jobs", "sqlite", path=self.path, streamed=True)
+        try:
+            cursor = self.connection.execute(f"SELECT {columns} FROM jobs ORDER BY rowid")
+            for count, row in enumerate(cursor, 1):
+                yield shared_record(row), count / total
+        finally:
+            instrumentation.end(span)
+
+    def prepare(self, jobs, added, changed, removed):
+        inserts = [self._values(job) for job in added]
+        updates = [
+            (job[KEY_FIELD], {field: job.get(field, "") or "" for field in fields})
+            for job, fields in changed
+        ]
+        deletes = [(job[KEY_FIELD],) for job in removed]
+        return inserts, updates, deletes
+
+    def commit(self, payload):
+        inserts, updates, deletes = payload
+        with instrumentation.span("save_jobs", "sqlite", path=self.path, inserts=len(inserts),
+                                  updates=len(updates), deletes=len(deletes)), self.connection:
+            self.connection.executemany("DELETE FROM jobs WHERE key = ?", deletes)
+            self.connection.executemany(self._insert_sql, inserts)
+            # A status change touches one row and only the columns that changed
+            for key, values in updates:
+                assignments = ", ".join(f"{SQL_COLUMNS[field]} = ?" for field in values)
+                self.connection.execute(
+                    f"UPDATE jobs SET {assignments} WHERE key = ?",
+                    list(values.values()) + [key]
+                )
+
+    def close(self):
+        self.connection.close()
+
+
+def open_backend(kind=None):
+    # Once a database exists it stays in use; otherwise the CSV remains the default
+    kind = kind or os.environ.get(STORAGE_ENV) or ("sqlite" if os.path.exists(DB_FILE) else "csv")
+    if kind == "sqlite":
+        return SqliteBackend()
+    if kind == "csv":
+        return CsvBackend()
+    raise ValueError(f"Unknown storage backend: {kind}")
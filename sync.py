@@ -0,0 +1,420 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+import instrumentation
+from blob_store import file_hash
+from journal import HISTORY_FILE
+from storage import CSV_FIELDS, DOCUMENT_FIELDS, KEY_FIELD, JobRecord
+
+SYNC_ENV = 'NEXTSTEP_SYNC'  # Folder shared between devices, usually inside a cloud drive
+SYNC_STATE_FILE = 'sync_state.json'
+CHANGES_FOLDER = 'changes'
+FILES_FOLDER = 'files'
+# Actions that create a job rather than bring an existing one back
+NEW_JOB_ACTIONS = ("add", "duplicate", "import")
+
+
+def open_sync(folder=None):
+    # The sync folder set with NEXTSTEP_SYNC, or None when this device does not sync
+    folder = folder or os.environ.get(SYNC_ENV)
+    return SyncFolder(folder) if folder else None
+
+
+def _write_json(path, data):
+    # Written next to the target and swapped in, so a sync client never uploads half a file
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.sync-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+            size = file.tell()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size
+
+
+def _edit_time(entry):
+    # Seconds since the epoch when a history line's edit was made; it holds local time
+    try:
+        return datetime.datetime.fromisoformat(entry["time"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _copy(source, destination):
+    directory = os.path.dirname(os.path.abspath(destination))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.sync-', dir=directory)
+    os.close(fd)
+    try:
+        shutil.copy2(source, tmp_path)
+        os.replace(tmp_path, destination)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SyncFolder:
+    # Exchanges job edits with other devices through a shared folder. Every
+    # device writes the edits from its history as numbered change sets to
+    # changes/<device>/ and reads only the change sets of the others it has
+    # not seen yet. Documents go to files/ once per content.
+    #
+    # Each change carries a stamp, [milliseconds, device], from the time the
+    # edit was made and a clock that never runs behind a stamp it has seen. A field keeps the value with the
+    # highest stamp, so every device ends up with the same values whatever
+    # order the change sets arrive in; a deleted job stays deleted unless it
+    # is added back later. Jobs are named by an id that is the same on every
+    # device: "/<key>" for the jobs all devices started with, and
+    # "<device>/<key>" for a job added since, which gets a free local key on
+    # the other devices.
+    def __init__(self, folder, history_path=HISTORY_FILE, state_path=SYNC_STATE_FILE):
+        self.folder = folder
+        self.history_path = history_path
+        self.state_path = state_path
+        self._lock = threading.RLock()
+        self.state = self._read_state()
+        self.device = self.state["device"]
+        self._gids = {key: gid for gid, key in self.state["keys"].items()}
+
+    def _read_state(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            pass
+        # A new device starts from the jobs it has; edits made before sync
+        # was turned on are not sent
+        try:
+            pushed = os.path.getsize(self.history_path)
+        except FileNotFoundError:
+            pushed = 0
+        state = {
+            "device": uuid.uuid4().hex[:12],
+            "clock": 0,
+            "seq": 0,           # Last change set this device wrote
+            "pushed": pushed,   # Offset in the history up to which edits were sent
+            "seen": {},         # device -> last change set applied
+            "versions": {},     # job id -> {field: stamp}
+            "added": {},        # job id -> stamp of its latest adding
+            "removed": {},      # job id -> stamp of its removal
+            "held": {},         # job id -> values of a job not here: removed, or not arrived yet
+            "keys": {},         # job id -> local key, where they differ from "/<key>"
+            "missing": {},      # local path -> digest of a document not in the folder yet
+        }
+        _write_json(self.state_path, state)
+        return state
+
+    def _save_state(self):
+        _write_json(self.state_path, self.state)
+
+    def _stamp(self, when=None):
+        # when is the time of the edit, now by default. An edit pushed late,
+        # after the folder could not be reached, keeps the time it was made
+        # and so loses to the edits other devices made after it.
+        when = time.time() if when is None else when
+        self.state["clock"] = max(int(when * 1000), self.state["clock"] + 1)
+        return [self.state["clock"], self.device]
+
+    def _gid(self, key):
+        return self._gids.get(key) or "/" + key
+
+    def _map(self, gid, key):
+        # A key taken by another job now no longer names the job that had it
+        previous = self._gids.pop(key, None)
+        if previous is not None and previous != gid:
+            del self.state["keys"][previous]
+        if gid == "/" + key:
+            self.state["keys"].pop(gid, None)
+            return
+        self.state["keys"][gid] = key
+        self._gids[key] = gid
+
+    def _local_key(self, gid):
+        # None for a job that has no key on this device
+        if gid in self.state["keys"]:
+            return self.state["keys"][gid]
+        if gid.startswith("/") and gid[1:] not in self._gids:
+            return gid[1:]
+        return None
+
+    def _device_folder(self, device):
+        return os.path.join(self.folder, CHANGES_FOLDER, device)
+
+    def _file_path(self, digest):
+        return os.path.join(self.folder, FILES_FOLDER, digest[:2], digest)
+
+    def _history(self):
+        # Complete lines appended to the history since the last push, and the offset after them
+        offset = self.state["pushed"]
+        try:
+            if os.path.getsize(self.history_path) < offset:
+                offset = 0  # The history was started over
+            with open(self.history_path, 'rb') as file:
+                file.seek(offset)
+                data = file.read()
+        except FileNotFoundError:
+            return [], 0
+        end = data.rfind(b"\n") + 1
+        entries = []
+        for line in data[:end].splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries, offset + end
+
+    def push(self):
+        # Sends the local edits made since the last push as one change set;
+        # returns how many changes it holds
+        with self._lock, instrumentation.span("sync_push", "sync", folder=self.folder) as span:
+            entries, offset = self._history()
+            if offset == self.state["pushed"]:
+                return 0
+            changes = []
+            for entry in entries:
+                if entry["action"] == "sync":
+                    continue  # Came from another device
+                change = self._change(entry)
+                span.wrote(sum(change.pop("uploaded", ())))
+                changes.append(change)
+            if changes:
+                self.state["seq"] += 1
+                path = os.path.join(self._device_folder(self.device), f"{self.state['seq']:08d}.json")
+                span.wrote(_write_json(path, {"device": self.device, "seq": self.state["seq"], "changes": changes}))
+            self.state["pushed"] = offset
+            self._save_state()
+            span.annotate(changes=len(changes))
+            return len(changes)
+
+    def _change(self, entry):
+        key = entry["key"]
+        if entry["op"] == "add" and entry["action"] in NEW_JOB_ACTIONS:
+            gid = f"{self.device}/{key}"
+            self._map(gid, key)
+        else:
+            gid = self._gid(key)
+        stamp = self._stamp(_edit_time(entry))
+        change = {"id": gid, "stamp": stamp, "op": entry["op"], "action": entry["action"], "time": entry["time"]}
+        if entry["op"] == "remove":
+            self.state["removed"][gid] = stamp
+            self.state["held"][gid] = entry["before"]
+            return change
+
+        fields = entry.get("fields", {})
+        if entry["op"] == "add":
+            fields = {field: fields.get(field) or "" for field in CSV_FIELDS}
+            self.state["added"][gid] = stamp
+            self.state["held"].pop(gid, None)
+        versions = self.state["versions"].setdefault(gid, {})
+        for field in fields:
+            versions[field] = stamp
+        change["fields"] = fields
+        files, uploaded = self._upload(fields)
+        if files:
+            change["files"] = files
+            change["uploaded"] = uploaded
+        return change
+
+    def _upload(self, fields):
+        # Documents inside the jobs folder are copied once per content
+        files = {}
+        uploaded = []
+        for field in DOCUMENT_FIELDS:
+            path = fields.get(field)
+            if not path or os.path.isabs(path) or not os.path.isfile(path):
+                continue
+            digest = file_hash(path)
+            files[field] = digest
+            target = self._file_path(digest)
+            if not os.path.exists(target):
+                _copy(path, target)
+                uploaded.append(os.path.getsize(target))
+        return files, uploaded
+
+    def fetch(self):
+        # Change sets of other devices that were not applied yet, oldest first
+        # per device. A change set the sync client is still writing is left
+        # for the next fetch, with everything after it.
+        fetched = []
+        root = os.path.join(self.folder, CHANGES_FOLDER)
+        with instrumentation.span("sync_fetch", "sync", folder=self.folder) as span:
+            try:
+                devices = sorted(os.listdir(root))
+            except FileNotFoundError:
+                return fetched
+            for device in devices:
+                if device == self.device:
+                    continue
+                seen = self.state["seen"].get(device, 0)
+                names = sorted(
+                    name for name in os.listdir(os.path.join(root, device))
+                    if name.endswith(".json") and name[:-5].isdigit() and int(name[:-5]) > seen
+                )
+                for name in names:
+                    path = os.path.join(root, device, name)
+                    try:
+                        with open(path, encoding='utf-8') as file:
+                            change_set = json.load(file)
+                    except (OSError, ValueError):
+                        break
+                    if change_set.get("seq") != seen + 1:
+                        break  # One in between has not arrived yet
+                    span.read(os.path.getsize(path))
+                    fetched.append(change_set)
+                    seen += 1
+            span.annotate(change_sets=len(fetched))
+        return fetched
+
+    def apply(self, store, change_sets, archive=None):
+        # Applies fetched change sets to the store; returns (added, removed,
+        # changed, archived) with the first three as JobStore.reload() has
+        # them. Edits not sent yet are sent first, so they are weighed
+        # against the incoming ones by their stamps. Jobs another device
+        # archived are moved into this device's archive, when there is one.
+        from job_core import archive_jobs, restore_jobs
+
+        store.flush()
+        self.push()
+        added = {}
+        removed = {}
+        changed = {}
+        archived = []
+        restored = set()  # Keys to drop from the archive once the store is saved
+        with self._lock, instrumentation.span("sync_apply", "sync", change_sets=len(change_sets)):
+            archived_keys = archive.keys() if archive is not None else set()
+            with store.batch():
+                for change_set in change_sets:
+                    for change in change_set["changes"]:
+                        self._observe(change["stamp"])
+                        key = self._local_key(change["id"])
+                        if change["op"] == "remove":
+                            job = self._remove(store, change)
+                            if job is None:
+                                continue
+                            if change["action"] == "archive" and archive is not None:
+                                archived += archive_jobs(store, archive, [job[KEY_FIELD]])[0]
+                                archived_keys.add(job[KEY_FIELD])
+                                restored.discard(job[KEY_FIELD])
+                            else:
+                                store.remove(job, "sync")
+                            if added.pop(job[KEY_FIELD], None) is None:
+                                removed[job[KEY_FIELD]] = job
+                            changed.pop(job[KEY_FIELD], None)
+                            continue
+                        if change["op"] == "add" and key not in store and key in archived_keys:
+                            # Restored on the other device
+                            for job in restore_jobs(store, archive, [key]):
+                                added[job[KEY_FIELD]] = job
+                            archived_keys.discard(key)
+                            restored.add(key)
+                        job, fields = self._set(store, change)
+                        if job is None:
+                            continue
+                        if fields is None:
+                            added[job[KEY_FIELD]] = job
+                        elif fields and job[KEY_FIELD] not in added:
+                            changed.setdefault(job[KEY_FIELD], set()).update(fields)
+                    self.state["seen"][change_set["device"]] = change_set["seq"]
+            self._fetch_files()
+            self._save_state()
+        # One write for everything applied, archived and restored jobs included;
+        # what this device did with them is not sent back
+        store.flush()
+        if restored:
+            archive.discard(restored)
+        self.state["pushed"] = self._history()[1]
+        self._save_state()
+        return list(added.values()), list(removed.values()), changed, archived
+
+    def _observe(self, stamp):
+        self.state["clock"] = max(self.state["clock"], stamp[0])
+
+    def _remove(self, store, change):
+        # A deleted job stays deleted: an edit made elsewhere at the same time
+        # cannot bring back the fields that were not edited. Only adding it
+        # back after the removal can.
+        gid = change["id"]
+        stamp = change["stamp"]
+        if self.state["removed"].get(gid, [0, ""]) < stamp:
+            self.state["removed"][gid] = stamp
+        key = self._local_key(gid)
+        if key is None or key not in store or self.state["added"].get(gid, [0, ""]) > stamp:
+            return None
+        job = store.get(key)
+        self.state["held"][gid] = {field: job.get(field) or "" for field in CSV_FIELDS}
+        return job
+
+    def _set(self, store, change):
+        # Returns (record, fields changed), with None for the fields of a record that was added
+        gid = change["id"]
+        stamp = change["stamp"]
+        key = self._local_key(gid)
+        job = store.get(key) if key is not None and key in store else None
+        versions = self.state["versions"].setdefault(gid, {})
+        if job is None and change["op"] != "add":
+            # Kept for when the job is added (back): its adding may arrive
+            # after the edit, in another device's change set
+            held = self.state["held"].setdefault(gid, {})
+            for field, value in change["fields"].items():
+                if versions.get(field, [0, ""]) < stamp:
+                    versions[field] = stamp
+                    held[field] = value
+            return None, None
+        if job is None:
+            if self.state["removed"].get(gid, [0, ""]) >= stamp:
+                return None, None
+            # Edits that are newer than the adding win, such as those made
+            # after the job was removed here but before it was added back there
+            fields = dict(change["fields"])
+            kept = self.state["held"].pop(gid, {})
+            for field in fields:
+                if field in kept and versions.get(field, [0, ""]) > stamp:
+                    fields[field] = kept[field]
+                else:
+                    versions[field] = stamp
+            self.state["added"][gid] = stamp
+            job = JobRecord.from_dict(fields)
+            # The key it has elsewhere may be taken here, by a job in the store,
+            # one waiting for its files or an archived one
+            key = store.reserve_key(job) if key is None or store.is_taken(key) else key
+            job[KEY_FIELD] = key
+            store.add(job, "sync")
+            self._map(gid, job[KEY_FIELD])
+            self._place_files(change, fields)
+            return job, None
+        updates = {}
+        for field, value in change["fields"].items():
+            if versions.get(field, [0, ""]) < stamp:
+                versions[field] = stamp
+                updates[field] = value
+        fields = store.update(job, updates, "sync") if updates else set()
+        self._place_files(change, updates)
+        return job, fields
+
+    def _place_files(self, change, fields):
+        for field, digest in change.get("files", {}).items():
+            path = fields.get(field)
+            if path and not os.path.exists(path):
+                self.state["missing"][path] = digest
+
+    def _fetch_files(self):
+        # Documents whose content has not reached the folder yet are tried again next time
+        for path, digest in list(self.state["missing"].items()):
+            source = self._file_path(digest)
+            if os.path.exists(path):
+                del self.state["missing"][path]
+            elif os.path.exists(source):
+                _copy(source, path)
+                del self.state["missing"][path]
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # jobs.csv, job_positions/ and the other files are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+import file_ops
+from job_core import add_job, import_jobs, plan_new_job
+from job_store import JobStore
+from storage import JOBS_FOLDER, CsvBackend, job_directory
+
+
+@pytest.fixture
+def failing_copies(monkeypatch):
+    def fail(operation, task, verify=False):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(file_ops.FileOperation, "_copy", fail)
+
+
+def _document(name):
+    with open(name, "w") as file:
+        file.write(name)
+    return os.path.abspath(name)
+
+
+def test_failed_transfer_takes_back_the_job_directory(workdir, failing_copies):
+    store = JobStore(CsvBackend(cache_path=None))
+    job, operations = plan_new_job("Engineer", "Acme", "1", "Applied", resume=_document("cv.pdf"))
+    assert os.path.isdir(job_directory("Engineer", "Acme", "1"))
+    with pytest.raises(OSError, match="No space"):
+        add_job(store, job, operations)
+    assert os.listdir(JOBS_FOLDER) == []
+    assert len(store) == 0
+    store.close()
+
+
+def test_failed_import_rows_leave_no_directories(workdir, failing_copies):
+    store = JobStore(CsvBackend(cache_path=None))
+    records = [
+        {"Position": "Engineer", "Company": "Acme", "ID": "1", "Status": "Applied",
+         "Candidate Home Link": "", "Snapshot": "", "Resume/CV": "", "Cover Letter": ""},
+        {"Position": "Analyst", "Company": "Globex", "ID": "2", "Status": "Applied",
+         "Candidate Home Link": "", "Snapshot": "", "Resume/CV": _document("cv.pdf"), "Cover Letter": ""},
+    ]
+    added, errors = import_jobs(store, records)
+    assert [job["ID"] for job in added] == ["1"]
+    assert [number for number, _ in errors] == [2]
+    assert os.listdir(JOBS_FOLDER) == [os.path.basename(job_directory("Engineer", "Acme", "1"))]
+    # Saved before the working directory is put back
+    store.close()
+
+
+def test_add_dialog_reports_a_directory_that_cannot_be_made(workdir, monkeypatch):
+    pytest.importorskip("PyQt5")
+    if not os.environ.get("QT_QPA_PLATFORM"):
+        monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    import job_manager_gui
+
+    app = QApplication.instance() or QApplication([])
+    warnings = []
+    monkeypatch.setattr(job_manager_gui.QMessageBox, "warning", lambda parent, title, text: warnings.append(text))
+    with open(JOBS_FOLDER, "w"):
+        pass  # A file where the jobs folder should be
+
+    dialog = job_manager_gui.AddJobDialog(None)
+    dialog.position_name.setText("Engineer")
+    dialog.company_name.setText("Acme")
+    dialog.job_id.setText("1")
+    dialog.add_job()
+    assert len(warnings) == 1
+    assert dialog.result() != job_manager_gui.QDialog.Accepted
+    dialog.deleteLater()
+    app.processEvents()
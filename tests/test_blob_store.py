@@ -0,0 +1,124 @@
+import errno
+import os
+import shutil
+
+import pytest
+
+import blob_store
+from blob_store import BlobStore, file_hash
+from file_ops import FileOperation, run_operations
+from job_core import plan_detach
+
+
+def _write(path, data):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(data)
+
+
+def _read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def test_linked_documents_do_not_share_edits(workdir):
+    blobs = BlobStore()
+    _write("resume.pdf", b"resume")
+    digest = blobs.put("resume.pdf")
+    for job in ("a", "b"):
+        os.makedirs(os.path.join("job_positions", job))
+        assert blobs.link(digest, os.path.join("job_positions", job, "resume.pdf")) in ("reflink", "copy")
+
+    # Edited in place, the way an editor or a sync client writes
+    with open(os.path.join("job_positions", "a", "resume.pdf"), "r+b") as file:
+        file.write(b"EDITED")
+    assert _read(os.path.join("job_positions", "b", "resume.pdf")) == b"resume"
+    assert _read(blobs.blob_path(digest)) == b"resume"
+    assert os.stat(os.path.join("job_positions", "b", "resume.pdf")).st_nlink == 1
+
+
+def test_dedupe_breaks_hardlinks_of_earlier_versions(workdir):
+    blobs = BlobStore()
+    _write(os.path.join("job_positions", "a", "cv.pdf"), b"cv")
+    digest = blobs.put(os.path.join("job_positions", "a", "cv.pdf"))
+    os.makedirs(os.path.join("job_positions", "b"))
+    os.remove(os.path.join("job_positions", "a", "cv.pdf"))
+    for job in ("a", "b"):
+        os.link(blobs.blob_path(digest), os.path.join("job_positions", job, "cv.pdf"))
+
+    blobs.dedupe()
+    for job in ("a", "b"):
+        path = os.path.join("job_positions", job, "cv.pdf")
+        assert _read(path) == b"cv"
+        assert os.stat(path).st_nlink == 1
+    blobs.prune()
+    assert not os.path.exists(blobs.blob_path(digest)) or os.stat(blobs.blob_path(digest)).st_nlink == 1
+
+
+def test_job_directory_is_detached_before_it_is_opened(workdir):
+    blobs = BlobStore()
+    _write("cv.pdf", b"cv")
+    digest = blobs.put("cv.pdf")
+    job_dir = os.path.join("job_positions", "a")
+    os.makedirs(job_dir)
+    os.link(blobs.blob_path(digest), os.path.join(job_dir, "cv.pdf"))
+    _write(os.path.join(job_dir, "notes.txt"), b"notes")
+
+    operations = plan_detach(job_dir)
+    assert [(operation.kind, os.path.basename(operation.source)) for operation in operations] == [("detach", "cv.pdf")]
+    assert run_operations(job_dir, operations).succeeded
+    assert os.stat(os.path.join(job_dir, "cv.pdf")).st_nlink == 1
+    assert _read(os.path.join(job_dir, "cv.pdf")) == b"cv"
+    assert _read(blobs.blob_path(digest)) == b"cv"
+    assert plan_detach(job_dir) == []
+
+
+@pytest.fixture
+def clones(monkeypatch):
+    # Volumes that can clone (Btrfs, XFS, APFS), or not (NTFS, ext4); a clone is faked by a copy
+    probes = []
+
+    def volume(supported):
+        def reflink(source, destination):
+            probes.append(destination)
+            if not supported:
+                raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+            shutil.copyfile(source, destination)
+            return True
+        monkeypatch.setattr(blob_store, "_reflink", reflink)
+        return probes
+    return volume
+
+
+def _link(blobs, source, job):
+    os.makedirs(os.path.join("job_positions", job), exist_ok=True)
+    destination = os.path.join("job_positions", job, os.path.basename(source))
+    task = run_operations(job, [FileOperation("link", source, destination, blobs)])
+    assert task.succeeded
+    return destination
+
+
+def test_documents_are_copied_once_where_the_volume_cannot_clone(workdir, clones):
+    probes = clones(False)
+    _write("cv.pdf", b"cv")
+    blobs = BlobStore()
+    for job in ("a", "b", "c"):
+        assert _read(_link(blobs, "cv.pdf", job)) == b"cv"
+    assert not os.path.exists(blobs.root)
+    assert len(probes) == 1  # Probed once for the volume
+
+    assert blobs.dedupe() == (0, 0)
+    assert not os.path.exists(blobs.root)
+
+
+def test_documents_are_shared_where_the_volume_can_clone(workdir, clones):
+    clones(True)
+    _write("cv.pdf", b"cv")
+    blobs = BlobStore()
+    for job in ("a", "b"):
+        _link(blobs, "cv.pdf", job)
+    assert os.path.isfile(blobs.blob_path(file_hash("cv.pdf")))
+
+    blobs.prune()
+    assert not os.path.exists(blobs.root)
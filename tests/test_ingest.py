@@ -0,0 +1,183 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+import ingest
+from archive import JobArchive
+from benchmarks.postings import PADDED_SIZE, RETRY_AFTER, PostingServer, posting
+from file_ops import TransferCancelled
+from ingest import extract_posting, fetch_postings, ingest_postings, save_posting
+from job_store import JobStore
+from storage import JOBS_FOLDER, KEY_FIELD, CsvBackend, JobRecord
+
+
+@pytest.fixture
+def server():
+    with PostingServer() as server:
+        yield server
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(ingest, "RETRY_DELAY", 0.05)
+
+
+def _fetch(server, path, **options):
+    async def run():
+        return await ingest.fetch(server.base_url + path, asyncio.Semaphore(4), ingest.HostLimiter(0), **options)
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("kind", ["jobs", "chunked", "streamed"])
+def test_whole_body_is_read(server, kind):
+    response = _fetch(server, f"/{kind}/4")
+    assert response.status == 200
+    if kind != "jobs":
+        assert len(response.body) == PADDED_SIZE
+    assert response.body.rstrip().endswith(b"</html>")
+
+
+@pytest.mark.parametrize("kind", ["jobs", "chunked", "streamed"])
+def test_oversize_body_is_refused(server, monkeypatch, kind):
+    monkeypatch.setattr(ingest, "MAX_POSTING_SIZE", 1024)
+    with pytest.raises(ValueError, match="larger than"):
+        _fetch(server, f"/{kind}/4")
+
+
+def test_fields_from_every_page_shape(server, workdir):
+    urls = server.urls(4) + server.urls(2, "chunked", 5) + server.urls(2, "streamed", 7)
+    jobs, skipped, errors = fetch_postings(urls, interval=0)
+    assert not skipped and not errors
+    assert [(job["Position"], job["Company"]) for job in jobs] == [posting(number) for number in range(1, 9)]
+    assert [job["ID"] for job in jobs][:4] == ["P1", "2", "3", "P4"]
+    for job in jobs:
+        assert os.path.isfile(job["Snapshot"])
+        assert os.path.dirname(os.path.dirname(job["Snapshot"])) == "job_positions"
+
+
+@pytest.mark.parametrize("title", [
+    "../../../outside/pwned at Evil", "..\\..\\outside at Evil", "C:\\outside at Evil", "CON: at &lt;Evil&gt;?",
+])
+def test_hostile_title_stays_in_the_jobs_folder(workdir, title):
+    page = f"<title>{title}</title>".encode("utf-8")
+    url = "http://example.com/jobs/12"
+    posting = extract_posting(url, page.decode("utf-8"))
+    job = save_posting(url, posting, ingest.Response(url, 200, "OK", {}, page), "Applied")
+    directory = os.path.dirname(job["Snapshot"])
+    assert os.path.dirname(directory) == JOBS_FOLDER
+    assert os.listdir(workdir) == [JOBS_FOLDER]
+    assert os.listdir(JOBS_FOLDER) == [os.path.basename(directory)]
+
+
+def test_posting_that_would_leave_the_jobs_folder_is_refused(workdir):
+    url = "http://example.com/jobs/12"
+    posting = {"Position": "x", "Company": "/../../outside", "ID": "12"}
+    with pytest.raises(ValueError, match="outside"):
+        save_posting(url, posting, ingest.Response(url, 200, "OK", {}, b""), "Applied")
+    assert os.listdir(workdir) == []
+
+
+def test_server_error_is_retried(server, workdir, fast_retries):
+    jobs, _, errors = fetch_postings(server.urls(1, "flaky"), interval=0, retries=1)
+    assert len(jobs) == 1 and not errors
+    assert server.requests == 2
+
+
+def test_retries_run_out(server, workdir, fast_retries):
+    jobs, _, errors = fetch_postings(server.urls(1, "flaky"), interval=0, retries=0)
+    assert not jobs
+    assert errors[0][1].endswith("503 Service Unavailable")
+
+
+def test_retry_after_is_waited_for(server, workdir, fast_retries):
+    start = time.monotonic()
+    jobs, _, errors = fetch_postings(server.urls(1, "limited"), interval=0)
+    assert len(jobs) == 1 and not errors
+    (first, _), (second, _) = server.log
+    assert second - first >= RETRY_AFTER - 0.05
+    assert time.monotonic() - start < RETRY_AFTER + 2
+
+
+def test_client_errors_are_not_retried(server, workdir, fast_retries):
+    _, _, errors = fetch_postings(server.urls(1, "missing"), interval=0)
+    assert errors[0][1].endswith("404 Not Found")
+    assert server.requests == 1
+
+
+def test_requests_to_one_host_are_spaced(server, workdir):
+    interval = 0.2
+    fetch_postings(server.urls(5), interval=interval)
+    starts = sorted(when for when, _ in server.log)
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert len(starts) == 5
+    assert min(gaps) >= interval - 0.05
+
+
+def test_connections_are_bounded(workdir):
+    with PostingServer(latency=0.1) as server:
+        fetch_postings(server.urls(12), interval=0, connections=3)
+        assert server.max_active == 3
+
+
+def test_cancelled_fetch_stops_and_takes_back_what_it_saved(server, workdir):
+    cancel = threading.Event()
+    outcome = []
+
+    def run():
+        try:
+            fetch_postings(server.urls(3), interval=60, cancel=cancel)
+        except TransferCancelled:
+            outcome.append("cancelled")
+    thread = threading.Thread(target=run)
+    thread.start()
+    # The first posting is saved; the others wait a minute for their turn
+    deadline = time.monotonic() + 10
+    while not (os.path.isdir(JOBS_FOLDER) and os.listdir(JOBS_FOLDER)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert os.listdir(JOBS_FOLDER)
+    cancel.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert outcome == ["cancelled"]
+    assert os.listdir(JOBS_FOLDER) == []
+    assert server.requests == 1
+
+
+def test_known_postings_are_skipped(server, workdir):
+    first, second = server.urls(2)
+    known = [{"Position": "Anything", "Company": posting(2)[1], "ID": "2"},
+             {"Candidate Home Link": first + "/#apply"}]
+    jobs, skipped, errors = fetch_postings([first, second, second + "/"], known, interval=0)
+    assert not jobs and not errors
+    assert [url for url, _ in skipped] == [first, second + "/", second]
+    # The listed link is not even downloaded; the one with a known ID is
+    assert server.requests == 1
+
+
+def test_same_posting_at_two_addresses_is_added_once(server, workdir):
+    jobs, skipped, _ = fetch_postings(server.urls(1) + server.urls(1, "moved"), interval=0)
+    assert len(jobs) == 1
+    assert skipped == [(server.urls(1, "moved")[0], f"{posting(1)[1]} P1 is already a job")]
+
+
+def test_ingest_commits_once_and_skips_archived_jobs(server, workdir):
+    archive = JobArchive()
+    archive.add([JobRecord.from_dict({
+        "Position": "Old", "Company": posting(4)[1], "ID": "P4", "Status": "Rejection", KEY_FIELD: "P4",
+    })])
+    store = JobStore(CsvBackend())
+    jobs, skipped, errors = ingest_postings(store, server.urls(4), archive.load(), interval=0)
+    assert [job["ID"] for job in jobs] == ["P1", "2", "3"]
+    assert [url for url, _ in skipped] == server.urls(1, start=4)
+    assert not errors
+    store.close()
+
+    store = JobStore(CsvBackend())
+    assert sorted(job["Candidate Home Link"] for job in store) == server.urls(3)
+    # Ingesting again finds them all by their links
+    again, skipped, _ = ingest_postings(store, server.urls(3), interval=0)
+    assert not again and len(skipped) == 3
+    store.close()
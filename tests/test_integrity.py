@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+import integrity
+from integrity import MOVED, IntegrityScanner, StatCache
+from storage import KEY_FIELD, job_directory
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    # Every path whose content the scanner reads
+    paths = []
+    file_hash = integrity.file_hash
+    monkeypatch.setattr(integrity, "file_hash", lambda path: paths.append(path) or file_hash(path))
+    return paths
+
+
+def _job(number):
+    job = {KEY_FIELD: str(number), "Position": "Engineer", "Company": "Acme", "ID": str(number)}
+    directory = job_directory(job["Position"], job["Company"], job["ID"])
+    os.makedirs(directory)
+    for field, name in (("Resume/CV", "cv.pdf"), ("Cover Letter", "letter.pdf")):
+        job[field] = os.path.join(directory, name)
+        with open(job[field], "w") as file:
+            file.write(f"{name} for job {number}")
+    job["Snapshot"] = ""
+    return job
+
+
+def test_first_scan_only_stats_files(workdir, hashed):
+    jobs = [_job(number) for number in range(1, 4)]
+    assert IntegrityScanner().scan(jobs, full=True) == {"1": {}, "2": {}, "3": {}}
+    assert not hashed
+    cache = StatCache()
+    assert len(cache.entries) == 6
+    assert all(entry[2] is None for entry in cache.entries.values())
+
+    # Nor does any scan after it while the files stay as they are
+    IntegrityScanner().scan(jobs, full=True)
+    assert not hashed
+
+
+def test_changed_file_is_hashed_and_followed_by_content(workdir, hashed):
+    job = _job(1)
+    IntegrityScanner().scan([job], full=True)
+    with open(job["Resume/CV"], "a") as file:
+        file.write(", edited")
+    os.utime(job["Resume/CV"], ns=(0, 0))
+    IntegrityScanner().scan([job], full=True)
+    assert hashed == [job["Resume/CV"]]
+
+    renamed = os.path.join(os.path.dirname(job["Resume/CV"]), "resume-final.pdf")
+    os.rename(job["Resume/CV"], renamed)
+    assert IntegrityScanner().scan([job], full=True) == {"1": {"Resume/CV": (MOVED, renamed)}}
@@ -0,0 +1,67 @@
+import csv
+
+from job_store import JobStore
+from storage import CSV_FIELDS, KEY_FIELD, CsvBackend, JobRecord
+
+
+def _job(number, status="Applied"):
+    return JobRecord.from_dict({"Position": "Engineer", "Company": "Acme", "ID": str(number), "Status": status})
+
+
+def _rows():
+    with open("jobs.csv", newline="") as file:
+        return list(csv.DictReader(file))
+
+
+def _delete_row_outside(job_id):
+    # As a spreadsheet or a sync client would
+    rows = [row for row in _rows() if row["ID"] != job_id]
+    with open("jobs.csv", "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]) if rows else [KEY_FIELD] + CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_job_deleted_outside_while_edited_here_is_kept(workdir):
+    store = JobStore(CsvBackend(cache_path=None))
+    store.add_many([_job(1), _job(2)])
+    store.flush()
+
+    store.update(store.get("1"), {"Status": "Interview"}, "status")
+    _delete_row_outside("1")
+    _delete_row_outside("2")
+    added, removed, changed = store.reload()
+    assert [job[KEY_FIELD] for job in removed] == ["2"]
+    assert not added and not changed
+    assert store.get("1")["Status"] == "Interview"
+
+    store.close()
+    assert [(row["ID"], row["Status"]) for row in _rows()] == [("1", "Interview")]
+    store = JobStore(CsvBackend(cache_path=None))
+    assert [job["Status"] for job in store] == ["Interview"]
+
+
+def test_reload_leaves_the_key_of_a_pending_job_alone(workdir):
+    store = JobStore(CsvBackend(cache_path=None))
+    store.add(_job(1))
+    store.flush()
+    # A job waiting for its files to be copied holds its key
+    pending = _job(2, "Interview")
+    key = store.reserve_key(pending)
+
+    # Meanwhile another program adds a row under that very key
+    rows = _rows()
+    rows.append(dict(rows[0], ID="2", Status="Offer", **{KEY_FIELD: key}))
+    with open("jobs.csv", "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    added, _, _ = store.reload()
+    assert [job["Status"] for job in added] == ["Offer"]
+    assert added[0][KEY_FIELD] != key
+
+    store.add(pending)
+    assert pending[KEY_FIELD] == key
+    assert sorted(job["Status"] for job in store) == ["Applied", "Interview", "Offer"]
+    store.close()
+    assert sorted(row["Status"] for row in _rows()) == ["Applied", "Interview", "Offer"]
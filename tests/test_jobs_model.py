@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from storage import KEY_FIELD, JobRecord
+
+pytest.importorskip("PyQt5")
+
+
+@pytest.fixture
+def app(monkeypatch):
+    if not os.environ.get("QT_QPA_PLATFORM"):
+        monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+def _job(number):
+    job = JobRecord.from_dict({"Position": "Engineer", "Company": "Acme", "ID": str(number), "Status": "Applied"})
+    job[KEY_FIELD] = str(number)
+    return job
+
+
+def test_removing_many_rows_keeps_every_row_findable(app):
+    from jobs_model import JobsFilterProxyModel, JobsTableModel
+
+    model = JobsTableModel()
+    proxy = JobsFilterProxyModel()
+    proxy.setSourceModel(model)
+    model.add_jobs([_job(number) for number in range(10)])
+
+    removals = []
+    seen = {}
+    # A slot that looks rows up between two removed runs gets the current numbers
+    model.rowsRemoved.connect(lambda parent, first, last: removals.append((first, last)))
+    model.rowsRemoved.connect(lambda *args: seen.update({key: model.row_of(key) for key in ("5", "8")}))
+    stats_changes = []
+    model.stats_changed.connect(lambda: stats_changes.append(True))
+
+    model.remove_jobs(["2", "3", "4", "7", "9", "missing"])
+    assert removals == [(9, 9), (7, 7), (2, 4)]
+    assert seen == {"5": 2, "8": 4}
+    assert len(stats_changes) == 1
+
+    remaining = ["0", "1", "5", "6", "8"]
+    assert [model.key(row) for row in range(model.rowCount())] == remaining
+    assert [model.row_of(key) for key in remaining] == list(range(5))
+    assert model.row_of("3") is None
+    assert len(model.stats) == 5
+    assert [proxy.key(row) for row in range(proxy.rowCount())] == remaining
@@ -0,0 +1,173 @@
+import csv
+import os
+
+from job_store import JobStore
+from journal import HISTORY_FILE, JOURNAL_FILE, Journal
+from storage import KEY_FIELD, CsvBackend, JobRecord
+
+# Long enough that no timer fires during a test: flushes happen when a test asks
+QUIET = 3600
+
+
+def _open(**options):
+    options.setdefault("compact_delay", QUIET)
+    return JobStore(CsvBackend(cache_path=None), flush_delay=QUIET, journal=Journal(), **options)
+
+
+def _job(number, status="Applied"):
+    return JobRecord.from_dict({"Position": "Engineer", "Company": "Acme", "ID": str(number), "Status": status})
+
+
+def _state(store):
+    return {job[KEY_FIELD]: job["Status"] for job in store}
+
+
+def _stored():
+    with open("jobs.csv", newline="") as file:
+        return {row[KEY_FIELD]: row["Status"] for row in csv.DictReader(file)}
+
+
+def _restart(first=2, size=3):
+    # A lazy load in small chunks, so replayed entries meet their jobs mid-stream
+    store = JobStore(CsvBackend(cache_path=None), flush_delay=QUIET, compact_delay=QUIET, journal=Journal(), lazy=True)
+    loaded = [job for chunk, _ in store.load_chunks(first, size) for job in chunk]
+    assert [job[KEY_FIELD] for job in loaded] == [job[KEY_FIELD] for job in store]
+    return store
+
+
+def _compacted_store(count):
+    store = _open()
+    store.add_many([_job(number) for number in range(1, count + 1)])
+    store.close()
+    assert not os.path.exists(JOURNAL_FILE)
+    return _open()
+
+
+def test_flushed_edits_survive_a_crash(workdir):
+    store = _compacted_store(8)
+    store.update(store.get("2"), {"Status": "Interview"}, "status")
+    store.remove(store.get("5"))
+    store.add(_job(9, "Offer"))
+    store.update(store.get("9"), {"Status": "Rejection"}, "status")
+    store.remove(store.get("7"))
+    store.add(_job(7, "Interview"))  # A new job under a deleted one's ID gets a key of its own
+    store.flush()
+    expected = _state(store)
+    # Only the journal was written; then the program died without closing the store
+    assert len(_stored()) == 8
+
+    store = _restart()
+    assert _state(store) == expected
+    assert list(store.jobs[:6]) == [store.get(key) for key in ("1", "2", "3", "4", "6", "8")]
+    # The first compaction writes what was replayed
+    store.close()
+    assert _stored() == expected
+    assert _state(_restart()) == expected
+
+
+def test_line_torn_by_a_crash_is_skipped(workdir):
+    store = _compacted_store(2)
+    store.update(store.get("1"), {"Status": "Interview"}, "status")
+    store.flush()
+    with open(JOURNAL_FILE, "a", encoding="utf-8") as file:
+        file.write('{"time": "2026-01-05T09:00:00", "action": "status", "op": "upd')
+    store = _restart()
+    assert _state(store) == {"1": "Interview", "2": "Applied"}
+
+    # What is appended next is not glued to the torn line, so it replays too
+    store.update(store.get("2"), {"Status": "Offer"}, "status")
+    store.flush()
+    assert len(Journal()) == 2
+    assert _state(_restart()) == {"1": "Interview", "2": "Offer"}
+    assert [entry["fields"] for entry in store.timeline("2")][-1] == {"Status": "Offer"}
+
+
+def test_history_torn_by_a_crash_keeps_later_entries(workdir):
+    store = _compacted_store(1)
+    with open(HISTORY_FILE, "a", encoding="utf-8") as file:
+        file.write('{"time": "2026-01-05T09:00:00", "action": "status", "op": "upd')
+    store = _open()
+    store.update(store.get("1"), {"Status": "Offer"}, "status")
+    store.flush()
+    assert [entry["op"] for entry in store.timeline("1")] == ["add", "update"]
+
+
+def test_replaying_entries_already_compacted_is_harmless(workdir, monkeypatch):
+    # A crash after jobs.csv was written but before the journal was removed
+    store = _compacted_store(3)
+    store.update(store.get("1"), {"Status": "Offer"}, "status")
+    store.remove(store.get("2"))
+    store.add(_job(4, "Interview"))
+    with monkeypatch.context() as patch:
+        patch.setattr(Journal, "compact", lambda journal: None)
+        store.flush(compact=True)
+    expected = {"1": "Offer", "3": "Applied", "4": "Interview"}
+    assert _stored() == expected
+    assert len(Journal()) == 3
+
+    store = _restart()
+    assert _state(store) == expected
+    store.close()
+    assert _stored() == expected
+
+
+def test_undo_and_redo_across_batches(workdir):
+    store = _compacted_store(4)
+    with store.batch():
+        for key in ("1", "2", "3"):
+            store.update(store.get(key), {"Status": "Interview"}, "status")
+    with store.batch():
+        store.remove(store.get("4"))
+        store.add(_job(5))
+    store.update(store.get("1"), {"Status": "Offer"}, "status")
+
+    store.undo()
+    assert _state(store) == {"1": "Interview", "2": "Interview", "3": "Interview", "5": "Applied"}
+    added, removed, changed = store.undo()
+    assert [job[KEY_FIELD] for job in added] == ["4"]
+    assert [job[KEY_FIELD] for job in removed] == ["5"]
+    assert not changed
+    _, _, changed = store.undo()
+    assert changed == {key: {"Status"} for key in ("1", "2", "3")}
+    assert _state(store) == {"1": "Applied", "2": "Applied", "3": "Applied", "4": "Applied"}
+    assert not store.can_undo
+
+    store.redo()
+    store.redo()
+    expected = {"1": "Interview", "2": "Interview", "3": "Interview", "5": "Applied"}
+    assert _state(store) == expected
+    assert store.can_redo
+
+    # Undone and redone edits are journaled like any other and replay the same
+    store.flush()
+    assert _state(_restart()) == expected
+
+    # A new edit drops what was left to redo
+    store.update(store.get("2"), {"Status": "Rejection"}, "status")
+    assert not store.can_redo
+
+
+def test_compaction_writes_the_backend_and_keeps_the_history(workdir):
+    store = _compacted_store(2)
+    store.compact_entries = 3
+    store.update(store.get("1"), {"Status": "Interview"}, "status")
+    store.flush()
+    assert os.path.exists(JOURNAL_FILE)
+    assert _stored() == {"1": "Applied", "2": "Applied"}
+
+    store.update(store.get("2"), {"Status": "Offer"}, "status")
+    store.remove(store.get("1"))
+    store.flush()
+    # Three lines reached the threshold: the backend is written and the journal emptied
+    assert not os.path.exists(JOURNAL_FILE)
+    assert len(store.journal) == 0
+    assert _stored() == {"2": "Offer"}
+
+    timeline = [(entry["op"], entry["action"]) for entry in store.timeline("1")]
+    assert timeline == [("add", "add"), ("update", "status"), ("remove", "delete")]
+    assert os.path.getsize(HISTORY_FILE) > 0
+
+    # Nothing is replayed, and nothing is written back, on the next start
+    store = _restart()
+    assert _state(store) == {"2": "Offer"}
+    assert not store.is_dirty
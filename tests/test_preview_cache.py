@@ -0,0 +1,29 @@
+import hashlib
+import os
+
+from preview_cache import PreviewCache
+
+
+def test_scan_leaves_other_files_alone(workdir):
+    os.makedirs(os.path.join("previews", "notes"))
+    for name in ("mine.pdf", "photo.png", ".preview-abc.tmp"):
+        with open(os.path.join("previews", name), "wb") as file:
+            file.write(b"data")
+    digest = hashlib.sha256(b"document").hexdigest()
+    with open(os.path.join("previews", f"{digest}.png"), "wb") as file:
+        file.write(b"preview")
+
+    cache = PreviewCache()
+    assert sorted(os.listdir("previews")) == sorted(["notes", "mine.pdf", "photo.png", f"{digest}.png"])
+    assert len(cache) == 1 and cache.size == len(b"preview")
+    assert cache.get(digest) == os.path.join("previews", f"{digest}.png")
+
+
+def test_eviction_keeps_the_newest_previews(workdir):
+    cache = PreviewCache(max_bytes=10)
+    digests = [hashlib.sha256(bytes([number])).hexdigest() for number in range(3)]
+    for digest in digests:
+        cache.put(digest, b"12345")
+    assert cache.get(digests[0]) is None
+    assert cache.get(digests[2]) is not None
+    assert cache.size == 10
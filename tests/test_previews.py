@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+
+@pytest.fixture
+def app(monkeypatch):
+    if not os.environ.get("QT_QPA_PLATFORM"):
+        monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def window(app, workdir, monkeypatch):
+    import job_manager_gui
+    from job_store import JobStore
+    from storage import CsvBackend, JobRecord
+
+    store = JobStore(CsvBackend())
+    for number in range(1, 4):
+        path = os.path.join(workdir, f"cv{number}.txt")
+        with open(path, "w") as file:
+            file.write(f"resume {number}")
+        store.add(JobRecord.from_dict({
+            "Position": "Engineer", "Company": "Acme", "ID": str(number), "Status": "Applied", "Resume/CV": path,
+        }))
+    store.close()
+
+    window = job_manager_gui.JobManagerGUI()
+    while not window.store.loaded:
+        app.processEvents()
+    window.show()
+    app.processEvents()
+    # What the loader is asked to render, instead of rendering it
+    submitted = []
+    monkeypatch.setattr(window.previews, "_submit", submitted.append)
+    window.submitted = submitted
+    yield window
+    window.close()
+
+
+def test_nothing_is_prefetched_while_previews_are_off(window):
+    window.prefetch_previews()
+    assert window.submitted == []
+
+    window.preview_checkbox.setChecked(True)
+    window.submitted.clear()
+    window.prefetch_previews()
+    assert sorted(os.path.basename(path) for path in window.submitted) == ["cv1.txt", "cv2.txt", "cv3.txt"]
+
+
+def test_hover_asks_for_a_preview_that_is_not_rendered(window):
+    from PyQt5.QtCore import Qt
+    from jobs_model import JOB_COLUMNS
+
+    model = window.model
+    row = model.row_of("2")
+    index = model.index(row, JOB_COLUMNS.index("Resume/CV"))
+    assert model.data(index, Qt.ToolTipRole) == model.job(row)["Resume/CV"]
+    assert window.submitted == [model.job(row)["Resume/CV"]]
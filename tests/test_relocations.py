@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+from job_core import (
+    create_job_directory, finish_relocation, plan_edit, plan_relocation, resume_relocations, split_relocation
+)
+from job_store import JobStore
+from journal import Journal
+from relocations import RelocationLog
+from storage import KEY_FIELD, CsvBackend, JobRecord
+
+FILES = {"resume.pdf": b"resume", "cover.txt": b"cover", os.path.join("notes", "call.txt"): b"notes"}
+
+
+def _open():
+    return JobStore(CsvBackend(), journal=Journal())
+
+
+def _read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+@pytest.fixture
+def store(workdir):
+    directory = create_job_directory("Engineer", "Acme", "7")
+    for name, data in FILES.items():
+        os.makedirs(os.path.dirname(os.path.join(directory, name)), exist_ok=True)
+        with open(os.path.join(directory, name), "wb") as file:
+            file.write(data)
+    store = _open()
+    store.add(JobRecord.from_dict({
+        "Position": "Engineer", "Company": "Acme", "ID": "7", "Status": "Applied",
+        "Resume/CV": os.path.join(directory, "resume.pdf"),
+    }))
+    store.flush()
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def windows_rename(monkeypatch):
+    # os.rename refuses to replace a file on Windows
+    rename = os.rename
+
+    def refuse_existing(source, destination):
+        if os.path.isfile(destination):
+            raise FileExistsError(f"Cannot create a file when that file already exists: {destination}")
+        rename(source, destination)
+    monkeypatch.setattr(os, "rename", refuse_existing)
+
+
+def test_only_fields_that_follow_the_directory_wait_for_the_move(store):
+    changes, operations, destination = plan_edit(store, "7", {"Position": "Lead", "Status": "Interview"})
+    moved, now = split_relocation(changes)
+    assert set(moved) == {"Position", "Resume/CV"}
+    assert now == {"Status": "Interview"}
+    assert moved["Resume/CV"] == os.path.join(destination, "resume.pdf")
+
+
+def test_interrupted_move_is_resumed(store, windows_rename):
+    log = RelocationLog()
+    changes, _, destination = plan_edit(store, "7", {"Position": "Lead", "Status": "Interview"})
+    moved, now = split_relocation(changes)
+    store.update(store.get("7"), now)
+    source = store.job_dir("7")
+    log.begin("7", source, destination, moved)
+
+    # The crash: one file was moved, one copied to another drive without the
+    # original removed yet, and the notes were not reached
+    for operation in plan_relocation(source, destination, resume=True):
+        name = os.path.relpath(operation.source, source)
+        if name == "resume.pdf":
+            os.replace(operation.source, operation.destination)
+        elif name == "cover.txt":
+            with open(operation.destination, "wb") as file:
+                file.write(_read(operation.source))
+    # An edit made while the files were moving
+    store.update(store.get("7"), {"Status": "Offer"}, "status")
+    store.close()
+
+    store = _open()
+    assert resume_relocations(store, RelocationLog()) == (["7"], [])
+    assert not os.path.exists(source)
+    for name, data in FILES.items():
+        assert _read(os.path.join(destination, name)) == data
+    job = store.get("7")
+    assert (job["Position"], job["Status"]) == ("Lead", "Offer")
+    assert job["Resume/CV"] == os.path.join(destination, "resume.pdf")
+    assert store.job_dir("7") == destination
+    assert not log.pending() and not os.path.exists("relocations.json")
+    store.close()
+
+    # Saved: a restart has nothing left to do
+    store = _open()
+    assert resume_relocations(store, RelocationLog()) == ([], [])
+    assert store.get("7")[KEY_FIELD] == "7" and store.get("7")["Position"] == "Lead"
+    store.close()
+
+
+def test_move_is_finished_once(store):
+    log = RelocationLog()
+    changes, operations, destination = plan_edit(store, "7", {"ID": "8"})
+    moved, _ = split_relocation(changes)
+    intent = log.begin("7", store.job_dir("7"), destination, moved)
+    for operation in operations:
+        os.replace(operation.source, operation.destination)
+    assert finish_relocation(store, log, intent) == {"ID", "Resume/CV"}
+    assert resume_relocations(store, log) == ([], [])
@@ -0,0 +1,148 @@
+import os
+import shutil
+
+import pytest
+
+import job_store
+from archive import JobArchive
+from job_core import archive_jobs, restore_jobs, sync_jobs
+from job_store import JobStore
+from journal import Journal
+from storage import KEY_FIELD, CsvBackend, JobRecord
+from sync import SyncFolder
+
+
+class Device:
+    # One computer's jobs.csv, journal and sync state in its own folder
+    def __init__(self, root, folder):
+        self.root = root
+        self.sync = SyncFolder(folder, self.path("jobs.history"), self.path("sync_state.json"))
+        self.store = self.open()
+        self.archive = JobArchive(self.path("jobs_archive.zip"), self.path(os.path.join("job_positions", ".archive")))
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def open(self):
+        return JobStore(CsvBackend(self.path("jobs.csv"), cache_path=None),
+                        journal=Journal(self.path("jobs.journal"), self.path("jobs.history")))
+
+    def status(self, key):
+        return self.store.get(key)["Status"]
+
+
+@pytest.fixture
+def devices(tmp_path):
+    # Two computers that start with the same job, before either synced
+    first = tmp_path / "first"
+    first.mkdir()
+    store = JobStore(CsvBackend(str(first / "jobs.csv"), cache_path=None))
+    store.add(JobRecord.from_dict({"Position": "Engineer", "Company": "Acme", "ID": "1", "Status": "Applied"}))
+    store.close()
+    shutil.copytree(first, tmp_path / "second")
+    folder = str(tmp_path / "shared")
+    return Device(str(first), folder), Device(str(tmp_path / "second"), folder)
+
+
+def _edit_at(monkeypatch, device, when, status):
+    monkeypatch.setattr(job_store, "_now", lambda: when)
+    device.store.update(device.store.get("1"), {"Status": status}, "status")
+
+
+def test_edit_made_offline_loses_to_a_newer_remote_edit(devices, monkeypatch):
+    first, second = devices
+    # The first computer edits while the shared folder cannot be reached
+    _edit_at(monkeypatch, first, "2026-01-05T09:00:00", "Interview")
+    # The second edits the same field later and syncs straight away
+    _edit_at(monkeypatch, second, "2026-01-05T10:00:00", "Rejection")
+    sync_jobs(second.store, second.sync)
+    # The first gets the folder back hours later and sends its older edit
+    monkeypatch.undo()
+    sync_jobs(first.store, first.sync)
+    sync_jobs(second.store, second.sync)
+    assert first.status("1") == second.status("1") == "Rejection"
+
+
+def test_edit_made_offline_wins_over_an_older_remote_edit(devices, monkeypatch):
+    first, second = devices
+    _edit_at(monkeypatch, second, "2026-01-05T09:00:00", "Rejection")
+    sync_jobs(second.store, second.sync)
+    _edit_at(monkeypatch, first, "2026-01-05T10:00:00", "Interview")
+    monkeypatch.undo()
+    sync_jobs(first.store, first.sync)
+    sync_jobs(second.store, second.sync)
+    assert first.status("1") == second.status("1") == "Interview"
+
+
+def test_added_and_deleted_jobs_reach_the_other_device(devices):
+    first, second = devices
+    job = JobRecord.from_dict({"Position": "Analyst", "Company": "Globex", "ID": "2", "Status": "Applied"})
+    first.store.add(job)
+    first.store.remove(first.store.get("1"))
+    sync_jobs(first.store, first.sync)
+    sync_jobs(second.store, second.sync)
+    assert [(job["Company"], job["ID"]) for job in second.store] == [("Globex", "2")]
+
+    # And survive a restart of the second device
+    second.store.close()
+    second.store = second.open()
+    assert [job[KEY_FIELD] for job in second.store] == ["2"]
+
+
+def test_remote_archiving_is_saved_with_one_write(devices, monkeypatch):
+    first, second = devices
+    for number in range(2, 5):
+        first.store.add(JobRecord.from_dict({"Position": "P", "Company": "C", "ID": str(number), "Status": "Rejection"}))
+    sync_jobs(first.store, first.sync)
+    sync_jobs(second.store, second.sync, second.archive)
+    archive_jobs(first.store, first.archive, ["2", "3", "4"])
+    first.store.flush()
+    sync_jobs(first.store, first.sync)
+
+    writes = []
+    append = Journal.append
+    monkeypatch.setattr(Journal, "append", lambda journal, entries: writes.append(len(entries)) or append(journal, entries))
+    _, _, _, archived = sync_jobs(second.store, second.sync, second.archive)
+    assert sorted(job[KEY_FIELD] for job in archived) == ["2", "3", "4"]
+    assert [count for count in writes if count] == [3]
+    assert [job[KEY_FIELD] for job in second.store] == ["1"]
+    assert second.archive.keys() == {"2", "3", "4"}
+
+    # Restored on the first device: back in the second's store, and out of its archive
+    restore_jobs(first.store, first.archive, ["3"])
+    first.store.flush()
+    first.archive.discard(["3"])
+    sync_jobs(first.store, first.sync)
+    added, _, _, _ = sync_jobs(second.store, second.sync, second.archive)
+    assert [job[KEY_FIELD] for job in added] == ["3"]
+    assert second.archive.keys() == {"2", "4"}
+    assert sorted(job[KEY_FIELD] for job in second.store) == ["1", "3"]
+
+
+def test_synced_job_leaves_the_key_of_a_pending_job_alone(devices):
+    first, second = devices
+    # A job the first device had before it synced keeps its key on the way over
+    first.store.close()
+    store = JobStore(CsvBackend(first.path("jobs.csv"), cache_path=None))
+    store.add(JobRecord.from_dict({"Position": "Analyst", "Company": "Globex", "ID": "3", "Status": "Offer"}))
+    store.close()
+    first.store = first.open()
+    first.store.remove(first.store.get("3"))
+    first.store.undo()
+    sync_jobs(first.store, first.sync)
+
+    # The second device is still copying the files of a job that was given that key
+    pending = JobRecord.from_dict({"Position": "Analyst", "Company": "Initech", "ID": "3", "Status": "Interview"})
+    key = second.store.reserve_key(pending)
+    assert key == "3"
+    added, _, _, _ = sync_jobs(second.store, second.sync)
+    assert [job["Company"] for job in added] == ["Globex"]
+    assert added[0][KEY_FIELD] != key
+    second.store.add(pending)
+    assert second.store.get(key) is pending
+    assert sorted(job["Company"] for job in second.store) == ["Acme", "Globex", "Initech"]
+
+    # Both reach the first device
+    sync_jobs(second.store, second.sync)
+    sync_jobs(first.store, first.sync)
+    assert sorted(job["Company"] for job in first.store) == ["Acme", "Globex", "Initech"]
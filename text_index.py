@@ -0,0 +1,302 @@
+import html
+import math
+import os
+import re
+import sqlite3
+import threading
+import zipfile
+import zlib
+from collections import Counter
+from operator import itemgetter
+
+import instrumentation
+from blob_store import file_hash
+from job_index import tokenize
+from storage import DOCUMENT_FIELDS, KEY_FIELD
+
+SEARCH_DB = 'search.db'
+TEXT_EXTENSIONS = {".txt", ".md", ".csv", ".rtf"}
+HTML_EXTENSIONS = {".html", ".htm", ".mhtml"}
+PARALLEL_THRESHOLD = 8  # Fewer new documents than this are extracted in-process
+MIN_PREFIX = 3          # Shorter query words must match a whole word
+MAX_TERM_LENGTH = 40
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+SCRIPT_PATTERN = re.compile(r"<(script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+PDF_STREAM_PATTERN = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.DOTALL)
+PDF_STRING_PATTERN = re.compile(rb"\(((?:\\.|[^\\)])*)\)")
+PDF_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+
+def _html_text(text):
+    return html.unescape(TAG_PATTERN.sub(" ", SCRIPT_PATTERN.sub(" ", text)))
+
+
+def _docx_text(path):
+    with zipfile.ZipFile(path) as archive:
+        xml = archive.read("word/document.xml").decode("utf-8", errors="replace")
+    return _html_text(xml.replace("</w:p>", "\n"))
+
+
+def _pdf_text(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return _pdf_strings(path)
+    return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+
+
+def _pdf_strings(path):
+    # Without pypdf: inflate the content streams and collect the string
+    # operands of the text operators. Enough for keywords from most exports,
+    # though fonts with custom encodings come out garbled.
+    with open(path, 'rb') as file:
+        data = file.read()
+    parts = []
+    for stream in PDF_STREAM_PATTERN.findall(data):
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass
+        if b"Tj" not in stream and b"TJ" not in stream:
+            continue
+        for string in PDF_STRING_PATTERN.findall(stream):
+            string = re.sub(rb"\\([nrtbf])", lambda match: PDF_ESCAPES[match.group(1)], string)
+            parts.append(re.sub(rb"\\(.)", rb"\1", string).decode("latin-1"))
+    return " ".join(parts)
+
+
+def extract_text(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        return _pdf_text(path)
+    if extension == ".docx":
+        return _docx_text(path)
+    with open(path, encoding="utf-8", errors="replace") as file:
+        if extension in HTML_EXTENSIONS:
+            return _html_text(file.read())
+        if extension in TEXT_EXTENSIONS:
+            return file.read()
+    return ""
+
+
+def extract_terms(path):
+    # Runs in the process pool: returns ({term: count}, document length, error)
+    try:
+        terms = Counter(
+            token for token in tokenize(extract_text(path)) if 1 < len(token) <= MAX_TERM_LENGTH
+        )
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        return {}, 0, str(e)
+    return dict(terms), sum(terms.values()), None
+
+
+def documents_of(job):
+    # (path, key, field) for every document of a job that exists on disk
+    return [
+        (job[field], job[KEY_FIELD], field)
+        for field in DOCUMENT_FIELDS
+        if job.get(field) and os.path.isfile(job[field])
+    ]
+
+
+class TextIndex:
+    # Inverted index over the documents in job_positions, kept in SQLite.
+    # Postings belong to a content (one per sha256), so linked and duplicated
+    # files are extracted and stored once. Every thread gets its own
+    # connection; WAL lets the window query while a worker is writing.
+    def __init__(self, path=SEARCH_DB):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._create_schema()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _create_schema(self):
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS contents (id INTEGER PRIMARY KEY, sha256 TEXT UNIQUE NOT NULL, "
+                "length INTEGER NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents (path TEXT PRIMARY KEY, key TEXT NOT NULL, "
+                "field TEXT NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, content INTEGER NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS documents_content ON documents (content)")
+            # No index on content: it would triple the cost of the first build,
+            # and postings are only deleted by content when files change
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, content INTEGER NOT NULL, "
+                "count INTEGER NOT NULL, PRIMARY KEY (term, content)) WITHOUT ROWID"
+            )
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def sync(self, jobs, workers=None):
+        # Brings the index in line with every job: new and changed files are
+        # indexed, files no job refers to any more are dropped
+        documents = [document for job in jobs for document in documents_of(job)]
+        return self.update(documents, workers, prune=True)
+
+    def update_job(self, job, workers=None):
+        return self.update(documents_of(job), workers, keys={job[KEY_FIELD]})
+
+    def remove_job(self, key):
+        return self.update([], keys={key})
+
+    def update(self, documents, workers=None, keys=None, prune=False):
+        # documents: (path, key, field). With keys, other documents of those
+        # jobs are removed; with prune, every document not listed is.
+        # Returns the number of files whose text was extracted.
+        with self._write_lock, instrumentation.span("update_search_index", "search") as span:
+            connection = self._connection()
+            known = {
+                row[0]: row[1:]
+                for row in connection.execute("SELECT path, key, field, mtime_ns, size, content FROM documents")
+            }
+            contents = dict(connection.execute("SELECT sha256, id FROM contents"))
+
+            rows = []
+            extract = {}  # sha256 -> path of a file with that content
+            listed = set()
+            for path, key, field in documents:
+                listed.add(path)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                previous = known.get(path)
+                if previous is not None and previous[2:4] == (stat.st_mtime_ns, stat.st_size):
+                    if previous[:2] != (key, field):
+                        rows.append((path, key, field, stat.st_mtime_ns, stat.st_size, previous[4]))
+                    continue
+                # Touched, renamed or copied files keep their postings when the content is known
+                digest = file_hash(path)
+                span.read(stat.st_size)
+                rows.append((path, key, field, stat.st_mtime_ns, stat.st_size, digest))
+                if digest not in contents:
+                    extract.setdefault(digest, path)
+
+            removed = [
+                path for path, (key, *_) in known.items()
+                if path not in listed and (prune or (keys is not None and key in keys))
+            ]
+            extracted = self._extract(extract, workers)
+
+            with connection:
+                postings = []
+                for digest, (terms, length) in extracted.items():
+                    cursor = connection.execute("INSERT INTO contents (sha256, length) VALUES (?, ?)", (digest, length))
+                    contents[digest] = cursor.lastrowid
+                    postings.extend((term, cursor.lastrowid, count) for term, count in terms.items())
+                # In key order the B-tree is appended to rather than split all over;
+                # contents are already ascending, and the sort is stable
+                postings.sort(key=itemgetter(0))
+                connection.executemany("INSERT INTO postings VALUES (?, ?, ?)", postings)
+                # Hashed files carry their digest until it has a content id
+                rows = [row[:5] + (contents.get(row[5], row[5]),) for row in rows]
+                connection.executemany("DELETE FROM documents WHERE path = ?", [(path,) for path in removed])
+                connection.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+                # Contents no document points at any more
+                orphans = [row[0] for row in connection.execute(
+                    "SELECT id FROM contents WHERE id NOT IN (SELECT content FROM documents)"
+                )]
+                if orphans:
+                    placeholders = ", ".join("?" for _ in orphans)
+                    connection.execute(f"DELETE FROM postings WHERE content IN ({placeholders})", orphans)
+                    connection.execute(f"DELETE FROM contents WHERE id IN ({placeholders})", orphans)
+            span.annotate(documents=len(rows), extracted=len(extracted), removed=len(removed))
+            return len(extracted)
+
+    def _extract(self, paths_by_digest, workers=None):
+        # Text extraction is CPU bound, so large batches go to a process pool
+        digests = list(paths_by_digest)
+        paths = [paths_by_digest[digest] for digest in digests]
+        if len(paths) < PARALLEL_THRESHOLD or workers == 0:
+            results = map(extract_terms, paths)
+        else:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # Spawned, not forked: the window's threads must not be copied into the workers
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            with executor:
+                results = list(executor.map(extract_terms, paths, chunksize=4))
+        extracted = {}
+        for digest, path, (terms, length, error) in zip(digests, paths, results):
+            if error is not None:
+                instrumentation.event("text_extraction_failed", "search", path=path, error=error)
+            # A file that yields no text is still recorded, so it is not retried until it changes
+            extracted[digest] = (terms, length)
+        return extracted
+
+    def _matches(self, connection, word):
+        # {content: occurrences} of a query word, as a prefix once it is long enough
+        if len(word) >= MIN_PREFIX:
+            cursor = connection.execute(
+                "SELECT content, SUM(count) FROM postings WHERE term >= ? AND term < ? GROUP BY content",
+                (word, word + "\uffff")
+            )
+        else:
+            cursor = connection.execute("SELECT content, count FROM postings WHERE term = ?", (word,))
+        return dict(cursor.fetchall())
+
+    def search(self, text, limit=200):
+        # Returns [(key, score, fields)] with the best match first. Every word
+        # of the query must occur; documents are ranked with BM25.
+        words = tokenize(text)
+        if not words:
+            return []
+        with instrumentation.span("search_documents", "search", words=len(words)):
+            connection = self._connection()
+            total, average = connection.execute("SELECT COUNT(*), AVG(length) FROM contents").fetchone()
+            if not total:
+                return []
+            average = average or 1
+
+            scores = None
+            for word in words:
+                matches = self._matches(connection, word)
+                idf = math.log(1 + (total - len(matches) + 0.5) / (len(matches) + 0.5))
+                if scores is None:
+                    scores = {content: 0.0 for content in matches}
+                else:
+                    scores = {content: score for content, score in scores.items() if content in matches}
+                if not scores:
+                    return []
+                lengths = self._lengths(connection, scores)
+                for content in scores:
+                    frequency = matches[content]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[content] / average)
+                    scores[content] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+            results = {}
+            placeholders = ", ".join("?" for _ in scores)
+            cursor = connection.execute(
+                f"SELECT key, field, content FROM documents WHERE content IN ({placeholders})", list(scores)
+            )
+            for key, field, content in cursor:
+                score, fields = results.get(key, (0.0, []))
+                results[key] = (max(score, scores[content]), fields + [field])
+            ranked = sorted(results.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+            return [(key, score, fields) for key, (score, fields) in ranked]
+
+    def _lengths(self, connection, contents):
+        placeholders = ", ".join("?" for _ in contents)
+        cursor = connection.execute(f"SELECT id, length FROM contents WHERE id IN ({placeholders})", list(contents))
+        return dict(cursor.fetchall())
@@ -0,0 +1,42 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView, QPushButton, QLabel
+)
+
+from journal import describe_entry
+
+TIMELINE_COLUMNS = ["Time", "Action", "Change"]
+
+
+class TimelineDialog(QDialog):
+    # Every journaled change to one job, oldest first
+    def __init__(self, entries, title, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"History of {title}")
+        self.setGeometry(150, 150, 800, 400)
+
+        self.table = QTableWidget(len(entries), len(TIMELINE_COLUMNS))
+        self.table.setHorizontalHeaderLabels(TIMELINE_COLUMNS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        for row, entry in enumerate(entries):
+            values = [entry["time"].replace("T", " "), entry["action"].capitalize(), describe_entry(entry)]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+        self.table.resizeColumnsToContents()
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.table.scrollToBottom()
+
+        label = QLabel(
+            f"{len(entries)} changes" if entries else "No changes were recorded since the history was started."
+        )
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.close)
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(label)
+        button_layout.addStretch()
+        button_layout.addWidget(close_button)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.table)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)